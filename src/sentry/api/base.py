@@ -12,6 +12,7 @@ from django.views.decorators.csrf import csrf_exempt
 from enum import Enum
 from pytz import utc
 from rest_framework.authentication import SessionAuthentication
+from rest_framework.exceptions import ParseError
 from rest_framework.parsers import JSONParser
 from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
@@ -208,6 +209,7 @@ class Endpoint(APIView):
     def add_cursor_headers(self, request, response, cursor_result):
         if cursor_result.hits is not None:
             response['X-Hits'] = cursor_result.hits
+            response['X-Hits-Estimated'] = '1' if cursor_result.hits_estimated else '0'
         if cursor_result.max_hits is not None:
             response['X-Max-Hits'] = cursor_result.max_hits
         response['Link'] = ', '.join(
@@ -230,7 +232,11 @@ class Endpoint(APIView):
         per_page = int(request.GET.get('per_page', default_per_page))
         input_cursor = request.GET.get('cursor')
         if input_cursor:
-            input_cursor = Cursor.from_string(input_cursor)
+            cursor_cls = getattr(paginator or paginator_cls, 'cursor_cls', Cursor)
+            try:
+                input_cursor = cursor_cls.from_string(input_cursor)
+            except ValueError:
+                raise ParseError(detail='Invalid cursor parameter.')
         else:
             input_cursor = None
 
@@ -2,7 +2,7 @@ from __future__ import absolute_import
 
 from sentry import features
 from sentry.api.bases.project import ProjectEndpoint
-from sentry.api.paginator import OffsetPaginator
+from sentry.api.paginator import KeysetPaginator
 from sentry.api.serializers import serialize
 from sentry.models import Event, EventAttachment
 
@@ -38,5 +38,5 @@ class EventAttachmentsEndpoint(ProjectEndpoint):
             queryset=queryset,
             order_by='name',
             on_results=lambda x: serialize(x, request.user),
-            paginator_cls=OffsetPaginator,
+            paginator_cls=KeysetPaginator,
         )
@@ -9,7 +9,7 @@ from sentry.api.base import DocSection
 from sentry.api.bases.organization import OrganizationReleasesBaseEndpoint
 from sentry.api.content_negotiation import ConditionalContentNegotiation
 from sentry.api.exceptions import ResourceDoesNotExist
-from sentry.api.paginator import OffsetPaginator
+from sentry.api.paginator import KeysetPaginator
 from sentry.api.serializers import serialize
 from sentry.models import File, Release, ReleaseFile, Distribution
 
@@ -72,7 +72,7 @@ class OrganizationReleaseFilesEndpoint(OrganizationReleasesBaseEndpoint):
             request=request,
             queryset=file_list,
             order_by='name',
-            paginator_cls=OffsetPaginator,
+            paginator_cls=KeysetPaginator,
             on_results=lambda r: serialize(load_dist(r), request.user),
         )
 
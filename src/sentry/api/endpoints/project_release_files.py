@@ -10,7 +10,7 @@ from sentry.api.base import DocSection
 from sentry.api.bases.project import ProjectEndpoint, ProjectReleasePermission
 from sentry.api.content_negotiation import ConditionalContentNegotiation
 from sentry.api.exceptions import ResourceDoesNotExist
-from sentry.api.paginator import OffsetPaginator
+from sentry.api.paginator import KeysetPaginator
 from sentry.api.serializers import serialize
 from sentry.api.endpoints.organization_release_files import load_dist
 from sentry.models import File, Release, ReleaseFile
@@ -87,7 +87,7 @@ class ProjectReleaseFilesEndpoint(ProjectEndpoint):
             request=request,
             queryset=file_list,
             order_by='name',
-            paginator_cls=OffsetPaginator,
+            paginator_cls=KeysetPaginator,
             on_results=lambda r: serialize(load_dist(r), request.user),
         )
 
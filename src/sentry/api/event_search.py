@@ -1,10 +1,13 @@
 from __future__ import absolute_import
 
 import re
-from collections import namedtuple
+import threading
+from collections import namedtuple, OrderedDict
+from copy import deepcopy
 from datetime import datetime
 
 import six
+from django.conf import settings
 from django.utils.functional import cached_property
 from parsimonious.exceptions import ParseError
 from parsimonious.nodes import Node
@@ -206,6 +209,10 @@ class SearchVisitor(NodeVisitor):
 
     unwrapped_exceptions = (InvalidSearchQuery,)
 
+    def __init__(self):
+        # id of a relative time filter -> its source text
+        self.relative_filters = {}
+
     @cached_property
     def key_mappings_lookup(self):
         lookup = {}
@@ -279,19 +286,11 @@ class SearchVisitor(NodeVisitor):
 
     def visit_rel_time_filter(self, node, (search_key, _, value)):
         if search_key.name in self.date_keys:
-            try:
-                from_val, to_val = parse_datetime_range(value.text)
-            except InvalidQuery as exc:
-                raise InvalidSearchQuery(exc.message)
-
-            # TODO: Handle negations
-            if from_val is not None:
-                operator = '>='
-                search_value = from_val[0]
-            else:
-                operator = '<='
-                search_value = to_val[0]
-            return SearchFilter(search_key, operator, SearchValue(search_value))
+            search_filter = resolve_rel_time_filter(search_key, value.text)
+            # These depend on the current time, so cached parses of the query
+            # have to resolve them again (see ``ParsedQuery``.)
+            self.relative_filters[id(search_filter)] = value.text
+            return search_filter
         else:
             return self._handle_basic_filter(search_key, '=', SearchValue(value.text))
 
@@ -396,9 +395,129 @@ class SearchVisitor(NodeVisitor):
         return children or node
 
 
+def resolve_rel_time_filter(search_key, value):
+    try:
+        from_val, to_val = parse_datetime_range(value)
+    except InvalidQuery as exc:
+        raise InvalidSearchQuery(exc.message)
+
+    # TODO: Handle negations
+    if from_val is not None:
+        operator = '>='
+        search_value = from_val[0]
+    else:
+        operator = '<='
+        search_value = to_val[0]
+    return SearchFilter(search_key, operator, SearchValue(search_value))
+
+
+class ParsedQuery(object):
+    """
+    The filters of a parsed search query, as they are kept in the parse cache.
+
+    Instances are shared between requests and must not be modified. Relative
+    time filters (e.g. ``first_seen:-24h``) are resolved again whenever the
+    filters are requested, and the Snuba conditions of all other filters are
+    only translated once.
+    """
+
+    def __init__(self, filters, relative_filters=None):
+        self.filters = tuple(filters)
+        # index of a relative time filter -> its source text
+        self.relative_filters = relative_filters or {}
+        self.__snuba_filters = None
+
+    @classmethod
+    def parse(cls, query, visitor_cls):
+        visitor = visitor_cls()
+        filters = visitor.visit(event_search_grammar.parse(query))
+        return cls(filters, {
+            index: visitor.relative_filters[id(search_filter)]
+            for index, search_filter in enumerate(filters)
+            if id(search_filter) in visitor.relative_filters
+        })
+
+    def get_filters(self):
+        filters = list(self.filters)
+        for index, value in six.iteritems(self.relative_filters):
+            filters[index] = resolve_rel_time_filter(filters[index].key, value)
+        return filters
+
+    def get_snuba_filters(self):
+        """
+        Return the filters translated with ``convert_search_filter_to_snuba``.
+        """
+        snuba_filters = self.__snuba_filters
+        if snuba_filters is None:
+            snuba_filters = self.__snuba_filters = [
+                None if index in self.relative_filters else convert_search_filter_to_snuba(
+                    search_filter)
+                for index, search_filter in enumerate(self.filters)
+            ]
+
+        rv = []
+        for search_filter, snuba_filter in zip(self.get_filters(), snuba_filters):
+            if snuba_filter is None:
+                rv.append(convert_search_filter_to_snuba(search_filter))
+            else:
+                # conditions are lists, which callers are free to modify
+                rv.append(deepcopy(snuba_filter))
+        return rv
+
+
+class ParsedQueryCache(object):
+    """
+    A process wide, least recently used cache of parsed search queries.
+
+    Only successful parses are cached, invalid queries are parsed (and raise)
+    every time.
+    """
+
+    def __init__(self, max_size=None):
+        self.__max_size = max_size
+        self.__items = OrderedDict()
+        self.__lock = threading.Lock()
+
+    @property
+    def max_size(self):
+        if self.__max_size is None:
+            return settings.SENTRY_SEARCH_PARSE_CACHE_SIZE
+        return self.__max_size
+
+    def get(self, query, visitor_cls=None):
+        if visitor_cls is None:
+            visitor_cls = SearchVisitor
+
+        max_size = self.max_size
+        if not max_size:
+            return ParsedQuery.parse(query, visitor_cls)
+
+        key = (visitor_cls, query)
+        with self.__lock:
+            parsed = self.__items.pop(key, None)
+            if parsed is not None:
+                # re-insert to mark this as the most recently used query
+                self.__items[key] = parsed
+                return parsed
+
+        parsed = ParsedQuery.parse(query, visitor_cls)
+
+        with self.__lock:
+            self.__items[key] = parsed
+            while len(self.__items) > max_size:
+                self.__items.popitem(last=False)
+        return parsed
+
+    def clear(self):
+        with self.__lock:
+            self.__items.clear()
+
+
+parse_cache = ParsedQueryCache()
+
+
 def parse_search_query(query):
-    tree = event_search_grammar.parse(query)
-    return SearchVisitor().visit(tree)
+    return parse_cache.get(query, SearchVisitor).get_filters()
 
 
 def convert_endpoint_params(params):
@@ -489,12 +608,27 @@ def convert_search_filter_to_snuba_query(search_filter):
             return condition
 
 
+def convert_search_filter_to_snuba(search_filter):
+    """
+    Translate a filter into the ``(argument, name, value)`` it adds to the
+    Snuba query arguments.
+    """
+    snuba_name = search_filter.key.snuba_name
+
+    if snuba_name in ('start', 'end'):
+        return (snuba_name, snuba_name, search_filter.value.value)
+    elif snuba_name == 'project_id':
+        return ('filter_keys', snuba_name, search_filter.value.value)
+    else:
+        return ('conditions', snuba_name, convert_search_filter_to_snuba_query(search_filter))
+
+
 def get_snuba_query_args(query=None, params=None):
     # NOTE: this function assumes project permissions check already happened
-    parsed_filters = []
+    snuba_filters = []
     if query is not None:
         try:
-            parsed_filters = parse_search_query(query)
+            snuba_filters = parse_cache.get(query, SearchVisitor).get_snuba_filters()
         except ParseError as e:
             raise InvalidSearchQuery(
                 u'Parse error: %r (column %d)' % (e.expr.name, e.column())
@@ -502,20 +636,20 @@ def get_snuba_query_args(query=None, params=None):
 
     # Keys included as url params take precedent if same key is included in search
     if params is not None:
-        parsed_filters.extend(convert_endpoint_params(params))
+        snuba_filters.extend(
+            convert_search_filter_to_snuba(_filter)
+            for _filter in convert_endpoint_params(params)
+        )
 
     kwargs = {
         'conditions': [],
         'filter_keys': {},
     }
-    for _filter in parsed_filters:
-        snuba_name = _filter.key.snuba_name
-
-        if snuba_name in ('start', 'end'):
-            kwargs[snuba_name] = _filter.value.value
-        elif snuba_name == 'project_id':
-            kwargs['filter_keys'][snuba_name] = _filter.value.value
+    for argument, snuba_name, value in snuba_filters:
+        if argument == 'conditions':
+            kwargs['conditions'].append(value)
+        elif argument == 'filter_keys':
+            kwargs['filter_keys'][snuba_name] = value
         else:
-            converted_filter = convert_search_filter_to_snuba_query(_filter)
-            kwargs['conditions'].append(converted_filter)
+            kwargs[argument] = value
     return kwargs
@@ -3,12 +3,12 @@ from __future__ import absolute_import
 from django.utils.functional import cached_property
 
 from sentry.api.event_search import (
-    event_search_grammar,
     InvalidSearchQuery,
     SearchFilter,
     SearchKey,
     SearchValue,
     SearchVisitor,
+    parse_cache,
 )
 from sentry.constants import STATUS_CHOICES
 from sentry.search.utils import (
@@ -69,8 +69,7 @@ class IssueSearchVisitor(SearchVisitor):
 
 
 def parse_search_query(query):
-    tree = event_search_grammar.parse(query)
-    return IssueSearchVisitor().visit(tree)
+    return parse_cache.get(query, IssueSearchVisitor).get_filters()
 
 
 def convert_actor_value(value, projects, user, environments):
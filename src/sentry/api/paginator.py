@@ -8,15 +8,22 @@ sentry.api.paginator
 from __future__ import absolute_import
 
 import bisect
+import calendar
 import functools
 import math
+import six
 
 from datetime import datetime
+from django.conf import settings
 from django.db import connections
+from django.db.models import DateTimeField
 from django.db.models.sql.datastructures import EmptyResultSet
 from django.utils import timezone
 
-from sentry.utils.cursors import build_cursor, Cursor, CursorResult
+from sentry.utils import json, metrics
+from sentry.utils.cache import cache
+from sentry.utils.cursors import build_cursor, Cursor, CursorResult, KeysetCursor
+from sentry.utils.hashlib import md5_text
 
 quote_name = connections['default'].ops.quote_name
 
@@ -24,9 +31,14 @@ quote_name = connections['default'].ops.quote_name
 MAX_LIMIT = 100
 MAX_HITS_LIMIT = 1000
 
+# When estimating hits, the planner estimate has to exceed the hits limit by
+# this factor before the exact count is skipped.
+ESTIMATE_HITS_FACTOR = 10
+
 
 class BasePaginator(object):
-    def __init__(self, queryset, order_by=None, max_limit=MAX_LIMIT, on_results=None):
+    def __init__(self, queryset, order_by=None, max_limit=MAX_LIMIT, on_results=None,
+                 hits_cache_ttl=None, estimate_hits=None):
         if order_by:
             if order_by.startswith('-'):
                 self.key, self.desc = order_by[1:], True
@@ -38,6 +50,12 @@ class BasePaginator(object):
         self.queryset = queryset
         self.max_limit = max_limit
         self.on_results = on_results
+        if hits_cache_ttl is None:
+            hits_cache_ttl = settings.SENTRY_PAGINATOR_HITS_CACHE_TTL
+        self.hits_cache_ttl = hits_cache_ttl
+        if estimate_hits is None:
+            estimate_hits = settings.SENTRY_PAGINATOR_ESTIMATE_HITS
+        self.estimate_hits = estimate_hits
 
     def _is_asc(self, is_prev):
         return (self.desc and is_prev) or not (self.desc or is_prev)
@@ -119,8 +137,9 @@ class BasePaginator(object):
 
         # TODO(dcramer): this does not yet work correctly for ``is_prev`` when
         # the key is not unique
+        hits_estimated = False
         if count_hits:
-            hits = self.count_hits(MAX_HITS_LIMIT)
+            hits, hits_estimated = self.get_hits(MAX_HITS_LIMIT)
         elif known_hits is not None:
             hits = known_hits
         else:
@@ -160,6 +179,7 @@ class BasePaginator(object):
             results=results,
             limit=limit,
             hits=hits,
+            hits_estimated=hits_estimated,
             max_hits=MAX_HITS_LIMIT if count_hits else None,
             cursor=cursor,
             is_desc=self.desc,
@@ -167,16 +187,88 @@ class BasePaginator(object):
             on_results=self.on_results,
         )
 
-    def count_hits(self, max_hits):
-        if not max_hits:
-            return 0
-        hits_query = self.queryset.values()[:max_hits].query
+    def _get_hits_query(self, max_hits=None):
+        queryset = self.queryset.values()
+        if max_hits is not None:
+            queryset = queryset[:max_hits]
+        hits_query = queryset.query
         # clear out any select fields (include select_related) and pull just the id
         hits_query.clear_select_clause()
         hits_query.add_fields(['id'])
         hits_query.clear_ordering(force_empty=True)
+        return hits_query.sql_with_params()
+
+    def get_hits(self, max_hits):
+        """
+        Return the number of hits (up to ``max_hits``) as a tuple of
+        ``(hits, estimated)``.
+
+        With ``hits_cache_ttl``, counts are cached for identical queries.
+        With ``estimate_hits``, the exact count is skipped when the planner
+        estimates far more rows than ``max_hits`` (PostgreSQL only.)
+        """
+        if not max_hits:
+            return 0, False
+
+        try:
+            h_sql, h_params = self._get_hits_query(max_hits)
+        except EmptyResultSet:
+            return 0, False
+
+        cache_key = None
+        if self.hits_cache_ttl:
+            cache_key = 'paginator:hits:%s' % md5_text(
+                self.queryset.db, h_sql, repr(h_params),
+            ).hexdigest()
+            result = cache.get(cache_key)
+            if result is not None:
+                metrics.incr('paginator.hits', tags={'source': 'cache'})
+                return tuple(result)
+
+        result = None
+        if self.estimate_hits:
+            estimate = self.estimate_count()
+            if estimate is not None and estimate >= max_hits * ESTIMATE_HITS_FACTOR:
+                metrics.incr('paginator.hits', tags={'source': 'estimate'})
+                result = (max_hits, True)
+
+        if result is None:
+            metrics.incr('paginator.hits', tags={'source': 'count'})
+            result = (self.count_hits(max_hits), False)
+
+        if cache_key is not None:
+            cache.set(cache_key, result, self.hits_cache_ttl)
+        return result
+
+    def estimate_count(self):
+        """
+        Return the planner's row estimate for the (unbounded) query, or
+        ``None`` if it's not available.
+        """
+        connection = connections[self.queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+
+        try:
+            sql, params = self._get_hits_query()
+        except EmptyResultSet:
+            return 0
+
+        cursor = connection.cursor()
+        cursor.execute(u'EXPLAIN (FORMAT JSON) {}'.format(sql), params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, six.string_types):
+            plan = json.loads(plan)
         try:
-            h_sql, h_params = hits_query.sql_with_params()
+            return int(plan[0]['Plan']['Plan Rows'])
+        except (IndexError, KeyError, TypeError, ValueError):
+            return None
+
+    def count_hits(self, max_hits):
+        if not max_hits:
+            return 0
+        try:
+            h_sql, h_params = self._get_hits_query(max_hits)
         except EmptyResultSet:
             return 0
         cursor = connections[self.queryset.db].cursor()
@@ -209,6 +301,108 @@ class DateTimePaginator(BasePaginator):
         )
 
 
+class KeysetPaginator(BasePaginator):
+    """
+    Paginates by the ``(order_by, id)`` key of the last row of a page instead
+    of an offset, so every page costs the same no matter how deep it is.
+
+    The cursor value holds the sort value of the boundary row and the cursor
+    offset holds its id, which breaks ties between rows with the same value.
+    The ``order_by`` field must not be nullable.
+    """
+    cursor_cls = KeysetCursor
+
+    def __init__(self, queryset, order_by='id', **kwargs):
+        super(KeysetPaginator, self).__init__(queryset, order_by=order_by, **kwargs)
+        self.field = queryset.model._meta.get_field(self.key)
+
+    def get_item_key(self, item, for_prev=False):
+        value = getattr(item, self.field.attname)
+        if isinstance(value, datetime):
+            # microseconds since the epoch, to not lose precision
+            value = int(calendar.timegm(value.utctimetuple())) * 1000000 + value.microsecond
+        return value
+
+    def value_from_cursor(self, cursor):
+        if isinstance(self.field, DateTimeField):
+            seconds, microseconds = divmod(int(cursor.value), 1000000)
+            return datetime.utcfromtimestamp(seconds).replace(
+                microsecond=microseconds, tzinfo=timezone.utc)
+        return cursor.value
+
+    def _build_keyset_queryset(self, cursor, asc):
+        direction = '' if asc else '-'
+        queryset = self.queryset.order_by(
+            '%s%s' % (direction, self.key),
+            '%sid' % (direction, ),
+        )
+        if cursor.value is None:
+            return queryset
+
+        meta = queryset.model._meta
+        column = '%s.%s' % (quote_name(meta.db_table), quote_name(self.field.column))
+        id_column = '%s.%s' % (quote_name(meta.db_table), quote_name(meta.pk.column))
+        op = '>' if asc else '<'
+        value = self.value_from_cursor(cursor)
+
+        if connections[queryset.db].vendor == 'postgresql':
+            # A row value comparison can be resolved by a single index scan.
+            where = u'({}, {}) {} (%s, %s)'.format(column, id_column, op)
+            params = [value, cursor.offset]
+        else:
+            where = u'({0} {2} %s OR ({0} = %s AND {1} {2} %s))'.format(
+                column, id_column, op)
+            params = [value, value, cursor.offset]
+
+        return queryset.extra(where=[where], params=params)
+
+    def get_result(self, limit=100, cursor=None, count_hits=False, known_hits=None):
+        if cursor is None:
+            cursor = KeysetCursor(None)
+
+        limit = min(limit, self.max_limit)
+
+        hits_estimated = False
+        if count_hits:
+            hits, hits_estimated = self.get_hits(MAX_HITS_LIMIT)
+        else:
+            hits = known_hits
+
+        # Previous pages are fetched in reverse order, starting at the cursor.
+        asc = self.desc == cursor.is_prev
+        results = list(self._build_keyset_queryset(cursor, asc)[:limit + 1])
+        has_more = len(results) > limit
+        results = results[:limit]
+        started = cursor.value is not None
+
+        if cursor.is_prev:
+            results.reverse()
+            has_prev, has_next = has_more, started
+        else:
+            has_prev, has_next = started, has_more
+
+        if results:
+            first, last = results[0], results[-1]
+            prev_cursor = KeysetCursor(self.get_item_key(first), first.id, True, has_prev)
+            next_cursor = KeysetCursor(self.get_item_key(last), last.id, False, has_next)
+        else:
+            # Nothing beyond the cursor, so it's the boundary in both directions.
+            prev_cursor = KeysetCursor(cursor.value, cursor.offset, True, has_prev)
+            next_cursor = KeysetCursor(cursor.value, cursor.offset, False, has_next)
+
+        if self.on_results:
+            results = self.on_results(results)
+
+        return CursorResult(
+            results=results,
+            next=next_cursor,
+            prev=prev_cursor,
+            hits=hits,
+            max_hits=MAX_HITS_LIMIT if count_hits else None,
+            hits_estimated=hits_estimated,
+        )
+
+
 # TODO(dcramer): previous cursors are too complex at the moment for many things
 # and are only useful for polling situations. The OffsetPaginator ignores them
 # entirely and uses standard paging
@@ -43,9 +43,19 @@ class GroupHashSerializer(Serializer):
     }
 
     def get_attrs(self, item_list, user, **kwargs):
+        locked_items = [
+            item for item in item_list
+            if item.state == GroupHash.State.LOCKED_IN_MIGRATION
+        ]
+        unmerge_progress = dict(zip(
+            locked_items,
+            GroupHash.fetch_unmerge_progress([item.id for item in locked_items]),
+        )) if locked_items else {}
+
         return {
             item: {
-                'latest_event': latest_event
+                'latest_event': latest_event,
+                'unmerge_progress': unmerge_progress.get(item),
             }
             for item, latest_event in zip(
                 item_list,
@@ -61,4 +71,5 @@ class GroupHashSerializer(Serializer):
             'id': obj.hash,
             'latestEvent': attrs['latest_event'],
             'state': self.state_text_map[obj.state],
+            'unmergeProgress': attrs['unmerge_progress'],
         }
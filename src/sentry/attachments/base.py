@@ -10,12 +10,56 @@ from __future__ import absolute_import
 
 import zlib
 
+from functools import partial
+
 from sentry.utils import metrics
 
+# Attachments are read, cached and stored in chunks of this size. It matches
+# the blob size of files, so that every chunk ends up in a blob of its own.
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+def read_chunks(fileobj, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Reads a file object in chunks of at most ``chunk_size`` bytes.
+    """
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+class ChunkedReader(object):
+    """
+    A read-only file object over an iterable of chunks, which holds no more
+    than a chunk and the requested amount of data in memory at a time.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            rv = self._buffer + b''.join(self._chunks)
+            self._buffer = b''
+            return rv
+
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+
+        rv, self._buffer = self._buffer[:size], self._buffer[size:]
+        return rv
+
 
 class CachedAttachment(object):
-    def __init__(self, name=None, content_type=None, type=None, data=None, load=None):
-        if data is None and load is None:
+    def __init__(self, name=None, content_type=None, type=None, data=None, load=None,
+                 stream=None):
+        if data is None and load is None and stream is None:
             raise AttributeError('Missing attachment data')
 
         self.name = name
@@ -24,23 +68,54 @@ class CachedAttachment(object):
 
         self._data = data
         self._load = load
+        # A callable returning an iterable of chunks, used instead of loading
+        # all data at once wherever possible.
+        self._stream = stream
 
     @classmethod
     def from_upload(cls, file, **kwargs):
+        def stream():
+            file.seek(0)
+            return file.chunks(DEFAULT_CHUNK_SIZE)
+
         return CachedAttachment(
             name=file.name,
             content_type=file.content_type,
-            data=file.read(),
+            stream=stream,
             **kwargs
         )
 
     @property
     def data(self):
-        if self._data is None and self._load is not None:
-            self._data = self._load()
+        if self._data is None:
+            if self._stream is not None:
+                self._data = b''.join(self._stream())
+            elif self._load is not None:
+                self._data = self._load()
 
         return self._data
 
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Yields the data of the attachment in chunks. Unless the data has
+        been loaded already, only a single chunk is held in memory at a time.
+        """
+        if self._data is None and self._stream is not None:
+            for chunk in self._stream():
+                if chunk:
+                    yield chunk
+            return
+
+        data = self.data
+        for offset in range(0, len(data), chunk_size):
+            yield data[offset:offset + chunk_size]
+
+    def open(self):
+        """
+        Returns a file object to read the data of the attachment in chunks.
+        """
+        return ChunkedReader(self.iter_chunks())
+
     def meta(self):
         return {
             'name': self.name,
@@ -50,6 +125,15 @@ class CachedAttachment(object):
 
 
 class BaseAttachmentCache(object):
+    """
+    Attachments of up to a single chunk are stored compressed in one piece
+    under ``{key}:{index}``, exactly like previous versions stored all of
+    them. Larger attachments are stored chunk by chunk under
+    ``{key}:{index}:{chunk}``, and their chunk counts are kept apart from the
+    metadata under ``{key}:chunks``, so that previous versions can still
+    read the metadata.
+    """
+
     def __init__(self, inner, appendix=None):
         if appendix is None:
             appendix = 'a'
@@ -59,33 +143,89 @@ class BaseAttachmentCache(object):
     def make_key(self, key):
         return u'{}:{}'.format(key, self.appendix)
 
+    def _set_chunks(self, attachment_key, attachment, timeout):
+        """
+        Stores the compressed chunks of an attachment and returns the number
+        of chunks, or ``None`` if it was stored in one piece. Also returns
+        the raw and compressed size.
+        """
+        size = compressed_size = 0
+        chunks = None
+        first = None
+        for chunk in attachment.iter_chunks():
+            compressed = zlib.compress(chunk)
+            size += len(chunk)
+            compressed_size += len(compressed)
+            if chunks is None:
+                if first is None:
+                    # Held back until it is known whether there are more.
+                    first = compressed
+                    continue
+                self.inner.set(u'{}:0'.format(attachment_key), first, timeout, raw=True)
+                chunks = 1
+            self.inner.set(u'{}:{}'.format(attachment_key, chunks), compressed, timeout, raw=True)
+            chunks += 1
+
+        if chunks is None:
+            if first is None:
+                first = zlib.compress(b'')
+                compressed_size = len(first)
+            self.inner.set(attachment_key, first, timeout, raw=True)
+        return chunks, size, compressed_size
+
     def set(self, key, attachments, timeout=None):
         key = self.make_key(key)
+        meta = []
+        chunk_counts = []
         for index, attachment in enumerate(attachments):
-            compressed = zlib.compress(attachment.data)
-            self.inner.set(u'{}:{}'.format(key, index), compressed, timeout, raw=True)
+            attachment_key = u'{}:{}'.format(key, index)
+            chunks, size, compressed_size = self._set_chunks(attachment_key, attachment, timeout)
 
             metrics_tags = {'type': attachment.type}
             metrics.incr('attachments.received', tags=metrics_tags, skip_internal=False)
-            metrics.timing('attachments.blob-size.raw', len(attachment.data), tags=metrics_tags)
-            metrics.timing('attachments.blob-size.compressed', len(compressed), tags=metrics_tags)
+            metrics.timing('attachments.blob-size.raw', size, tags=metrics_tags)
+            metrics.timing('attachments.blob-size.compressed', compressed_size, tags=metrics_tags)
+
+            meta.append(attachment.meta())
+            chunk_counts.append(chunks)
 
-        meta = [attachment.meta() for attachment in attachments]
+        if any(chunks is not None for chunks in chunk_counts):
+            self.inner.set(u'{}:chunks'.format(key), chunk_counts, timeout, raw=False)
         self.inner.set(key, meta, timeout, raw=False)
 
+    def _get_chunk_counts(self, key, count):
+        chunk_counts = self.inner.get(u'{}:chunks'.format(key), raw=False) or []
+        return [
+            chunk_counts[index] if index < len(chunk_counts) else None
+            for index in range(count)
+        ]
+
+    def _stream_chunks(self, attachment_key, chunks):
+        for index in range(chunks):
+            yield zlib.decompress(self.inner.get(u'{}:{}'.format(attachment_key, index), raw=True))
+
     def get(self, key):
         key = self.make_key(key)
         result = self.inner.get(key, raw=False)
-        if result is not None:
-            result = [
-                CachedAttachment(
-                    load=lambda index=index: zlib.decompress(
-                        self.inner.get(u'{}:{}'.format(key, index), raw=True)),
+        if result is None:
+            return None
+
+        rv = []
+        chunk_counts = self._get_chunk_counts(key, len(result))
+        for index, (attachment, chunks) in enumerate(zip(result, chunk_counts)):
+            attachment_key = u'{}:{}'.format(key, index)
+            if chunks is None:
+                rv.append(CachedAttachment(
+                    load=lambda attachment_key=attachment_key: zlib.decompress(
+                        self.inner.get(attachment_key, raw=True)),
+                    **attachment
+                ))
+            else:
+                rv.append(CachedAttachment(
+                    stream=partial(self._stream_chunks, attachment_key, chunks),
                     **attachment
-                )
-                for index, attachment in enumerate(result)
-            ]
-        return result
+                ))
+        return rv
 
     def delete(self, key):
         key = self.make_key(key)
@@ -93,6 +233,13 @@ class BaseAttachmentCache(object):
         if attachments is None:
             return
 
-        for index in range(0, len(attachments)):
-            self.inner.delete(u'{}:{}'.format(key, index))
+        chunk_counts = self._get_chunk_counts(key, len(attachments))
+        for index, chunks in enumerate(chunk_counts):
+            attachment_key = u'{}:{}'.format(key, index)
+            if chunks is None:
+                self.inner.delete(attachment_key)
+            else:
+                for chunk in range(chunks):
+                    self.inner.delete(u'{}:{}'.format(attachment_key, chunk))
+        self.inner.delete(u'{}:chunks'.format(key))
         self.inner.delete(key)
@@ -2,61 +2,213 @@ from __future__ import absolute_import
 
 __all__ = ['from_user', 'from_member', 'DEFAULT']
 
+import threading
 import warnings
 
+from collections import OrderedDict
+from uuid import uuid4
+
 from django.conf import settings
 from django.utils.functional import cached_property
 
 from sentry import roles
 from sentry.auth.superuser import is_active_superuser
 from sentry.models import (
-    AuthIdentity, AuthProvider, OrganizationMember, Project, SentryApp, UserPermission
+    AuthIdentity, AuthProvider, OrganizationMember, OrganizationMemberTeam, Project, SentryApp,
+    Team, UserPermission
 )
+from sentry.utils.cache import cache
 
 
-def _sso_params(member):
+def _get_sso_state(member):
     """
-    Return a tuple of (requires_sso, sso_is_valid) for a given member.
+    Return a tuple of (auth_provider, auth_identity) for a given member. The
+    identity is only looked up if the provider requires linked accounts.
     """
-    # TODO(dcramer): we want to optimize this access pattern as its several
-    # network hops and needed in a lot of places
     try:
         auth_provider = AuthProvider.objects.get(
             organization=member.organization_id,
         )
     except AuthProvider.DoesNotExist:
+        return None, None
+
+    if auth_provider.flags.allow_unlinked:
+        return auth_provider, None
+
+    try:
+        auth_identity = AuthIdentity.objects.get(
+            auth_provider=auth_provider,
+            user=member.user_id,
+        )
+    except AuthIdentity.DoesNotExist:
+        auth_identity = None
+    return auth_provider, auth_identity
+
+
+def _sso_params(member, sso_state=None):
+    """
+    Return a tuple of (requires_sso, sso_is_valid) for a given member.
+    """
+    if sso_state is None:
+        sso_state = _get_sso_state(member)
+    auth_provider, auth_identity = sso_state
+
+    if auth_provider is None:
         sso_is_valid = True
         requires_sso = False
+    elif auth_provider.flags.allow_unlinked:
+        requires_sso = False
+        sso_is_valid = True
     else:
-        if auth_provider.flags.allow_unlinked:
-            requires_sso = False
-            sso_is_valid = True
-        else:
-            requires_sso = True
-            try:
-                auth_identity = AuthIdentity.objects.get(
+        requires_sso = True
+        if auth_identity is None:
+            sso_is_valid = False
+            # If an owner is trying to gain access,
+            # allow bypassing SSO if there are no other
+            # owners with SSO enabled.
+            if member.role == roles.get_top_dog().id:
+                requires_sso = AuthIdentity.objects.filter(
                     auth_provider=auth_provider,
-                    user=member.user_id,
-                )
-            except AuthIdentity.DoesNotExist:
-                sso_is_valid = False
-                # If an owner is trying to gain access,
-                # allow bypassing SSO if there are no other
-                # owners with SSO enabled.
-                if member.role == roles.get_top_dog().id:
-                    requires_sso = AuthIdentity.objects.filter(
-                        auth_provider=auth_provider,
-                        user__in=OrganizationMember.objects.filter(
-                            organization=member.organization_id,
-                            role=roles.get_top_dog().id,
-                            user__is_active=True,
-                        ).exclude(id=member.id).values_list('user_id')
-                    ).exists()
-            else:
-                sso_is_valid = auth_identity.is_valid(member)
+                    user__in=OrganizationMember.objects.filter(
+                        organization=member.organization_id,
+                        role=roles.get_top_dog().id,
+                        user__is_active=True,
+                    ).exclude(id=member.id).values_list('user_id')
+                ).exists()
+        else:
+            sso_is_valid = auth_identity.is_valid(member)
     return requires_sso, sso_is_valid
 
 
+class MemberStateCache(object):
+    """A process wide, least recently used cache of member access states.
+
+    States are stored by their versioned cache key, so entries never have to
+    be invalidated: they are just not looked up anymore.
+    """
+
+    def __init__(self, max_size=None):
+        self._max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self):
+        if self._max_size is None:
+            return settings.SENTRY_ACCESS_LOCAL_CACHE_SIZE
+        return self._max_size
+
+    def get(self, key):
+        with self._lock:
+            state = self._items.pop(key, None)
+            if state is not None:
+                # re-insert to mark this as the most recently used state
+                self._items[key] = state
+            return state
+
+    def set(self, key, state):
+        max_size = self.max_size
+        if not max_size:
+            return
+
+        with self._lock:
+            self._items[key] = state
+            while len(self._items) > max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+member_state_cache = MemberStateCache()
+
+
+def _get_organization_version_key(organization_id):
+    return 'access:o:%s' % (organization_id, )
+
+
+def _get_user_version_key(user_id):
+    return 'access:u:%s' % (user_id, )
+
+
+def _get_versions(keys, ttl):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if versions.get(key) is None:
+            version = uuid4().hex
+            if not cache.add(key, version, ttl):
+                version = cache.get(key) or version
+            versions[key] = version
+    return [versions[key] for key in keys]
+
+
+def expire_access(organization_ids=(), user_ids=()):
+    """
+    Invalidate the cached access state of every member of the given
+    organizations, and of the given users in all of their organizations.
+    """
+    ttl = settings.SENTRY_ACCESS_CACHE_TTL
+    versions = {}
+    for organization_id in organization_ids:
+        versions[_get_organization_version_key(organization_id)] = uuid4().hex
+    for user_id in user_ids:
+        if user_id is not None:
+            versions[_get_user_version_key(user_id)] = uuid4().hex
+    if versions:
+        cache.set_many(versions, ttl or None)
+
+
+def _build_member_state(member):
+    team_ids = list(OrganizationMemberTeam.objects.filter(
+        organizationmember=member,
+        is_active=True,
+    ).values_list('team_id', flat=True))
+
+    project_ids = list(Project.objects.filter(
+        teams__in=team_ids,
+    ).values_list('id', flat=True).distinct()) if team_ids else []
+
+    return {
+        'sso': _get_sso_state(member),
+        'team_ids': team_ids,
+        'project_ids': project_ids,
+        'permissions': UserPermission.for_user(member.user_id),
+    }
+
+
+def get_member_state(member):
+    """
+    Return the state that the access of a member is built from.
+
+    States are cached by member and by the versions of the member's
+    organization and user, which are changed whenever anything that a state
+    depends on changes (see ``sentry.receivers.access``.) Checking them takes
+    a single cache lookup, and the state itself is also kept in memory.
+    """
+    ttl = settings.SENTRY_ACCESS_CACHE_TTL
+    if not ttl:
+        return _build_member_state(member)
+
+    organization_version, user_version = _get_versions([
+        _get_organization_version_key(member.organization_id),
+        _get_user_version_key(member.user_id),
+    ], ttl)
+    cache_key = 'access:m:%s:%s:%s' % (member.id, organization_version, user_version)
+
+    state = member_state_cache.get(cache_key)
+    if state is not None:
+        return state
+
+    state = cache.get(cache_key)
+    if state is None:
+        state = _build_member_state(member)
+        cache.set(cache_key, state, ttl)
+
+    member_state_cache.set(cache_key, state)
+    return state
+
+
 class BaseAccess(object):
     is_active = False
     sso_is_valid = False
@@ -179,6 +331,56 @@ class Access(BaseAccess):
         self.requires_sso = requires_sso
 
 
+class MemberAccess(BaseAccess):
+    """
+    Access of an organization member. Memberships are checked by ID, the
+    teams and projects themselves are only loaded when they are used.
+    """
+    is_active = True
+
+    def __init__(self, scopes, organization_id, team_ids, project_ids, has_global_access,
+                 sso_is_valid, requires_sso, permissions):
+        self.organization_id = organization_id
+        self.team_ids = frozenset(team_ids)
+        self.project_ids = frozenset(project_ids)
+        self.has_global_access = has_global_access
+        self.scopes = scopes
+        self.permissions = permissions
+        self.sso_is_valid = sso_is_valid
+        self.requires_sso = requires_sso
+
+    @cached_property
+    def teams(self):
+        if not self.team_ids:
+            return []
+        return list(Team.objects.filter(id__in=self.team_ids))
+
+    @cached_property
+    def projects(self):
+        if not self.project_ids:
+            return []
+        return list(Project.objects.filter(id__in=self.project_ids))
+
+    def has_team_access(self, team):
+        if not self.is_active:
+            return False
+        if self.has_global_access and self.organization_id == team.organization_id:
+            return True
+        return team.id in self.team_ids
+
+    def has_project_access(self, project):
+        if not self.is_active:
+            return False
+        if self.has_global_access and self.organization_id == project.organization_id:
+            return True
+        return project.id in self.project_ids
+
+    def has_project_membership(self, project):
+        if not self.is_active:
+            return False
+        return project.id in self.project_ids
+
+
 class OrganizationGlobalAccess(BaseAccess):
     requires_sso = False
     sso_is_valid = True
@@ -322,29 +524,24 @@ def from_user(user, organization=None, scopes=None):
 
 
 def from_member(member, scopes=None):
-    # TODO(dcramer): we want to optimize this access pattern as its several
-    # network hops and needed in a lot of places
-    requires_sso, sso_is_valid = _sso_params(member)
-
-    team_list = member.get_teams()
-    project_list = list(Project.objects.filter(teams__in=team_list).distinct())
+    state = get_member_state(member)
+    requires_sso, sso_is_valid = _sso_params(member, state['sso'])
 
     if scopes is not None:
         scopes = set(scopes) & member.get_scopes()
     else:
         scopes = member.get_scopes()
 
-    return Access(
-        is_active=True,
+    return MemberAccess(
         requires_sso=requires_sso,
         sso_is_valid=sso_is_valid,
         scopes=scopes,
         organization_id=member.organization_id,
-        teams=team_list,
-        projects=project_list,
+        team_ids=state['team_ids'],
+        project_ids=state['project_ids'],
         has_global_access=bool(member.organization.flags.allow_joinleave) or
         roles.get(member.role).is_global,
-        permissions=UserPermission.for_user(member.user_id),
+        permissions=state['permissions'],
     )
 
 
@@ -38,7 +38,7 @@ class Buffer(Service):
     This is useful in situations where a single event might be happening so fast that the queue cant
     keep up with the updates.
     """
-    __all__ = ('incr', 'process', 'process_pending', 'validate')
+    __all__ = ('incr', 'incr_multi', 'process', 'process_pending', 'validate')
 
     def incr(self, model, columns, filters, extra=None):
         """
@@ -53,6 +53,16 @@ class Buffer(Service):
             }
         )
 
+    def incr_multi(self, items):
+        """
+        Perform many increments at once. ``items`` is a list of
+        ``(model, columns, filters, extra)`` tuples.
+
+        >>> incr_multi([(Group, {'times_seen': 1}, {'pk': group.pk}, None)])
+        """
+        for model, columns, filters, extra in items:
+            self.incr(model, columns, filters, extra=extra)
+
     def process_pending(self, partition=None):
         return []
 
@@ -11,6 +11,7 @@ import six
 
 from time import time
 from binascii import crc32
+from collections import Counter
 
 from datetime import datetime
 from django.db import models
@@ -153,24 +154,10 @@ class RedisBuffer(Buffer):
         else:
             raise TypeError('invalid type: {}'.format(type_))
 
-    def incr(self, model, columns, filters, extra=None):
-        """
-        Increment the key by doing the following:
-
-        - Insert/update a hashmap based on (model, columns)
-            - Perform an incrby on counters
-            - Perform a set (last write wins) on extra
-        - Add hashmap key to pending flushes
-        """
-        # TODO(dcramer): longer term we'd rather not have to serialize values
-        # here (unless it's to JSON)
+    def _incr_pipeline(self, pipe, model, columns, filters, extra=None):
         key = self._make_key(model, filters)
         pending_key = self._make_pending_key_from_key(key)
-        # We can't use conn.map() due to wanting to support multiple pending
-        # keys (one per Redis partition)
-        conn = self.cluster.get_local_client_for_key(key)
 
-        pipe = conn.pipeline()
         pipe.hsetnx(key, 'm', '%s.%s' % (model.__module__, model.__name__))
         # TODO(dcramer): once this goes live in production, we can kill the pickle path
         # (this is to ensure a zero downtime deploy where we can transition event processing)
@@ -190,6 +177,25 @@ class RedisBuffer(Buffer):
                 # pipe.hset(key, 'e+' + column, json.dumps(self._dump_value(value)))
         pipe.expire(key, self.key_expire)
         pipe.zadd(pending_key, time(), key)
+
+    def incr(self, model, columns, filters, extra=None):
+        """
+        Increment the key by doing the following:
+
+        - Insert/update a hashmap based on (model, columns)
+            - Perform an incrby on counters
+            - Perform a set (last write wins) on extra
+        - Add hashmap key to pending flushes
+        """
+        # TODO(dcramer): longer term we'd rather not have to serialize values
+        # here (unless it's to JSON)
+        key = self._make_key(model, filters)
+        # We can't use conn.map() due to wanting to support multiple pending
+        # keys (one per Redis partition)
+        conn = self.cluster.get_local_client_for_key(key)
+
+        pipe = conn.pipeline()
+        self._incr_pipeline(pipe, model, columns, filters, extra)
         pipe.execute()
 
         metrics.incr('buffer.incr', skip_internal=True, tags={
@@ -197,6 +203,29 @@ class RedisBuffer(Buffer):
             'model': model.__name__,
         })
 
+    def incr_multi(self, items):
+        """
+        Perform many increments with a single pipeline per Redis host.
+        """
+        router = self.cluster.get_router()
+
+        pipes = {}
+        for model, columns, filters, extra in items:
+            host_id = router.get_host_for_key(self._make_key(model, filters))
+            pipe = pipes.get(host_id)
+            if pipe is None:
+                pipe = pipes[host_id] = self.cluster.get_local_client(host_id).pipeline()
+            self._incr_pipeline(pipe, model, columns, filters, extra)
+
+        for pipe in six.itervalues(pipes):
+            pipe.execute()
+
+        for model, count in six.iteritems(Counter(item[0] for item in items)):
+            metrics.incr('buffer.incr', amount=count, skip_internal=True, tags={
+                'module': model.__module__,
+                'model': model.__name__,
+            })
+
     def process_pending(self, partition=None):
         if partition is None and self.pending_partitions > 1:
             # If we're using partitions, this one task fans out into
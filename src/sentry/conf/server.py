@@ -993,6 +993,19 @@ SENTRY_SMTP_DISABLED_BACKENDS = frozenset(
     )
 )
 
+# The maximum number of messages sent by a single email task. The messages of
+# a send are split into batches of this size, and workers reuse their mail
+# connection across batches. With a value of one or less, every message is
+# sent by a task of its own.
+SENTRY_EMAIL_BATCH_SIZE = 50
+
+# The number of seconds a worker keeps an idle mail connection open.
+SENTRY_EMAIL_CONNECTION_MAX_IDLE = 30
+
+# The number of seconds a mail connection has to be idle before a worker
+# checks that the server did not close it, before sending over it again.
+SENTRY_EMAIL_CONNECTION_CHECK_INTERVAL = 5
+
 # Should users without superuser permissions be allowed to
 # make projects public
 SENTRY_ALLOW_PUBLIC_PROJECTS = True
@@ -1037,6 +1050,10 @@ CACHE_VERSION = 1
 SENTRY_DIGESTS = 'sentry.digests.backends.dummy.DummyBackend'
 SENTRY_DIGESTS_OPTIONS = {}
 
+# The number of ready timelines that are delivered by a single task. Set to 1
+# to deliver every timeline with its own task.
+SENTRY_DIGESTS_DELIVERY_BATCH_SIZE = 100
+
 # Quota backend
 SENTRY_QUOTAS = 'sentry.quotas.Quota'
 SENTRY_QUOTA_OPTIONS = {}
@@ -1051,10 +1068,33 @@ SENTRY_DEFAULT_MAX_EVENTS_PER_MINUTE = '90%'
 # Snuba configuration
 SENTRY_SNUBA = os.environ.get('SNUBA', 'http://localhost:1218')
 
+# Number of parsed search queries kept in memory by each process. Disabled
+# when 0.
+SENTRY_SEARCH_PARSE_CACHE_SIZE = 1000
+
+# Number of grouping components of stack frames kept in memory by each
+# process. Disabled when 0.
+SENTRY_GROUPING_COMPONENT_CACHE_SIZE = 10000
+
+# Seconds for which the access state of organization members (teams, projects,
+# SSO and permissions) is cached. Disabled when 0.
+SENTRY_ACCESS_CACHE_TTL = 3600
+
+# Number of member access states kept in memory by each process. Disabled
+# when 0.
+SENTRY_ACCESS_LOCAL_CACHE_SIZE = 1000
+
 # Node storage backend
 SENTRY_NODESTORE = 'sentry.nodestore.django.DjangoNodeStorage'
 SENTRY_NODESTORE_OPTIONS = {}
 
+# Node codec used to encode node data in the Django and Bigtable backends (see
+# ``sentry.nodestore.codec``), e.g.
+#   {'serializer': 'msgpack', 'compression': 'zstd', 'level': 3,
+#    'dictionary_path': '/var/lib/sentry/nodestore-dictionaries'}
+# When empty, the legacy formats are written. Both are always readable.
+SENTRY_NODESTORE_CODEC = {}
+
 # Tag storage backend
 _SENTRY_TAGSTORE_DEFAULT_MULTI_OPTIONS = {
     'backends': [
@@ -1301,6 +1341,10 @@ SENTRY_ROLES = (
 SENTRY_OPTIONS = {}
 SENTRY_DEFAULT_OPTIONS = {}
 
+# Load all options at once and cache them as a single snapshot, instead of
+# fetching every option on its own.
+SENTRY_OPTIONS_STORE_SNAPSHOT = False
+
 # You should not change this setting after your database has been created
 # unless you have altered all schemas first
 SENTRY_USE_BIG_INTS = False
@@ -1317,6 +1361,16 @@ SENTRY_ENCRYPTION_SCHEMES = (
 # Delay (in ms) to induce on API responses
 SENTRY_API_RESPONSE_DELAY = 150 if IS_DEV else None
 
+# API pagination
+# Number of seconds the hit counts of paginated queries are cached for, by
+# query. Disabled when 0.
+SENTRY_PAGINATOR_HITS_CACHE_TTL = 0
+
+# Skip counting hits of paginated queries (and report them as estimated
+# with the ``X-Hits-Estimated`` header) when PostgreSQL estimates far more
+# rows than would be counted.
+SENTRY_PAGINATOR_ESTIMATE_HITS = False
+
 # Watchers for various application purposes (such as compiling static media)
 # XXX(dcramer): this doesn't work outside of a source distribution as the
 # webpack.config.js is not part of Sentry's datafiles
@@ -1567,6 +1621,15 @@ KAFKA_CLUSTERS = {
     }
 }
 
+# When enabled, Kafka producers publish from a background delivery loop
+# instead of waiting for the broker after every message. Messages are batched
+# for up to ``KAFKA_PRODUCER_LINGER_MS`` (unless the cluster sets ``linger.ms``)
+# and publishing blocks for at most ``KAFKA_PRODUCER_BLOCK_TIMEOUT`` seconds
+# when the local queue is full. Pending messages are flushed at shutdown.
+KAFKA_PRODUCER_ASYNC = False
+KAFKA_PRODUCER_LINGER_MS = 5
+KAFKA_PRODUCER_BLOCK_TIMEOUT = 10.0
+
 KAFKA_PREPROCESS = 'events-preprocess'
 KAFKA_PROCESS = 'events-process'
 KAFKA_SAVE = 'events-save'
@@ -187,7 +187,7 @@ class ClientApiHelper(object):
         project = self.context and self.context.project
 
         if project and features.has('projects:kafka-ingest', project=project):
-            kafka.produce_sync(
+            kafka.produce(
                 settings.KAFKA_PREPROCESS,
                 value=json.dumps({
                     'cache_key': cache_key,
@@ -11,14 +11,75 @@ from sentry.utils import db
 
 
 class BulkDeleteQuery(object):
-    def __init__(self, model, project_id=None, dtfield=None, days=None, order_by=None):
+    def __init__(self, model, project_id=None, dtfield=None, days=None, order_by=None,
+                 id_range=None):
         self.model = model
         self.project_id = int(project_id) if project_id else None
         self.dtfield = dtfield
         self.days = int(days) if days is not None else None
         self.order_by = order_by
+        # Optional half-open ``(min_id, max_id)`` interval restricting the
+        # rows this query operates on, used to shard work across workers.
+        self.id_range = tuple(id_range) if id_range is not None else None
         self.using = router.db_for_write(model)
 
+    def get_id_range(self):
+        """
+        Returns the ``(min_id, max_id)`` bounds of the rows matched by this
+        query (ignoring any ``id_range``), or ``None`` if there are none.
+        """
+        from django.db.models import Max, Min
+
+        qs = BulkDeleteQuery(
+            model=self.model,
+            project_id=self.project_id,
+            dtfield=self.dtfield,
+            days=self.days,
+        ).get_generic_queryset()
+
+        result = qs.aggregate(min_id=Min('id'), max_id=Max('id'))
+        if result['min_id'] is None:
+            return None
+        return result['min_id'], result['max_id']
+
+    def shard(self, shards):
+        """
+        Split this query into up to ``shards`` queries over disjoint id
+        ranges which together cover all rows matched by this query.
+        """
+        assert shards >= 1
+        bounds = self.get_id_range()
+        if bounds is None:
+            return []
+
+        min_id, max_id = bounds
+        step = max(((max_id - min_id) // shards) + 1, 1)
+
+        return [
+            BulkDeleteQuery(
+                model=self.model,
+                project_id=self.project_id,
+                dtfield=self.dtfield,
+                days=self.days,
+                order_by=self.order_by,
+                id_range=(lower, min(lower + step, max_id + 1)),
+            ) for lower in range(min_id, max_id + 1, step)
+        ]
+
+    def get_kwargs(self):
+        """
+        Returns the arguments needed to rebuild this query, e.g. in another
+        process.
+        """
+        return {
+            'model': '.'.join((self.model.__module__, self.model.__name__)),
+            'project_id': self.project_id,
+            'dtfield': self.dtfield,
+            'days': self.days,
+            'order_by': self.order_by,
+            'id_range': self.id_range,
+        }
+
     def execute_postgres(self, chunk_size=10000):
         quote_name = connections[self.using].ops.quote_name
 
@@ -33,6 +94,8 @@ class BulkDeleteQuery(object):
             )
         if self.project_id:
             where.append(u"project_id = {}".format(self.project_id))
+        if self.id_range:
+            where.append(u"id >= {} and id < {}".format(*map(int, self.id_range)))
 
         if where:
             where_clause = u'where {}'.format(' and '.join(where))
@@ -72,11 +135,15 @@ class BulkDeleteQuery(object):
         return self._continuous_query(query)
 
     def _continuous_query(self, query):
+        deleted = 0
         results = True
         cursor = connections[self.using].cursor()
         while results:
             cursor.execute(query)
             results = cursor.rowcount > 0
+            if results:
+                deleted += cursor.rowcount
+        return deleted
 
     def execute_generic(self, chunk_size=100):
         qs = self.get_generic_queryset()
@@ -93,24 +160,32 @@ class BulkDeleteQuery(object):
                 qs = qs.filter(project=self.project_id)
             else:
                 qs = qs.filter(project_id=self.project_id)
+        if self.id_range:
+            qs = qs.filter(id__gte=self.id_range[0], id__lt=self.id_range[1])
 
         return qs
 
     def _continuous_generic_query(self, query, chunk_size):
         # XXX: we step through because the deletion collector will pull all
         # relations into memory
+        deleted = 0
         exists = True
         while exists:
             exists = False
             for item in query[:chunk_size].iterator():
                 item.delete()
+                deleted += 1
                 exists = True
+        return deleted
 
     def execute(self, chunk_size=10000):
+        """
+        Delete all matching rows, returning the number of rows deleted.
+        """
         if db.is_postgres():
-            self.execute_postgres(chunk_size)
+            return self.execute_postgres(chunk_size)
         else:
-            self.execute_generic(chunk_size)
+            return self.execute_generic(chunk_size)
 
     def iterator(self, chunk_size=100):
         if db.is_postgres():
@@ -153,6 +228,12 @@ class BulkDeleteQuery(object):
                             [self.project_id],
                         ))
 
+                    if self.id_range:
+                        where.append((
+                            "id >= %s and id < %s",
+                            list(self.id_range),
+                        ))
+
                     if self.order_by[0] == '-':
                         direction = 'desc'
                         order_field = self.order_by[1:]
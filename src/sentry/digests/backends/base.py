@@ -56,7 +56,9 @@ class Backend(Service):
     be preempted by a new record being added to the timeline, requiring it to
     be transitioned to "waiting" instead.)
     """
-    __all__ = ('add', 'delete', 'digest', 'enabled', 'maintenance', 'schedule', 'validate')
+    __all__ = (
+        'add', 'delete', 'digest', 'digest_many', 'enabled', 'maintenance', 'schedule', 'validate',
+    )
 
     def __init__(self, **options):
         # The ``minimum_delay`` option defines the default minimum amount of
@@ -159,6 +161,39 @@ class Backend(Service):
         """
         raise NotImplementedError
 
+    def digest_many(self, keys, minimum_delays=None):
+        """
+        Extract records from several timelines at once for processing.
+
+        This method acts as a context manager like ``digest``, but the target
+        of the ``as`` clause is a mapping of timeline key to the records of
+        that timeline. Timelines that cannot be digested (because they are not
+        in the ready state, or are being digested by someone else) are logged
+        and left out of the mapping.
+
+        ``minimum_delays`` is an optional mapping of timeline key to the
+        minimum delay of that timeline, the backend default is used for
+        timelines that are not contained in it.
+
+        If the context manager successfully exits, all timelines that are
+        still contained in the mapping are closed. Timelines that were removed
+        from the mapping keep their records (as if the ``digest`` context
+        manager raised an exception), which allows handling the failure of a
+        single timeline without giving up on all others::
+
+            with timelines.digest_many(keys) as digests:
+                for key, records in list(digests.items()):
+                    try:
+                        messages[key] = build_digest_email(records)
+                    except Exception:
+                        del digests[key]
+
+            for message in messages.values():
+                message.send_async()
+
+        """
+        raise NotImplementedError
+
     def schedule(self, deadline):
         """
         Identify timelines that are ready for processing.
@@ -16,6 +16,10 @@ class DummyBackend(Backend):
     def digest(self, key, minimum_delay=None):
         yield []
 
+    @contextmanager
+    def digest_many(self, keys, minimum_delays=None):
+        yield {key: [] for key in keys}
+
     def schedule(self, deadline):
         return
         yield  # make this a generator
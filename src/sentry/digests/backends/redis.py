@@ -4,11 +4,13 @@ import logging
 import six
 import time
 
+from collections import OrderedDict, defaultdict
 from contextlib import contextmanager
 from redis.client import ResponseError
 
 from sentry.digests import Record, ScheduleEntry
 from sentry.digests.backends.base import Backend, InvalidState
+from sentry.utils.locking import UnableToAcquireLock
 from sentry.utils.locking.backends.redis import RedisLockBackend
 from sentry.utils.locking.manager import LockManager
 from sentry.utils.redis import (check_cluster_versions, get_cluster_from_options, load_script)
@@ -18,6 +20,11 @@ logger = logging.getLogger('sentry.digests')
 
 script = load_script('digests/digests.lua')
 
+# ``digest_many`` holds the locks of all of its timelines until every digest
+# has been built, so the lock duration grows with the number of timelines.
+DIGEST_MANY_LOCK_DURATION = 30
+DIGEST_MANY_LOCK_DURATION_PER_TIMELINE = 3
+
 
 class RedisBackend(Backend):
     """
@@ -99,6 +106,11 @@ class RedisBackend(Backend):
             u'{}:t:{}'.format(self.namespace, key),
         )
 
+    def _get_host_for_key(self, key):
+        return self.cluster.get_router().get_host_for_key(
+            u'{}:t:{}'.format(self.namespace, key),
+        )
+
     def _get_timeline_lock(self, key, duration):
         lock_key = u'{}:t:{}'.format(self.namespace, key)
         return self.locks.get(
@@ -227,15 +239,7 @@ class RedisBackend(Backend):
                 else:
                     raise
 
-            records = map(
-                lambda key__value__timestamp: Record(
-                    key__value__timestamp[0],
-                    self.codec.decode(
-                        key__value__timestamp[1]) if key__value__timestamp[1] is not None else None,
-                    float(key__value__timestamp[2]),
-                ),
-                response,
-            )
+            records = self.__decode_records(response)
 
             # If the record value is `None`, this means the record data was
             # missing (it was presumably evicted by Redis) so we don't need to
@@ -252,6 +256,103 @@ class RedisBackend(Backend):
                 [record.key for record in records],
             )
 
+    def __decode_records(self, response):
+        return [
+            Record(
+                key,
+                self.codec.decode(value) if value is not None else None,
+                float(timestamp),
+            ) for key, value, timestamp in response
+        ]
+
+    @contextmanager
+    def digest_many(self, keys, minimum_delays=None, timestamp=None):
+        if minimum_delays is None:
+            minimum_delays = {}
+
+        if timestamp is None:
+            timestamp = time.time()
+
+        keys = list(keys)
+        duration = DIGEST_MANY_LOCK_DURATION + \
+            DIGEST_MANY_LOCK_DURATION_PER_TIMELINE * len(keys)
+
+        locks = []
+        try:
+            # Timelines are opened (and closed) with one pipelined request to
+            # every partition that contains any of them.
+            partitions = defaultdict(list)
+            for key in keys:
+                lock = self._get_timeline_lock(key, duration=duration)
+                try:
+                    lock.acquire()
+                except UnableToAcquireLock as error:
+                    logger.info('Skipped digest of %r: %s', key, error)
+                    continue
+                locks.append(lock)
+                partitions[self._get_host_for_key(key)].append(key)
+
+            records = {}
+            for host, partition_keys in six.iteritems(partitions):
+                pipeline = self.cluster.get_local_client(host).pipeline(transaction=False)
+                for key in partition_keys:
+                    script(
+                        pipeline, [key], [
+                            'DIGEST_OPEN',
+                            self.namespace,
+                            self.ttl,
+                            timestamp,
+                            key,
+                            self.capacity if self.capacity else -1,
+                        ]
+                    )
+
+                responses = pipeline.execute(raise_on_error=False)
+                for key, response in zip(partition_keys, responses):
+                    if isinstance(response, ResponseError):
+                        if 'err(invalid_state):' in six.text_type(response):
+                            logger.info(
+                                'Skipped digest of %r: Timeline is not in the ready state.', key)
+                        else:
+                            logger.error(
+                                'Failed to open digest %r due to error: %r', key, response)
+                        continue
+                    records[key] = self.__decode_records(response)
+
+            # See ``digest`` for why records without a value are left out.
+            digests = OrderedDict(
+                (key, [record for record in records[key] if record.value is not None])
+                for key in keys if key in records
+            )
+
+            yield digests
+
+            partitions = defaultdict(list)
+            for key in digests:
+                if key in records:
+                    partitions[self._get_host_for_key(key)].append(key)
+
+            for host, partition_keys in six.iteritems(partitions):
+                pipeline = self.cluster.get_local_client(host).pipeline(transaction=False)
+                for key in partition_keys:
+                    minimum_delay = minimum_delays.get(key)
+                    if minimum_delay is None:
+                        minimum_delay = self.minimum_delay
+                    script(
+                        pipeline,
+                        [key],
+                        ['DIGEST_CLOSE', self.namespace, self.ttl, timestamp, key, minimum_delay] +
+                        [record.key for record in records[key]],
+                    )
+
+                responses = pipeline.execute(raise_on_error=False)
+                for key, response in zip(partition_keys, responses):
+                    if isinstance(response, Exception):
+                        logger.error('Failed to close digest %r due to error: %r', key, response)
+        finally:
+            for lock in locks:
+                lock.release()
+
     def delete(self, key, timestamp=None):
         if timestamp is None:
             timestamp = time.time()
@@ -1,5 +1,6 @@
 from __future__ import absolute_import
 
+import copy
 import functools
 import itertools
 import logging
@@ -33,6 +34,26 @@ def split_key(key):
     return plugins.get(plugin_slug), Project.objects.get(pk=project_id)
 
 
+def split_keys(keys):
+    """
+    Like ``split_key``, for many keys at once. Returns a mapping of key to
+    ``(plugin, project)``, or to ``None`` if the project does not exist.
+    """
+    from sentry.plugins import plugins  # XXX
+    parsed = {}
+    for key in keys:
+        plugin_slug, _, project_id = key.split(':', 2)
+        parsed[key] = (plugin_slug, int(project_id))
+
+    projects = Project.objects.in_bulk(set(project_id for _, project_id in parsed.values()))
+
+    result = {}
+    for key, (plugin_slug, project_id) in six.iteritems(parsed):
+        project = projects.get(project_id)
+        result[key] = (plugins.get(plugin_slug), project) if project is not None else None
+    return result
+
+
 def unsplit_key(plugin, project):
     return u'{plugin.slug}:p:{project.id}'.format(plugin=plugin, project=project)
 
@@ -54,29 +75,59 @@ def event_to_record(event, rules):
 
 
 def fetch_state(project, records):
-    # This reads a little strange, but remember that records are returned in
-    # reverse chronological order, and we query the database in chronological
-    # order.
-    # NOTE: This doesn't account for any issues that are filtered out later.
-    start = records[-1].datetime
-    end = records[0].datetime
-
-    groups = Group.objects.in_bulk(record.value.event.group_id for record in records)
-    return {
-        'project':
-        project,
-        'groups':
-        groups,
-        'rules':
-        Rule.objects.
-        in_bulk(itertools.chain.from_iterable(record.value.rules for record in records)),
-        'event_counts':
-        tsdb.get_sums(tsdb.models.group, groups.keys(), start, end),
-        'user_counts':
-        tsdb.get_distinct_counts_totals(
-            tsdb.models.users_affected_by_group, groups.keys(), start, end
-        ),
-    }
+    return fetch_states([(project, records)])[0]
+
+
+def fetch_states(digests):
+    """
+    Fetch the state of several digests, given as a sequence of ``(project,
+    records)`` pairs. Groups and rules are queried at once for all of them.
+    """
+    group_ids = set()
+    rule_ids = set()
+    for project, records in digests:
+        group_ids.update(record.value.event.group_id for record in records)
+        rule_ids.update(itertools.chain.from_iterable(record.value.rules for record in records))
+
+    groups = Group.objects.in_bulk(group_ids)
+    rules = Rule.objects.in_bulk(rule_ids)
+
+    states = []
+    for project, records in digests:
+        # This reads a little strange, but remember that records are returned in
+        # reverse chronological order, and we query the database in chronological
+        # order.
+        # NOTE: This doesn't account for any issues that are filtered out later.
+        start = records[-1].datetime
+        end = records[0].datetime
+
+        # The state is attached to the instances when the digest is built, so
+        # every digest gets its own copies.
+        digest_groups = {}
+        for record in records:
+            id = record.value.event.group_id
+            if id in groups and id not in digest_groups:
+                digest_groups[id] = copy.copy(groups[id])
+
+        digest_rule_ids = set(
+            itertools.chain.from_iterable(record.value.rules for record in records))
+
+        states.append({
+            'project':
+            project,
+            'groups':
+            digest_groups,
+            'rules':
+            {id: copy.copy(rules[id]) for id in digest_rule_ids if id in rules},
+            'event_counts':
+            tsdb.get_sums(tsdb.models.group, digest_groups.keys(), start, end),
+            'user_counts':
+            tsdb.get_distinct_counts_totals(
+                tsdb.models.users_affected_by_group, digest_groups.keys(), start, end
+            ),
+        })
+
+    return states
 
 
 def attach_state(project, groups, rules, event_counts, user_counts):
@@ -31,11 +31,8 @@ def get_personalized_digests(project_id, digest, user_ids):
     """
     get_personalized_digests(project_id: Int, digest: Digest, user_ids: Set[Int]) -> Iterator[user_id: Int, digest: Digest]
     """
-    # TODO(LB): I Know this is inefficent.
-    # In the case that ProjectOwnership does exist, I do the same query twice.
-    # Once with this statement and again with the call to ProjectOwnership.get_actors()
-    # Will follow up with another PR to reduce the number of queries.
-    if ProjectOwnership.objects.filter(project_id=project_id).exists():
+    ownership, __ = ProjectOwnership.get_ownership_cached(project_id)
+    if ownership is not None:
         events = get_event_from_groups_in_digest(digest)
         events_by_actor = build_events_by_actor(project_id, events, user_ids)
         events_by_user = convert_actors_to_users(events_by_actor, user_ids)
@@ -84,10 +81,8 @@ def build_events_by_actor(project_id, events, user_ids):
     """
     events_by_actor = defaultdict(set)
     for event in events:
-        # TODO(LB): I Know this is inefficent.
-        # ProjectOwnership.get_owners is O(n) queries and I'm doing that O(len(events)) times
-        # I will create a follow-up PR to address this method's efficency problem
-        # Just wanted to make as few changes as possible for now.
+        # ProjectOwnership.get_owners works off the cached, compiled rule
+        # index and memoized actors, so calling it per event is cheap.
         actors, __ = ProjectOwnership.get_owners(project_id, event.data)
         if actors == ProjectOwnership.Everyone:
             actors = [Actor(user_id, User) for user_id in user_ids]
@@ -38,7 +38,9 @@ class KafkaEventStream(SnubaProtocolEventStream):
         # interfering with request handling. (This does `poll` does not act as
         # a heartbeat for the purposes of any sort of session expiration.)
         # Note that this call to poll() is *only* dealing with earlier
-        # asynchronous produce() calls from the same process.
+        # asynchronous produce() calls from the same process. When
+        # ``KAFKA_PRODUCER_ASYNC`` is enabled, the producer is already polled
+        # by a background thread and this call returns immediately.
         self.producer.poll(0.0)
 
         assert isinstance(extra_data, tuple)
@@ -95,6 +95,18 @@ class GroupingComponent(object):
         if contributes is not None:
             self.contributes = contributes
 
+    def copy(self):
+        """Returns a copy of the component and all of its subcomponents."""
+        return GroupingComponent(
+            id=self.id,
+            hint=self.hint,
+            contributes=self.contributes,
+            values=[
+                value.copy() if isinstance(value, GroupingComponent) else value
+                for value in self.values
+            ],
+        )
+
     def iter_values(self):
         """Recursively walks the component and flattens it into a list of
         values.
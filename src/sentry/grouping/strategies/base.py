@@ -1,6 +1,11 @@
 from __future__ import absolute_import
 
 import inspect
+import threading
+
+from collections import OrderedDict
+
+from django.conf import settings
 
 from sentry.grouping.component import GroupingComponent
 
@@ -8,6 +13,54 @@ from sentry.grouping.component import GroupingComponent
 STRATEGIES = {}
 
 
+class ComponentCache(object):
+    """A process wide, least recently used cache of grouping components.
+
+    Components are updated by the strategies that use them, so the cache
+    keeps its own copy of every component and hands out copies of it.
+    """
+
+    def __init__(self, max_size=None):
+        self._max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self):
+        if self._max_size is None:
+            return settings.SENTRY_GROUPING_COMPONENT_CACHE_SIZE
+        return self._max_size
+
+    def get_or_create(self, key, factory):
+        max_size = self.max_size
+        if not max_size:
+            return factory()
+
+        with self._lock:
+            component = self._items.pop(key, None)
+            if component is not None:
+                # re-insert to mark this as the most recently used component
+                self._items[key] = component
+                return component.copy()
+
+        component = factory()
+        if component is None:
+            return None
+
+        with self._lock:
+            self._items[key] = component.copy()
+            while len(self._items) > max_size:
+                self._items.popitem(last=False)
+        return component
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+component_cache = ComponentCache()
+
+
 def strategy(id, variants, interfaces, name=None, score=None):
     """Registers a strategy"""
     if name is None:
@@ -55,6 +108,7 @@ class Strategy(object):
         self.score = score
         self.func = func
         self.variant_processor_func = None
+        self.cache_key_func = None
 
     def __repr__(self):
         return '<%s id=%r variants=%r>' % (
@@ -73,6 +127,14 @@ class Strategy(object):
         return func(*args, **kwargs)
 
     def __call__(self, *args, **kwargs):
+        if self.cache_key_func is not None:
+            key = self._invoke(self.cache_key_func, *args, **kwargs)
+            if key is not None:
+                config = kwargs.get('config') or NOTHING_CONFIG
+                return component_cache.get_or_create(
+                    (config.id, self.id, kwargs.get('variant'), key),
+                    lambda: self._invoke(self.func, *args, **kwargs),
+                )
         return self._invoke(self.func, *args, **kwargs)
 
     def variant_processor(self, func):
@@ -82,6 +144,15 @@ class Strategy(object):
         self.variant_processor_func = func
         return func
 
+    def cache_key(self, func):
+        """Registers a function that returns the key under which the
+        components created by this strategy are cached (or `None` to not
+        cache a component).  The key must contain everything the strategy
+        looks at, apart from the configuration and variant.
+        """
+        self.cache_key_func = func
+        return func
+
     def get_grouping_component(self, event, variant, config=None):
         """Given a specific variant this calculates the grouping component.
         """
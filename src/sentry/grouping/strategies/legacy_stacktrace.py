@@ -328,6 +328,20 @@ def frame_legacy(frame, event, **meta):
     )
 
 
+@frame_legacy.cache_key
+def frame_legacy_cache_key(frame, event, **meta):
+    return (
+        frame.platform or event.platform,
+        frame.filename,
+        frame.abs_path,
+        frame.module,
+        frame.function,
+        frame.context_line,
+        frame.symbol,
+        frame.lineno,
+    )
+
+
 @strategy(
     id='stacktrace:legacy',
     interfaces=['stacktrace'],
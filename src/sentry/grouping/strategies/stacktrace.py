@@ -300,6 +300,17 @@ def frame_v1(frame, event, **meta):
     )
 
 
+@frame_v1.cache_key
+def frame_v1_cache_key(frame, event, **meta):
+    return (
+        frame.platform or event.platform,
+        frame.filename,
+        frame.abs_path,
+        frame.module,
+        frame.function,
+    )
+
+
 @strategy(
     id='stacktrace:v1',
     interfaces=['stacktrace'],
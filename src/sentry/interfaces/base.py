@@ -1,5 +1,6 @@
 from __future__ import absolute_import
 
+import collections
 import os
 
 from collections import OrderedDict
@@ -43,31 +44,93 @@ def get_interface(name):
     return interface
 
 
-def get_interfaces(data, rust_renormalized=RUST_RENORMALIZED_DEFAULT):
-    result = []
-    for key, data in six.iteritems(data):
-        # Skip invalid interfaces that were nulled out during normalization
-        if data is None:
-            continue
+def _to_python(key, data, rust_renormalized):
+    # Skip invalid interfaces that were nulled out during normalization
+    if data is None:
+        return None
 
-        try:
-            cls = get_interface(key)
-        except ValueError:
-            continue
+    try:
+        cls = get_interface(key)
+    except ValueError:
+        return None
+
+    value = safe_execute(cls.to_python, data,
+                         rust_renormalized=rust_renormalized,
+                         _with_transaction=False)
+    if not value:
+        return None
 
-        value = safe_execute(cls.to_python, data,
-                             rust_renormalized=rust_renormalized,
-                             _with_transaction=False)
-        if not value:
-            continue
+    return value
 
-        result.append((key, value))
+
+def get_interfaces(data, rust_renormalized=RUST_RENORMALIZED_DEFAULT):
+    result = []
+    for key, data in six.iteritems(data):
+        value = _to_python(key, data, rust_renormalized)
+        if value is not None:
+            result.append((key, value))
 
     return OrderedDict(
         (k, v) for k, v in sorted(result, key=lambda x: x[1].get_score(), reverse=True)
     )
 
 
+class InterfaceView(collections.Mapping):
+    """
+    A lazy version of ``get_interfaces``.
+
+    Interfaces are only built when they are first accessed, and then cached.
+    Looking up a single interface does not build any of the others; they are
+    all built (and sorted by score) when the view is iterated.
+    """
+
+    def __init__(self, data, rust_renormalized=RUST_RENORMALIZED_DEFAULT):
+        self.data = data
+        self.rust_renormalized = rust_renormalized
+        self._interfaces = {}
+        self._keys = None
+
+    def _get(self, key):
+        try:
+            return self._interfaces[key]
+        except KeyError:
+            pass
+
+        value = self._interfaces[key] = _to_python(
+            key, self.data.get(key), self.rust_renormalized)
+        return value
+
+    def _get_keys(self):
+        if self._keys is None:
+            result = []
+            for key in list(self.data):
+                value = self._get(key)
+                if value is not None:
+                    result.append((key, value))
+            self._keys = [
+                k for k, v in sorted(result, key=lambda x: x[1].get_score(), reverse=True)
+            ]
+        return self._keys
+
+    def __getitem__(self, key):
+        value = self._get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self._get(key) is not None
+
+    def __iter__(self):
+        return iter(self._get_keys())
+
+    def __len__(self):
+        return len(self._get_keys())
+
+    def __repr__(self):
+        return '<InterfaceView: %r>' % (list(self.data), )
+
+
 def prune_empty_keys(obj):
     if obj is None:
         return None
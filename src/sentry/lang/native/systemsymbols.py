@@ -2,30 +2,112 @@ from __future__ import absolute_import
 
 import time
 import logging
+import threading
 
+from collections import OrderedDict
+
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
 
 from sentry import options
 from sentry.net.http import Session
 from sentry.lang.native.utils import sdk_info_to_sdk_id
+from sentry.utils import metrics
+from sentry.utils.cache import cache
+from sentry.utils.hashlib import md5_text
 
 MAX_ATTEMPTS = 3
 
+# System symbols never change for a given object and address, so matches are
+# kept for long.  Misses are kept for less time, as the symbol server might
+# learn about new SDKs.
+CACHE_TTL = 86400
+NEGATIVE_CACHE_TTL = 3600
+
+LOCAL_CACHE_SIZE = 10000
+LOCAL_CACHE_TTL = 300
+
+# Stored for lookups without a match, as the cache returns `None` for keys it
+# does not know.
+_MISSING = False
+
 logger = logging.getLogger(__name__)
 
 
-def lookup_system_symbols(symbols, sdk_info=None, cpu_name=None):
-    """Looks for system symbols in the configured system server if
-    enabled.  If this failes or the server is disabled, `None` is
-    returned.
+class LocalSymbolCache(object):
     """
-    if not options.get('symbolserver.enabled'):
-        return
+    A least recently used cache of symbol lookups in the current process.
+    """
+
+    def __init__(self, max_size=LOCAL_CACHE_SIZE, ttl=LOCAL_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.time()
+        rv = {}
+        with self._lock:
+            for key in keys:
+                item = self._items.pop(key, None)
+                if item is None or item[1] < now:
+                    continue
+                # re-insert to mark this as the most recently used item
+                self._items[key] = item
+                rv[key] = item[0]
+        return rv
+
+    def set_many(self, values):
+        expires = time.time() + self.ttl
+        with self._lock:
+            for key, value in values.items():
+                self._items.pop(key, None)
+                self._items[key] = (value, expires)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+local_cache = LocalSymbolCache()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Returns the session that is shared by all lookups of this process, so
+    that connections to the symbol server are kept alive and reused.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=10)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def get_cache_key(sdk_id, cpu_name, symbol):
+    return 'symbolserver:%s' % md5_text(u'%s|%s|%s|%s' % (
+        sdk_id, cpu_name, symbol['object_uuid'], symbol['addr'],
+    )).hexdigest()
 
+
+def _request_system_symbols(sdk_id, cpu_name, symbols):
+    """Posts the symbols to the symbol server.  Returns a list of matches (or
+    `None` for every symbol if the server does not know the SDK), or `None`
+    if the server could not be reached.
+    """
     url = '%s/lookup' % options.get('symbolserver.options')['url'].rstrip('/')
-    sess = Session()
     symbol_query = {
-        'sdk_id': sdk_info_to_sdk_id(sdk_info),
+        'sdk_id': sdk_id,
         'cpu_name': cpu_name,
         'symbols': symbols,
     }
@@ -33,21 +115,87 @@ def lookup_system_symbols(symbols, sdk_info=None, cpu_name=None):
     attempts = 0
     wait = 0.5
 
-    with sess:
-        while 1:
-            try:
-                rv = sess.post(url, json=symbol_query)
-                # If the symbols server does not know about the SDK at all
-                # it will report a 404 here.  In that case just assume
-                # that we did not find a match and do not retry.
-                if rv.status_code == 404:
-                    return None
-                rv.raise_for_status()
-                return rv.json()['symbols']
-            except (IOError, RequestException):
-                attempts += 1
-                if attempts > MAX_ATTEMPTS:
-                    logger.error('Failed to contact system symbol server', exc_info=True)
-                    return
-                time.sleep(wait)
-                wait *= 2.0
+    while 1:
+        try:
+            rv = get_session().post(url, json=symbol_query)
+            # If the symbols server does not know about the SDK at all
+            # it will report a 404 here.  In that case just assume
+            # that we did not find a match and do not retry.
+            if rv.status_code == 404:
+                return [None] * len(symbols)
+            rv.raise_for_status()
+            return rv.json()['symbols']
+        except (IOError, RequestException):
+            attempts += 1
+            if attempts > MAX_ATTEMPTS:
+                logger.error('Failed to contact system symbol server', exc_info=True)
+                return None
+            time.sleep(wait)
+            wait *= 2.0
+
+
+def lookup_system_symbols(symbols, sdk_info=None, cpu_name=None):
+    """Looks for system symbols in the configured system server if
+    enabled.  If this failes or the server is disabled, `None` is
+    returned.
+
+    Results (including misses) are cached in the local process and in the
+    default cache by SDK, CPU, object and address.  Only symbols that are in
+    neither cache are sent to the symbol server, and each of them only once.
+    """
+    if not options.get('symbolserver.enabled'):
+        return
+
+    sdk_id = sdk_info_to_sdk_id(sdk_info)
+    keys = [get_cache_key(sdk_id, cpu_name, symbol) for symbol in symbols]
+    unique_keys = set(keys)
+
+    results = local_cache.get_many(unique_keys)
+    local_hits = len(results)
+
+    missing = [key for key in unique_keys if key not in results]
+    if missing:
+        cached = cache.get_many(missing)
+        if cached:
+            local_cache.set_many(cached)
+            results.update(cached)
+
+    to_lookup = OrderedDict()
+    for key, symbol in zip(keys, symbols):
+        if key not in results and key not in to_lookup:
+            to_lookup[key] = symbol
+
+    for source, count in (
+        ('local', local_hits),
+        ('cache', len(results) - local_hits),
+        ('server', len(to_lookup)),
+    ):
+        if count:
+            metrics.incr('symbolserver.lookup', amount=count, tags={
+                'source': source,
+            }, skip_internal=True)
+
+    if to_lookup:
+        rv = _request_system_symbols(sdk_id, cpu_name, list(to_lookup.values()))
+        if rv is None:
+            return None
+
+        found = {}
+        not_found = {}
+        for key, symbol in zip(to_lookup, rv):
+            if symbol is None:
+                not_found[key] = _MISSING
+            else:
+                found[key] = symbol
+
+        if found:
+            cache.set_many(found, CACHE_TTL)
+        if not_found:
+            cache.set_many(not_found, NEGATIVE_CACHE_TTL)
+
+        local_cache.set_many(found)
+        local_cache.set_many(not_found)
+        results.update(found)
+        results.update(not_found)
+
+    return [results.get(key) or None for key in keys]
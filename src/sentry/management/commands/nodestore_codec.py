@@ -0,0 +1,120 @@
+"""
+sentry.management.commands.nodestore_codec
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2010-2019 by the Sentry Team, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+"""
+from __future__ import absolute_import, print_function
+
+import os
+import time
+import zlib
+
+from django.core.management.base import BaseCommand, CommandError, make_option
+
+from sentry.models import Event
+from sentry.nodestore.codec import (
+    DICTIONARY_EXTENSION, GLOBAL_DICTIONARY, SERIALIZERS, NodeCodec, get_dictionary_id, zstandard
+)
+from sentry.utils.compat import pickle
+
+
+class Command(BaseCommand):
+    help = 'Measure node codecs on a sample of recent events, and train compression dictionaries.'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--project', dest='project', type=int,
+                    help='Only sample events of this project.'),
+        make_option('--sample', dest='sample', type=int, default=1000,
+                    help='Number of recent events to sample (default 1000).'),
+        make_option('--level', dest='level', type=int, default=3,
+                    help='Compression level for zstd (default 3).'),
+        make_option('--dict-size', dest='dict_size', type=int, default=112640,
+                    help='Size in bytes of trained dictionaries (default 110KB).'),
+        make_option('--output', dest='output', type='string',
+                    help='Write the trained dictionary to this directory, named '
+                         'after the project (or "global").'),
+    )
+
+    def get_sample(self, project_id, size):
+        queryset = Event.objects.all()
+        if project_id is not None:
+            queryset = queryset.filter(project_id=project_id)
+        events = list(queryset.order_by('-id')[:size])
+        Event.objects.bind_nodes(events, 'data')
+        return [dict(event.data.data.items()) for event in events if event.data.data]
+
+    def measure(self, name, encode, decode, sample):
+        start = time.time()
+        encoded = [encode(data) for data in sample]
+        encode_time = time.time() - start
+
+        start = time.time()
+        for value in encoded:
+            decode(value)
+        decode_time = time.time() - start
+
+        raw_size = sum(len(pickle.dumps(data, pickle.HIGHEST_PROTOCOL)) for data in sample)
+        size = sum(len(value) for value in encoded)
+
+        self.stdout.write('%-32s %10d %8.2f %12.1f %12.1f\n' % (
+            name,
+            size,
+            float(raw_size) / size if size else 0,
+            len(sample) / encode_time if encode_time else 0,
+            len(sample) / decode_time if decode_time else 0,
+        ))
+
+    def handle(self, **options):
+        sample = self.get_sample(options['project'], options['sample'])
+        if len(sample) < 2:
+            raise CommandError('Not enough events to sample.')
+
+        # Train on one half of the sample and measure on the other, so that a
+        # dictionary is not evaluated on the exact data it was built from.
+        training, testing = sample[::2], sample[1::2]
+
+        self.stdout.write('Sampled %d events.\n\n' % len(sample))
+        self.stdout.write('%-32s %10s %8s %12s %12s\n' % (
+            'codec', 'bytes', 'ratio', 'encode/s', 'decode/s'))
+
+        self.measure(
+            'pickle+zlib (legacy)',
+            lambda data: zlib.compress(pickle.dumps(data)),
+            lambda value: pickle.loads(zlib.decompress(value)),
+            testing,
+        )
+
+        codecs = [
+            ('msgpack+zlib', NodeCodec('msgpack', 'zlib')),
+        ]
+
+        dictionary = None
+        if zstandard is None:
+            self.stderr.write('zstandard is not installed, skipping zstd codecs.\n')
+        else:
+            codecs.append(('msgpack+zstd', NodeCodec('msgpack', 'zstd', level=options['level'])))
+
+            serialize = SERIALIZERS['msgpack'].dumps
+            dictionary = zstandard.train_dictionary(
+                options['dict_size'],
+                [serialize(data) for data in training],
+                level=options['level'],
+            ).as_bytes()
+            codecs.append(('msgpack+zstd+dictionary', NodeCodec(
+                'msgpack', 'zstd', level=options['level'],
+                dictionaries={GLOBAL_DICTIONARY: (get_dictionary_id(dictionary), dictionary)},
+            )))
+
+        for name, codec in codecs:
+            self.measure(name, codec.encode, codec.decode, testing)
+
+        if options['output']:
+            if dictionary is None:
+                raise CommandError('Training dictionaries requires zstandard.')
+            name = '%s%s' % (options['project'] or GLOBAL_DICTIONARY, DICTIONARY_EXTENSION)
+            path = os.path.join(options['output'], name)
+            with open(path, 'wb') as f:
+                f.write(dictionary)
+            self.stdout.write('\nWrote %d byte dictionary to %s\n' % (len(dictionary), path))
@@ -33,7 +33,7 @@ from sentry.db.models import (
     sane_repr
 )
 from sentry.db.models.manager import EventManager
-from sentry.interfaces.base import get_interfaces
+from sentry.interfaces.base import InterfaceView
 from sentry.utils import metrics
 from sentry.utils.cache import memoize
 from sentry.utils.canonical import CanonicalKeyDict, CanonicalKeyView
@@ -112,7 +112,7 @@ class EventCommon(object):
     def get_interfaces(self):
         was_renormalized = _should_skip_to_python(self.data)
 
-        return CanonicalKeyView(get_interfaces(self.data, rust_renormalized=was_renormalized))
+        return CanonicalKeyView(InterfaceView(self.data, rust_renormalized=was_renormalized))
 
     @memoize
     def interfaces(self):
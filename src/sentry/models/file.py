@@ -11,11 +11,14 @@ from __future__ import absolute_import
 import os
 import six
 import mmap
+import bisect
+import itertools
 import tempfile
 
+from collections import deque
 from hashlib import sha1
 from uuid import uuid4
-from threading import Semaphore
+from threading import Lock, Semaphore
 from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 
@@ -40,8 +43,20 @@ UPLOAD_RETRY_TIME = getattr(settings, 'SENTRY_UPLOAD_RETRY_TIME', 60)  # 1min
 DEFAULT_BLOB_SIZE = 1024 * 1024  # one mb
 CHUNK_STATE_HEADER = '__state'
 MULTI_BLOB_UPLOAD_CONCURRENCY = 8
+MULTI_BLOB_FETCH_CONCURRENCY = 8
 MAX_FILE_SIZE = 2 ** 31  # 2GB is the maximum offset supported by fileblob
 
+# Number of blobs fetched ahead of the current read position when reading
+# chunked files without prefetching.  0 disables read-ahead.
+DEFAULT_BLOB_READAHEAD = getattr(settings, 'SENTRY_FILE_BLOB_READAHEAD', 0)
+
+# Optional local directory holding blobs by checksum.  Blobs found there
+# are memory mapped instead of being fetched from the filestore, and blobs
+# fetched or uploaded are written there.  Once the directory grows past
+# ``BLOB_CACHE_MAX_SIZE`` bytes the least recently used blobs are evicted.
+BLOB_CACHE_DIR = getattr(settings, 'SENTRY_FILE_BLOB_CACHE_DIR', None)
+BLOB_CACHE_MAX_SIZE = getattr(settings, 'SENTRY_FILE_BLOB_CACHE_MAX_SIZE', 2 ** 30)
+
 
 class nooplogger(object):
     debug = staticmethod(lambda *a, **kw: None)
@@ -162,6 +177,12 @@ class FileBlob(Model):
             blob.path = cls.generate_unique_path()
             storage = get_storage()
             storage.save(blob.path, fileobj)
+            if BLOB_CACHE_DIR:
+                # Keep a local copy so that assembling the file right after
+                # the upload does not have to fetch the chunk again.  This
+                # counts towards the cache size limit like any other blob.
+                fileobj.seek(0)
+                _store_cached_blob(blob, fileobj.read())
             blobs_to_save.append((blob, lock))
             metrics.timing('filestore.blob-size', size, tags={'function': 'from_files'})
             logger.info(
@@ -352,7 +373,7 @@ class File(Model):
         db_table = 'sentry_file'
 
     def _get_chunked_blob(self, mode=None, prefetch=False,
-                          prefetch_to=None, delete=True):
+                          prefetch_to=None, delete=True, readahead=None):
         return ChunkedFileBlobIndexWrapper(
             FileBlobIndex.objects.filter(
                 file=self,
@@ -360,10 +381,11 @@ class File(Model):
             mode=mode,
             prefetch=prefetch,
             prefetch_to=prefetch_to,
-            delete=delete
+            delete=delete,
+            readahead=readahead,
         )
 
-    def getfile(self, mode=None, prefetch=False, as_tempfile=False):
+    def getfile(self, mode=None, prefetch=False, as_tempfile=False, readahead=None):
         """Returns a file object.  By default the file is fetched on
         demand but if prefetch is enabled the file is fully prefetched
         into a tempfile before reading can happen.
@@ -371,10 +393,14 @@ class File(Model):
         Additionally if `as_tempfile` is passed a NamedTemporaryFile is
         returned instead which can help in certain situations where a
         tempfile is necessary.
+
+        When reading on demand, `readahead` controls how many of the
+        following blobs are fetched concurrently in the background.  It
+        defaults to `SENTRY_FILE_BLOB_READAHEAD`.
         """
         if as_tempfile:
             prefetch = True
-        impl = self._get_chunked_blob(mode, prefetch)
+        impl = self._get_chunked_blob(mode, prefetch, readahead=readahead)
         if as_tempfile:
             return impl.detach_tempfile()
         return FileObj(impl, self.name)
@@ -446,30 +472,43 @@ class File(Model):
         This creates a file, from file blobs and returns a temp file with the
         contents.
         """
+        positions = {blob_id: i for i, blob_id in enumerate(file_blob_ids)}
+        file_blobs = sorted(
+            FileBlob.objects.filter(id__in=file_blob_ids),
+            key=lambda blob: positions[blob.id],
+        )
+        return self.assemble_from_file_blobs(file_blobs, checksum, commit=commit)
+
+    def assemble_from_file_blobs(self, file_blobs, checksum, commit=True):
+        """
+        This creates a file from an ordered list of file blobs and returns a
+        temp file with the contents.
+
+        Blobs are fetched concurrently, while the checksum is computed and
+        the temp file is written in order as the contents arrive.
+        """
         tf = tempfile.NamedTemporaryFile()
-        with transaction.atomic():
-            file_blobs = FileBlob.objects.filter(id__in=file_blob_ids).all()
-            # Make sure the blobs are sorted with the order provided
-            file_blobs = sorted(file_blobs, key=lambda blob: file_blob_ids.index(blob.id))
-
-            new_checksum = sha1(b'')
-            offset = 0
-            for blob in file_blobs:
-                FileBlobIndex.objects.create(
-                    file=self,
-                    blob=blob,
-                    offset=offset,
-                )
-                for chunk in blob.getfile().chunks():
-                    new_checksum.update(chunk)
-                    tf.write(chunk)
-                offset += blob.size
-
-            self.size = offset
-            self.checksum = new_checksum.hexdigest()
-
-            if checksum != self.checksum:
-                raise AssembleChecksumMismatch('Checksum mismatch')
+
+        new_checksum = sha1(b'')
+        offset = 0
+        indexes = []
+        for blob, contents in _iter_blob_contents(file_blobs):
+            indexes.append(FileBlobIndex(
+                file=self,
+                blob=blob,
+                offset=offset,
+            ))
+            new_checksum.update(contents)
+            tf.write(contents)
+            offset += blob.size
+
+        self.size = offset
+        self.checksum = new_checksum.hexdigest()
+
+        if checksum != self.checksum:
+            raise AssembleChecksumMismatch('Checksum mismatch')
+
+        FileBlobIndex.objects.bulk_create(indexes)
 
         metrics.timing('filestore.file-size', offset)
         if commit:
@@ -492,13 +531,181 @@ class FileBlobIndex(Model):
         unique_together = (('file', 'blob', 'offset'), )
 
 
+class MappedBlobFile(object):
+    """
+    A read-only file-like object over a memory mapped blob.  ``read`` returns
+    a copy of the requested range; unlike blobs fetched from the filestore,
+    the blob is not loaded into memory up front.
+    """
+
+    def __init__(self, mem):
+        self._mem = mem
+        self._pos = 0
+
+    def read(self, n=-1):
+        end = len(self._mem) if n < 0 else self._pos + n
+        rv = self._mem[self._pos:end]
+        self._pos += len(rv)
+        return rv
+
+    def seek(self, pos):
+        self._pos = pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        self._mem.close()
+
+
+def _get_blob_cache_path(blob):
+    if not BLOB_CACHE_DIR:
+        return None
+    return os.path.join(BLOB_CACHE_DIR, blob.checksum)
+
+
+def _open_cached_blob(blob):
+    """Memory maps a blob from the local blob cache if it is present."""
+    path = _get_blob_cache_path(blob)
+    if path is None or not blob.size:
+        return None
+
+    try:
+        with open(path, 'rb') as f:
+            mem = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (IOError, OSError, ValueError):
+        return None
+
+    if len(mem) != blob.size:
+        mem.close()
+        return None
+
+    # Eviction is by last use.  Atime is often not updated on read (noatime,
+    # relatime), so bump the timestamps explicitly on every hit.
+    try:
+        os.utime(path, None)
+    except (IOError, OSError):
+        pass
+    return MappedBlobFile(mem)
+
+
+_blob_cache_lock = Lock()
+_blob_cache_written = [0]
+
+
+def _prune_blob_cache(max_size=None):
+    """
+    Evicts the least recently used blobs from the local blob cache until it
+    is at most ``max_size`` bytes large.
+    """
+    if max_size is None:
+        max_size = BLOB_CACHE_MAX_SIZE
+
+    entries = []
+    total = 0
+    try:
+        names = os.listdir(BLOB_CACHE_DIR)
+    except (IOError, OSError):
+        return
+    for name in names:
+        if name.startswith('.'):
+            continue
+        path = os.path.join(BLOB_CACHE_DIR, name)
+        try:
+            st = os.stat(path)
+        except (IOError, OSError):
+            continue
+        entries.append((max(st.st_atime, st.st_mtime), st.st_size, path))
+        total += st.st_size
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_size:
+            break
+        try:
+            os.unlink(path)
+        except (IOError, OSError):
+            continue
+        total -= size
+
+
+def _store_cached_blob(blob, contents):
+    path = _get_blob_cache_path(blob)
+    if path is None or not contents:
+        return
+
+    try:
+        with tempfile.NamedTemporaryFile(dir=BLOB_CACHE_DIR, prefix='._blob-',
+                                         delete=False) as f:
+            f.write(contents)
+        os.rename(f.name, path)
+    except (IOError, OSError):
+        return
+
+    # Listing the directory is not free, so only prune after another tenth
+    # of the maximum size has been written.
+    with _blob_cache_lock:
+        _blob_cache_written[0] += len(contents)
+        if _blob_cache_written[0] * 10 < BLOB_CACHE_MAX_SIZE:
+            return
+        _blob_cache_written[0] = 0
+        _prune_blob_cache()
+
+
+def _fetch_blob(blob):
+    """
+    Opens a blob for reading, from the local blob cache if possible.
+    Otherwise the blob is read into memory from the filestore entirely and
+    added to the local blob cache.
+    """
+    rv = _open_cached_blob(blob)
+    if rv is not None:
+        return rv
+
+    with blob.getfile() as f:
+        contents = f.read()
+    _store_cached_blob(blob, contents)
+    return six.BytesIO(contents)
+
+
+def _read_blob(blob):
+    f = _fetch_blob(blob)
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+
+def _iter_blob_contents(blobs, concurrency=MULTI_BLOB_FETCH_CONCURRENCY):
+    """
+    Yields ``(blob, contents)`` for all blobs in the given order, while up
+    to ``concurrency`` of the following blobs are fetched in the background.
+    """
+    blobs = iter(blobs)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=concurrency) as exe:
+        for blob in itertools.islice(blobs, concurrency):
+            pending.append((blob, exe.submit(_read_blob, blob)))
+
+        while pending:
+            blob, future = pending.popleft()
+            for next_blob in itertools.islice(blobs, 1):
+                pending.append((next_blob, exe.submit(_read_blob, next_blob)))
+            yield blob, future.result()
+
+
 class ChunkedFileBlobIndexWrapper(object):
     def __init__(self, indexes, mode=None, prefetch=False,
-                 prefetch_to=None, delete=True):
+                 prefetch_to=None, delete=True, readahead=None):
         # eager load from database incase its a queryset
         self._indexes = list(indexes)
+        self._offsets = [idx.offset for idx in self._indexes]
         self._curfile = None
         self._curidx = None
+        self._curpos = None
+        self._readahead = DEFAULT_BLOB_READAHEAD if readahead is None else readahead
+        self._pending = {}
+        self._executor = None
         if prefetch:
             self.prefetched = True
             self._prefetch(prefetch_to, delete)
@@ -522,20 +729,60 @@ class ChunkedFileBlobIndexWrapper(object):
         rv.seek(0)
         return rv
 
-    def _nextidx(self):
+    def _open_blob(self, pos):
+        future = self._pending.pop(pos, None)
+        if future is not None:
+            return future.result()
+        blob = self._indexes[pos].blob
+        if self._readahead or BLOB_CACHE_DIR:
+            return _fetch_blob(blob)
+        return blob.getfile()
+
+    def _schedule_readahead(self, pos):
+        # Drop fetches which are no longer ahead of the read position, e.g.
+        # after seeking backwards or far ahead.
+        window = range(pos + 1, min(pos + 1 + self._readahead, len(self._indexes)))
+        for stale in [p for p in self._pending if p not in window]:
+            self._discard_pending(self._pending.pop(stale))
+
+        if not window:
+            return
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._readahead)
+        for p in window:
+            if p not in self._pending:
+                self._pending[p] = self._executor.submit(_fetch_blob, self._indexes[p].blob)
+
+    def _discard_pending(self, future):
+        def _close_result(future):
+            if not future.cancelled() and future.exception() is None:
+                future.result().close()
+
+        if not future.cancel():
+            future.add_done_callback(_close_result)
+
+    def _setidx(self, pos):
         assert not self.prefetched, 'this makes no sense'
         old_file = self._curfile
         try:
-            try:
-                self._curidx = six.next(self._idxiter)
-                self._curfile = self._curidx.blob.getfile()
-            except StopIteration:
+            if pos < len(self._indexes):
+                self._curpos = pos
+                self._curidx = self._indexes[pos]
+                self._curfile = self._open_blob(pos)
+                if self._readahead:
+                    self._schedule_readahead(pos)
+            else:
+                self._curpos = None
                 self._curidx = None
                 self._curfile = None
         finally:
             if old_file is not None:
                 old_file.close()
 
+    def _nextidx(self):
+        self._setidx(self._curpos + 1)
+
     @property
     def size(self):
         return sum(i.blob.size for i in self._indexes)
@@ -560,8 +807,14 @@ class ChunkedFileBlobIndexWrapper(object):
 
         mem = mmap.mmap(f.fileno(), size)
 
-        def fetch_file(offset, getfile):
-            with getfile() as sf:
+        def fetch_file(offset, blob):
+            cached = _open_cached_blob(blob)
+            if cached is not None:
+                mem[offset:offset + blob.size] = cached.read()
+                cached.close()
+                return
+
+            with blob.getfile() as sf:
                 while True:
                     chunk = sf.read(65535)
                     if not chunk:
@@ -571,16 +824,23 @@ class ChunkedFileBlobIndexWrapper(object):
 
         with ThreadPoolExecutor(max_workers=4) as exe:
             for idx in self._indexes:
-                exe.submit(fetch_file, idx.offset, idx.blob.getfile)
+                exe.submit(fetch_file, idx.offset, idx.blob)
 
         mem.flush()
         self._curfile = f
 
     def close(self):
+        for future in self._pending.values():
+            self._discard_pending(future)
+        self._pending = {}
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
         if self._curfile:
             self._curfile.close()
         self._curfile = None
         self._curidx = None
+        self._curpos = None
         self.closed = True
 
     def seek(self, pos):
@@ -592,14 +852,12 @@ class ChunkedFileBlobIndexWrapper(object):
 
         if pos < 0:
             raise IOError('Invalid argument')
-        for n, idx in enumerate(self._indexes[::-1]):
-            if idx.offset <= pos:
-                if idx != self._curidx:
-                    self._idxiter = iter(self._indexes[-(n + 1):])
-                    self._nextidx()
-                break
-        else:
+
+        n = bisect.bisect_right(self._offsets, pos) - 1
+        if n < 0:
             raise ValueError('Cannot seek to pos')
+        if n != self._curpos:
+            self._setidx(n)
         self._curfile.seek(pos - self._curidx.offset)
 
     def tell(self):
@@ -618,28 +876,28 @@ class ChunkedFileBlobIndexWrapper(object):
         if self.prefetched:
             return self._curfile.read(n)
 
-        result = bytearray()
+        result = []
 
         # Read to the end of the file
         if n < 0:
             while self._curfile is not None:
-                blob_result = self._curfile.read(32768)
+                blob_result = self._curfile.read(self._curidx.blob.size)
                 if not blob_result:
                     self._nextidx()
                 else:
-                    result.extend(blob_result)
+                    result.append(blob_result)
 
         # Read until a certain number of bytes are read
         else:
             while n > 0 and self._curfile is not None:
-                blob_result = self._curfile.read(min(n, 32768))
+                blob_result = self._curfile.read(n)
                 if not blob_result:
                     self._nextidx()
                 else:
                     n -= len(blob_result)
-                    result.extend(blob_result)
+                    result.append(blob_result)
 
-        return bytes(result)
+        return b''.join(result)
 
 
 class FileBlobOwner(Model):
@@ -201,24 +201,8 @@ class GroupManager(BaseManager):
         return Group.objects.filter(id__in=group_ids)
 
     def add_tags(self, group, environment, tags):
-        project_id = group.project_id
-        date = group.last_seen
-
-        for tag_item in tags:
-            if len(tag_item) == 2:
-                (key, value), data = tag_item, None
-            else:
-                key, value, data = tag_item
-
-            tagstore.incr_tag_value_times_seen(project_id, environment.id, key, value, extra={
-                'last_seen': date,
-                'data': data,
-            })
-
-            tagstore.incr_group_tag_value_times_seen(project_id, group.id, environment.id, key, value, extra={
-                'project_id': project_id,
-                'last_seen': date,
-            })
+        tagstore.incr_tag_values_times_seen_bulk(
+            group.project_id, group.id, environment.id, tags, group.last_seen)
 
     def get_groups_by_external_issue(self, integration, external_issue_key):
         from sentry.models import ExternalIssue, GroupLink
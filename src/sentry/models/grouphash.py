@@ -13,7 +13,7 @@ from django.db.models.signals import post_delete
 from django.utils.translation import ugettext_lazy as _
 
 from sentry.db.models import BoundedPositiveIntegerField, FlexibleForeignKey, Model
-from sentry.utils import redis
+from sentry.utils import json, redis
 
 
 class GroupHash(Model):
@@ -62,6 +62,28 @@ class GroupHash(Model):
         with cls.__get_last_processed_event_id_cluster().map() as client:
             client.delete(u'gh:lp:{}'.format(group_hash_id))
 
+    @classmethod
+    def fetch_unmerge_progress(cls, group_hash_ids):
+        with cls.__get_last_processed_event_id_cluster().map() as client:
+            results = [client.get(u'gh:um:{}'.format(id)) for id in group_hash_ids]
+        return [
+            json.loads(result.value) if result.value is not None else None
+            for result in results
+        ]
+
+    @classmethod
+    def record_unmerge_progress(cls, group_hash_ids, progress):
+        value = json.dumps(progress)
+        with cls.__get_last_processed_event_id_cluster().map() as client:
+            for id in group_hash_ids:
+                client.setex(u'gh:um:{}'.format(id), 86400, value)  # 1d
+
+    @classmethod
+    def delete_unmerge_progress(cls, group_hash_ids):
+        with cls.__get_last_processed_event_id_cluster().map() as client:
+            for id in group_hash_ids:
+                client.delete(u'gh:um:{}'.format(id))
+
 
 post_delete.connect(
     lambda instance, **kwargs: GroupHash.delete_last_processed_event_id(instance.id),
@@ -7,6 +7,8 @@ sentry.models.projectoption
 """
 from __future__ import absolute_import, print_function
 
+import six
+
 from celery.signals import task_postrun
 from django.core.signals import request_finished
 from django.db import models
@@ -81,6 +83,41 @@ class ProjectOptionManager(BaseManager):
                 self.__cache[project_id] = result
         return self.__cache.get(project_id, {})
 
+    def get_all_values_bulk(self, projects):
+        """
+        Like ``get_all_values``, for many projects at once. Returns a mapping
+        of project ID to the options of that project.
+        """
+        project_ids = set(
+            project.id if isinstance(project, models.Model) else project
+            for project in projects
+        )
+
+        result = {}
+        for project_id in project_ids:
+            if project_id in self.__cache:
+                result[project_id] = self.__cache[project_id]
+
+        missing = project_ids - set(result)
+        if missing:
+            cache_keys = dict((self._make_key(project_id), project_id) for project_id in missing)
+            for cache_key, value in six.iteritems(cache.get_many(list(cache_keys))):
+                if value is not None:
+                    result[cache_keys[cache_key]] = value
+            missing -= set(result)
+
+        if missing:
+            values = dict((project_id, {}) for project_id in missing)
+            for i in self.filter(project__in=missing):
+                values[i.project_id][i.key] = i.value
+            cache.set_many(dict(
+                (self._make_key(project_id), value) for project_id, value in six.iteritems(values)
+            ))
+            result.update(values)
+
+        self.__cache.update(result)
+        return result
+
     def clear_local_cache(self, **kwargs):
         self.__cache = {}
 
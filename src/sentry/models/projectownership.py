@@ -1,18 +1,31 @@
 from __future__ import absolute_import
 
 import operator
+import threading
+import uuid
 
+from collections import OrderedDict
 from jsonfield import JSONField
 
+from django.core.cache import cache
 from django.db import models
 from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
 from django.utils import timezone
 
 from six.moves import reduce
 
 from sentry.db.models import Model, sane_repr
 from sentry.db.models.fields import FlexibleForeignKey
-from sentry.ownership.grammar import load_schema
+from sentry.ownership.grammar import compile_rules, load_schema
+
+READ_CACHE_DURATION = 3600
+
+# Compiled rule indexes are kept per process, keyed by the version token
+# which is regenerated every time the ownership is (re)loaded into the cache.
+MAX_LOCAL_INDEXES = 1000
+_local_indexes = OrderedDict()
+_local_indexes_lock = threading.Lock()
 
 
 class ProjectOwnership(Model):
@@ -35,6 +48,60 @@ class ProjectOwnership(Model):
 
     __repr__ = sane_repr('project_id', 'is_active')
 
+    @classmethod
+    def get_cache_key(cls, project_id):
+        return u'projectownership_project_id:1:{}'.format(project_id)
+
+    @classmethod
+    def get_actors_cache_key(cls, project_id):
+        return u'projectownership_actors:1:{}'.format(project_id)
+
+    @classmethod
+    def get_ownership_cached(cls, project_id):
+        """
+        Cached read access to a project's ownership, returning a tuple of
+        (ownership, version). `ownership` is None when the project has no
+        ownership configured. `version` changes whenever the cached value
+        is rebuilt, so it can be used to key derived data.
+        """
+        cache_key = cls.get_cache_key(project_id)
+        rv = cache.get(cache_key)
+        if rv is None:
+            try:
+                ownership = cls.objects.get(project_id=project_id)
+            except cls.DoesNotExist:
+                ownership = None
+            rv = (ownership, uuid.uuid4().hex)
+            cache.set(cache_key, rv, READ_CACHE_DURATION)
+        return rv
+
+    @classmethod
+    def get_rule_index(cls, project_id, ownership, version):
+        """
+        Return the compiled RuleIndex for an ownership, compiling
+        the schema only once per process and version.
+        """
+        key = (project_id, version)
+        with _local_indexes_lock:
+            index = _local_indexes.pop(key, None)
+            if index is not None:
+                _local_indexes[key] = index
+                return index
+
+        # Compiled outside of the lock, at worst a concurrent miss compiles
+        # the same index twice.
+        if ownership is None or ownership.schema is None:
+            index = compile_rules([])
+        else:
+            index = compile_rules(load_schema(ownership.schema))
+
+        with _local_indexes_lock:
+            _local_indexes.pop(key, None)
+            while len(_local_indexes) >= MAX_LOCAL_INDEXES:
+                _local_indexes.popitem(last=False)
+            _local_indexes[key] = index
+        return index
+
     @classmethod
     def get_owners(cls, project_id, data):
         """
@@ -46,25 +113,20 @@ class ProjectOwnership(Model):
         If an empty list is returned, this means there are explicitly
         no owners.
         """
-        try:
-            ownership = cls.objects.get(project_id=project_id)
-        except cls.DoesNotExist:
+        ownership, version = cls.get_ownership_cached(project_id)
+        if ownership is None:
             ownership = cls(
                 project_id=project_id,
             )
 
-        rules = []
-        if ownership.schema is not None:
-            for rule in load_schema(ownership.schema):
-                if rule.test(data):
-                    rules.append(rule)
+        rules = cls.get_rule_index(project_id, ownership, version).match(data)
 
         if not rules:
             return cls.Everyone if ownership.fallthrough else [], None
 
         owners = {o for rule in rules for o in rule.owners}
 
-        return filter(None, resolve_actors(owners, project_id).values()), rules
+        return filter(None, resolve_actors_cached(owners, project_id).values()), rules
 
 
 def resolve_actors(owners, project_id):
@@ -119,3 +181,48 @@ def resolve_actors(owners, project_id):
         o: actors.get((o.type, o.identifier.lower()))
         for o in owners
     }
+
+
+def resolve_actors_cached(owners, project_id):
+    """ Like `resolve_actors`, but memoizes the resolved actors of a
+    project in the cache. The cache is invalidated whenever teams,
+    memberships or emails relevant to the project change. """
+    if not owners:
+        return {}
+
+    cache_key = ProjectOwnership.get_actors_cache_key(project_id)
+    cached = cache.get(cache_key) or {}
+
+    missing = [o for o in owners if (o.type, o.identifier.lower()) not in cached]
+    if missing:
+        for owner, actor in resolve_actors(missing, project_id).items():
+            cached[(owner.type, owner.identifier.lower())] = actor
+        cache.set(cache_key, cached, READ_CACHE_DURATION)
+
+    return {
+        o: cached[(o.type, o.identifier.lower())]
+        for o in owners
+    }
+
+
+def invalidate_actors_cache(project_ids):
+    cache.delete_many([
+        ProjectOwnership.get_actors_cache_key(project_id)
+        for project_id in project_ids
+    ])
+
+
+def _invalidate_ownership_cache(instance, **kwargs):
+    cache.delete(ProjectOwnership.get_cache_key(instance.project_id))
+
+
+post_save.connect(
+    _invalidate_ownership_cache,
+    sender=ProjectOwnership,
+    weak=False,
+)
+post_delete.connect(
+    _invalidate_ownership_cache,
+    sender=ProjectOwnership,
+    weak=False,
+)
@@ -8,14 +8,18 @@ sentry.models.release
 from __future__ import absolute_import, print_function
 
 import logging
+import operator
 import re
 import six
 import itertools
 
-from django.db import models, IntegrityError, transaction
-from django.db.models import F
+from collections import OrderedDict
+from django.db import models, IntegrityError, router, transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_save
 from django.utils import timezone
 from jsonfield import JSONField
+from six.moves import reduce
 from time import time
 
 from sentry.app import locks
@@ -29,7 +33,7 @@ from sentry.signals import resolved_with_commit
 from sentry.utils import metrics
 from sentry.utils.cache import cache
 from sentry.utils.hashlib import md5_text
-from sentry.utils.retries import TimedRetryPolicy
+from sentry.utils.iterators import chunked
 
 logger = logging.getLogger(__name__)
 
@@ -39,6 +43,32 @@ BAD_RELEASE_CHARS = '\n\f\t/'
 DB_VERSION_LENGTH = 250
 COMMIT_RANGE_DELIMITER = '..'
 
+# The number of values passed to an `IN` clause, or rows inserted at once,
+# when binding commits to a release.
+BULK_QUERY_SIZE = 1000
+
+
+def bulk_create_ignoring_conflicts(model, instances):
+    """
+    Inserts the given instances in batches. Rows that already exist (and so
+    violate a unique constraint) are skipped; as this is expected to be rare,
+    a batch with conflicts is retried one row at a time.
+
+    Like ``bulk_create``, this does not send any signals.
+    """
+    using = router.db_for_write(model)
+    for batch in chunked(instances, BULK_QUERY_SIZE):
+        try:
+            with transaction.atomic(using=using):
+                model.objects.bulk_create(batch)
+        except IntegrityError:
+            for instance in batch:
+                try:
+                    with transaction.atomic(using=using):
+                        model.objects.bulk_create([instance])
+                except IntegrityError:
+                    pass
+
 
 class ReleaseProject(Model):
     __core__ = False
@@ -342,6 +372,177 @@ class Release(Model):
                 }
             )
 
+    def _get_or_create_repositories(self, names):
+        """
+        Returns the repositories with the given names by name, creating the
+        ones that do not exist yet.
+        """
+        from sentry.models import Repository
+
+        repos = {
+            r.name: r for r in Repository.objects.filter(
+                organization_id=self.organization_id,
+                name__in=names,
+            )
+        }
+        for name in names:
+            if name not in repos:
+                repos[name] = Repository.objects.get_or_create(
+                    organization_id=self.organization_id,
+                    name=name,
+                )[0]
+        return repos
+
+    def _upsert_commit_authors(self, author_names):
+        """
+        Creates or renames the commit authors in the given mapping of email
+        to name, and returns them by email.
+        """
+        from sentry.models import CommitAuthor
+
+        authors = {}
+        for chunk in chunked(author_names, BULK_QUERY_SIZE):
+            for author in CommitAuthor.objects.filter(
+                organization_id=self.organization_id,
+                email__in=chunk,
+            ):
+                authors[author.email] = author
+
+        for email, author in six.iteritems(authors):
+            name = author_names[email]
+            if author.name != name:
+                CommitAuthor.objects.filter(id=author.id).update(name=name)
+                author.name = name
+
+        missing = [email for email in author_names if email not in authors]
+        if missing:
+            bulk_create_ignoring_conflicts(CommitAuthor, [
+                CommitAuthor(
+                    organization_id=self.organization_id,
+                    email=email,
+                    name=author_names[email],
+                ) for email in missing
+            ])
+            for chunk in chunked(missing, BULK_QUERY_SIZE):
+                for author in CommitAuthor.objects.filter(
+                    organization_id=self.organization_id,
+                    email__in=chunk,
+                ):
+                    authors[author.email] = author
+        return authors
+
+    def _upsert_commits(self, entries, repos, authors):
+        """
+        Creates or updates the commits of the given ``(data, repository
+        name, author email)`` entries, and returns them by repository id and
+        key. If a commit is listed more than once, its first entry is used.
+        """
+        from sentry.models import Commit
+
+        values = OrderedDict()
+        for data, repo_name, author_email in entries:
+            key = (repos[repo_name].id, data['id'])
+            if key in values:
+                continue
+            commit_data = {}
+            # Update/set message and author if they are provided.
+            if author_email is not None:
+                commit_data['author'] = authors[author_email]
+            if 'message' in data:
+                commit_data['message'] = data['message']
+            if 'timestamp' in data:
+                commit_data['date_added'] = data['timestamp']
+            values[key] = commit_data
+
+        keys_by_repo = {}
+        for repo_id, key in values:
+            keys_by_repo.setdefault(repo_id, []).append(key)
+
+        def fetch(keys_by_repo):
+            rv = {}
+            for repo_id, keys in six.iteritems(keys_by_repo):
+                for chunk in chunked(keys, BULK_QUERY_SIZE):
+                    for commit in Commit.objects.filter(
+                        organization_id=self.organization_id,
+                        repository_id=repo_id,
+                        key__in=chunk,
+                    ):
+                        rv[(repo_id, commit.key)] = commit
+            return rv
+
+        commits = fetch(keys_by_repo)
+
+        for key, commit in six.iteritems(commits):
+            changes = {}
+            for name, value in six.iteritems(values[key]):
+                if name == 'author':
+                    if commit.author_id != value.id:
+                        changes[name] = value
+                else:
+                    try:
+                        changed = getattr(commit, name) != value
+                    except TypeError:
+                        # e.g. naive and aware datetimes
+                        changed = True
+                    if changed:
+                        changes[name] = value
+            if changes:
+                Commit.objects.filter(id=commit.id).update(**changes)
+                for name, value in six.iteritems(changes):
+                    setattr(commit, name, value)
+
+        missing = [key for key in values if key not in commits]
+        if missing:
+            now = timezone.now()
+            bulk_create_ignoring_conflicts(Commit, [
+                Commit(
+                    organization_id=self.organization_id,
+                    repository_id=repo_id,
+                    key=key,
+                    **dict({'date_added': now}, **values[(repo_id, key)])
+                ) for repo_id, key in missing
+            ])
+
+            missing_by_repo = {}
+            for repo_id, key in missing:
+                missing_by_repo.setdefault(repo_id, []).append(key)
+            created = fetch(missing_by_repo)
+            commits.update(created)
+
+            # Bulk inserts do not send any signals, but resolving the groups
+            # that are referenced in commit messages depends on them.
+            for key in missing:
+                if key in created:
+                    post_save.send(
+                        sender=Commit,
+                        instance=created[key],
+                        created=True,
+                    )
+
+        return commits
+
+    def _find_users_by_author(self, authors):
+        """
+        Returns the first user matching each of the given commit authors (see
+        ``CommitAuthor.find_users``), or ``None``, by author.
+        """
+        from sentry.models import UserEmail
+
+        if not authors:
+            return {}
+
+        users_by_email = {}
+        for user_email in UserEmail.objects.filter(
+            reduce(operator.or_, [Q(email__iexact=email)
+                                  for email in set(a.email for a in authors)]),
+            is_verified=True,
+            user__is_active=True,
+            user__sentry_orgmember_set__organization=self.organization_id,
+        ).select_related('user'):
+            users_by_email.setdefault(user_email.email.lower(), user_email.user)
+
+        return {a: users_by_email.get(a.email.lower()) for a in authors}
+
     def set_commits(self, commit_list):
         """
         Bind a list of commits to this release.
@@ -355,8 +556,8 @@ class Release(Model):
 
         # TODO(dcramer): this function could use some cleanup/refactoring as its a bit unwieldly
         from sentry.models import (
-            Commit, CommitAuthor, Group, GroupLink, GroupResolution, GroupStatus,
-            ReleaseCommit, ReleaseHeadCommit, Repository, PullRequest
+            CommitAuthor, Group, GroupLink, GroupResolution, GroupStatus,
+            ReleaseCommit, ReleaseHeadCommit, PullRequest
         )
         from sentry.plugins.providers.repository import RepositoryProvider
         from sentry.tasks.integrations import kick_off_status_syncs
@@ -367,7 +568,9 @@ class Release(Model):
         ]
         lock_key = type(self).get_lock_key(self.organization_id, self.id)
         lock = locks.get(lock_key, duration=10)
-        with TimedRetryPolicy(10)(lock.acquire):
+        # Binding thousands of commits may take longer than the lock duration,
+        # so the lock is renewed until done.
+        with lock.blocking_acquire(10, renew=True):
             start = time()
             with transaction.atomic():
                 # TODO(dcramer): would be good to optimize the logic to avoid these
@@ -376,106 +579,82 @@ class Release(Model):
                     release=self,
                 ).delete()
 
-                authors = {}
-                repos = {}
-                commit_author_by_commit = {}
-                head_commit_by_repo = {}
-                latest_commit = None
-                for idx, data in enumerate(commit_list):
-                    repo_name = data.get('repository'
-                                         ) or u'organization-{}'.format(self.organization_id)
-                    if repo_name not in repos:
-                        repos[repo_name] = repo = Repository.objects.get_or_create(
-                            organization_id=self.organization_id,
-                            name=repo_name,
-                        )[0]
-                    else:
-                        repo = repos[repo_name]
-
+                default_repo_name = u'organization-{}'.format(self.organization_id)
+                entries = []
+                author_names = {}
+                for data in commit_list:
                     author_email = data.get('author_email')
                     if author_email is None and data.get('author_name'):
                         author_email = (
                             re.sub(r'[^a-zA-Z0-9\-_\.]*', '', data['author_name']).lower() +
                             '@localhost'
                         )
+                    if author_email:
+                        author_names.setdefault(author_email, data.get('author_name'))
+                    entries.append((data, data.get('repository') or default_repo_name,
+                                    author_email or None))
 
-                    if not author_email:
-                        author = None
-                    elif author_email not in authors:
-                        author_data = {
-                            'name': data.get('author_name')
-                        }
-                        author, created = CommitAuthor.objects.create_or_update(
-                            organization_id=self.organization_id,
-                            email=author_email,
-                            values=author_data)
-                        if not created:
-                            author = CommitAuthor.objects.get(
-                                organization_id=self.organization_id,
-                                email=author_email)
-                        authors[author_email] = author
-                    else:
-                        author = authors[author_email]
-
-                    commit_data = {}
-                    defaults = {}
-
-                    # Update/set message and author if they are provided.
-                    if author is not None:
-                        commit_data['author'] = author
-                    if 'message' in data:
-                        commit_data['message'] = data['message']
-                    if 'timestamp' in data:
-                        commit_data['date_added'] = data['timestamp']
-                    else:
-                        defaults['date_added'] = timezone.now()
-
-                    commit, created = Commit.objects.create_or_update(
-                        organization_id=self.organization_id,
-                        repository_id=repo.id,
-                        key=data['id'],
-                        defaults=defaults,
-                        values=commit_data)
-                    if not created:
-                        commit = Commit.objects.get(
-                            organization_id=self.organization_id,
-                            repository_id=repo.id,
-                            key=data['id'])
-
-                    if author is None:
-                        author = commit.author
-
-                    commit_author_by_commit[commit.id] = author
-
-                    patch_set = data.get('patch_set', [])
-                    for patched_file in patch_set:
-                        try:
-                            with transaction.atomic():
-                                CommitFileChange.objects.create(
-                                    organization_id=self.organization.id,
-                                    commit=commit,
-                                    filename=patched_file['path'],
-                                    type=patched_file['type'],
-                                )
-                        except IntegrityError:
-                            pass
+                repos = self._get_or_create_repositories(
+                    set(repo_name for _, repo_name, _ in entries),
+                )
+                authors = self._upsert_commit_authors(author_names)
+                commits = self._upsert_commits(entries, repos, authors)
+
+                # Commits that were sent without an author keep their
+                # previous one.
+                authors_by_id = {a.id: a for a in six.itervalues(authors)}
+                missing_author_ids = set(
+                    c.author_id for c in six.itervalues(commits)
+                    if c.author_id is not None and c.author_id not in authors_by_id
+                )
+                if missing_author_ids:
+                    authors_by_id.update(CommitAuthor.objects.in_bulk(missing_author_ids))
 
-                    try:
-                        with transaction.atomic():
-                            ReleaseCommit.objects.create(
+                commit_author_by_commit = {}
+                head_commit_by_repo = {}
+                file_changes = {}
+                release_commits = {}
+                latest_commit = None
+                for idx, (data, repo_name, _) in enumerate(entries):
+                    repo = repos[repo_name]
+                    commit = commits[(repo.id, data['id'])]
+                    commit_author_by_commit[commit.id] = authors_by_id.get(commit.author_id)
+
+                    for patched_file in data.get('patch_set', []):
+                        file_changes.setdefault(
+                            (commit.id, patched_file['path']), CommitFileChange(
                                 organization_id=self.organization_id,
-                                release=self,
-                                commit=commit,
-                                order=idx,
+                                commit_id=commit.id,
+                                filename=patched_file['path'],
+                                type=patched_file['type'],
                             )
-                    except IntegrityError:
-                        pass
+                        )
+
+                    release_commits.setdefault(commit.id, ReleaseCommit(
+                        organization_id=self.organization_id,
+                        release_id=self.id,
+                        commit_id=commit.id,
+                        order=idx,
+                    ))
 
                     if latest_commit is None:
                         latest_commit = commit
 
                     head_commit_by_repo.setdefault(repo.id, commit.id)
 
+                if file_changes:
+                    commit_ids = set(commit_id for commit_id, _ in file_changes)
+                    for chunk in chunked(commit_ids, BULK_QUERY_SIZE):
+                        for key in CommitFileChange.objects.filter(
+                            commit_id__in=chunk,
+                        ).values_list('commit_id', 'filename'):
+                            file_changes.pop(key, None)
+                    bulk_create_ignoring_conflicts(CommitFileChange, file_changes.values())
+
+                bulk_create_ignoring_conflicts(
+                    ReleaseCommit, sorted(release_commits.values(), key=lambda rc: rc.order),
+                )
+
                 self.update(
                     commit_count=len(commit_list),
                     authors=[
@@ -540,22 +719,21 @@ class Release(Model):
         pull_request_group_authors = [(prr[0], pr_authors_dict.get(prr[1]))
                                       for prr in pull_request_resolutions]
 
-        user_by_author = {None: None}
-
         commits_and_prs = list(
             itertools.chain(commit_group_authors, pull_request_group_authors),
         )
 
-        group_project_lookup = dict(Group.objects.filter(
-            id__in=[group_id for group_id, _ in commits_and_prs],
-        ).values_list('id', 'project_id'))
+        user_by_author = self._find_users_by_author(
+            set(author for _, author in commits_and_prs if author is not None),
+        )
+        user_by_author[None] = None
+
+        groups = Group.objects.in_bulk(set(group_id for group_id, _ in commits_and_prs))
 
         for group_id, author in commits_and_prs:
-            if author not in user_by_author:
-                try:
-                    user_by_author[author] = author.find_users()[0]
-                except IndexError:
-                    user_by_author[author] = None
+            group = groups.get(group_id)
+            if group is None:
+                continue
             actor = user_by_author[author]
 
             with transaction.atomic():
@@ -568,9 +746,6 @@ class Release(Model):
                         'actor_id': actor.id if actor else None,
                     },
                 )
-                group = Group.objects.get(
-                    id=group_id,
-                )
                 group.update(status=GroupStatus.RESOLVED)
                 metrics.incr('group.resolved', instance='in_commit', skip_internal=True)
 
@@ -582,6 +757,6 @@ class Release(Model):
             )
 
             kick_off_status_syncs.apply_async(kwargs={
-                'project_id': group_project_lookup[group_id],
+                'project_id': group.project_id,
                 'group_id': group_id,
             })
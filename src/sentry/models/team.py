@@ -183,11 +183,14 @@ class Team(Model):
         """
         Transfers a team and all projects under it to the given organization.
         """
+        from sentry.auth.access import expire_access
         from sentry.models import (
             OrganizationAccessRequest, OrganizationMember, OrganizationMemberTeam, Project,
             ProjectTeam, ReleaseProject, ReleaseProjectEnvironment
         )
 
+        old_organization_id = self.organization_id
+
         try:
             with transaction.atomic():
                 self.update(organization=organization)
@@ -275,6 +278,9 @@ class Team(Model):
             finally:
                 cursor.close()
 
+        # Projects and their teams were moved without any signals.
+        expire_access(organization_ids=[old_organization_id, organization.id])
+
     def get_audit_log_data(self):
         return {
             'id': self.id,
@@ -58,6 +58,11 @@ class NodeStorage(local, Service):
 
     def get_multi(self, id_list):
         """
+        Fetch multiple nodes. Missing nodes are returned as ``None``.
+
+        Backends should override this to fetch all nodes in as few round
+        trips as possible.
+
         >>> data_map = nodestore.get_multi(['key1', 'key2')
         >>> print 'key1', data_map['key1']
         >>> print 'key2', data_map['key2']
@@ -72,6 +77,11 @@ class NodeStorage(local, Service):
 
     def set_multi(self, values):
         """
+        Store multiple nodes.
+
+        Backends should override this to store all nodes in as few round
+        trips as possible.
+
         >>> nodestore.set_multi({
         >>>     'key1': {'foo': 'bar'},
         >>>     'key2': {'foo': 'baz'},
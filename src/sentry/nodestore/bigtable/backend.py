@@ -1,13 +1,16 @@
 from __future__ import absolute_import, print_function
 
+import six
 import struct
 from zlib import compress as zlib_compress, decompress as zlib_decompress
 
 from google.cloud import bigtable
+from google.cloud.bigtable.row_set import RowSet
 from simplejson import JSONEncoder, _default_decoder
 from django.utils import timezone
 
 from sentry.nodestore.base import NodeStorage
+from sentry.nodestore.codec import get_codec, get_decoder, get_project_id
 from sentry.utils.cache import memoize
 
 # Cache an instance of the encoder we want to use
@@ -45,6 +48,7 @@ class BigtableNodeStorage(NodeStorage):
     data_column = b'0'
 
     _FLAG_COMPRESSED = 1 << 0
+    _FLAG_CODEC = 1 << 1
 
     def __init__(self, project=None, instance='sentry', table='nodestore',
                  automatic_expiry=False, default_ttl=None, compression=False, **kwargs):
@@ -70,11 +74,41 @@ class BigtableNodeStorage(NodeStorage):
         row.delete()
         self.connection.mutate_rows([row])
 
+    def delete_multi(self, id_list):
+        rows = []
+        for id in id_list:
+            row = self.connection.row(id)
+            row.delete()
+            rows.append(row)
+
+        if rows:
+            self.connection.mutate_rows(rows)
+
     def get(self, id):
         row = self.connection.read_row(id)
         if row is None:
             return None
+        return self.decode_row(row)
+
+    def get_multi(self, id_list):
+        if len(id_list) == 1:
+            id = id_list[0]
+            return {id: self.get(id)}
+
+        rv = dict.fromkeys(id_list)
+        if not id_list:
+            return rv
+
+        row_set = RowSet()
+        for id in id_list:
+            row_set.add_row_key(id)
+
+        # All rows are streamed back from a single request.
+        for row in self.connection.read_rows(row_set=row_set):
+            rv[row.row_key] = self.decode_row(row)
+        return rv
 
+    def decode_row(self, row):
         columns = row.cells[self.column_family]
 
         try:
@@ -100,6 +134,11 @@ class BigtableNodeStorage(NodeStorage):
         if self.flags_column in columns:
             flags = struct.unpack('B', columns[self.flags_column][0].value)[0]
 
+        # Data written with a node codec carries its own
+        # serialization and compression header.
+        if flags & self._FLAG_CODEC:
+            return get_decoder().decode(data)
+
         # Check for a compression flag on, if so
         # decompress the data.
         if flags & self._FLAG_COMPRESSED:
@@ -108,7 +147,19 @@ class BigtableNodeStorage(NodeStorage):
         return json_loads(data)
 
     def set(self, id, data, ttl=None):
-        data = json_dumps(data)
+        self.connection.mutate_rows([self.encode_row(id, data, ttl)])
+
+    def set_multi(self, values):
+        rows = [self.encode_row(id, data) for id, data in six.iteritems(values)]
+        if rows:
+            self.connection.mutate_rows(rows)
+
+    def encode_row(self, id, data, ttl=None):
+        codec = get_codec()
+        if codec is not None:
+            data = codec.encode(data, project_id=get_project_id(data))
+        else:
+            data = json_dumps(data)
 
         row = self.connection.row(id)
         # Call to delete is just a state mutation,
@@ -144,7 +195,9 @@ class BigtableNodeStorage(NodeStorage):
         # This only flag we're tracking now is whether compression
         # is on or not for the data column.
         flags = 0
-        if self.compression:
+        if codec is not None:
+            flags |= self._FLAG_CODEC
+        elif self.compression:
             flags |= self._FLAG_COMPRESSED
             data = zlib_compress(data)
 
@@ -166,7 +219,7 @@ class BigtableNodeStorage(NodeStorage):
             data,
             timestamp=ts,
         )
-        self.connection.mutate_rows([row])
+        return row
 
     def cleanup(self, cutoff_timestamp):
         raise NotImplementedError
@@ -0,0 +1,10 @@
+"""
+sentry.nodestore.cache
+~~~~~~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2010-2019 by the Sentry Team, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+"""
+from __future__ import absolute_import, print_function
+
+from .backend import CachedNodeStorage  # NOQA
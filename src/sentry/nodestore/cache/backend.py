@@ -0,0 +1,222 @@
+"""
+sentry.nodestore.cache.backend
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+:copyright: (c) 2010-2019 by the Sentry Team, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+"""
+
+from __future__ import absolute_import
+
+import six
+
+from collections import OrderedDict
+from time import time
+
+from django.core.cache import get_cache
+
+from sentry.nodestore.base import NodeStorage
+from sentry.utils import metrics
+from sentry.utils.compat import pickle
+from sentry.utils.imports import import_string
+
+
+class LocalCache(object):
+    """
+    A least recently used cache of serialized values, bounded by the total
+    size of the values it holds.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.size = 0
+        self.__items = OrderedDict()
+
+    def get(self, key):
+        try:
+            value, expires = self.__items.pop(key)
+        except KeyError:
+            return None
+
+        if expires < time():
+            self.size -= len(value)
+            return None
+
+        # re-insert to mark this as the most recently used item
+        self.__items[key] = (value, expires)
+        return value
+
+    def set(self, key, value):
+        self.delete(key)
+        if len(value) > self.max_size:
+            return
+
+        self.__items[key] = (value, time() + self.ttl)
+        self.size += len(value)
+        while self.size > self.max_size:
+            _, (evicted, _) = self.__items.popitem(last=False)
+            self.size -= len(evicted)
+
+    def delete(self, key):
+        try:
+            value, _ = self.__items.pop(key)
+        except KeyError:
+            return
+        self.size -= len(value)
+
+
+class CachedNodeStorage(NodeStorage):
+    """
+    A backend which caches nodes of another backend.
+
+    Nodes are cached in two tiers: a size bounded LRU cache in the local
+    thread (node storages are thread-local), and a shared Django cache
+    (memcached or Redis.) Nodes that are larger than ``max_size`` when
+    serialized are never cached. Writes and deletes invalidate the shared
+    cache and the local cache of the current thread, other threads and
+    processes may continue to serve their local copy for up to ``local_ttl``
+    seconds.
+
+    Nodes are cached pickled, so that a cached node is identical to the one
+    read from the backend (e.g. tuples and datetimes are preserved.)
+
+    ``cleanup`` does not invalidate the cache, as the backends cannot report
+    which nodes they removed. Cached copies of cleaned up nodes are served
+    until they expire after ``ttl`` (or ``local_ttl``) seconds.
+
+    Hits and misses of both tiers are reported as ``nodestore.cache.hit`` and
+    ``nodestore.cache.miss`` metrics.
+
+    >>> CachedNodeStorage(
+    ...     backend='sentry.nodestore.django.backend.DjangoNodeStorage',
+    ...     backend_options={},
+    ...     cache='default',
+    ...     ttl=60 * 60,
+    ...     local_size=16 * 1024 * 1024,
+    ...     local_ttl=60,
+    ... )
+    """
+
+    prefix = 'nodestore:2:'
+
+    def __init__(self, backend, backend_options=None, cache='default', ttl=60 * 60,
+                 max_size=512 * 1024, local_size=16 * 1024 * 1024, local_ttl=60, **kwargs):
+        if isinstance(backend, six.string_types):
+            backend = import_string(backend)
+        self.backend = backend(**(backend_options or {}))
+
+        self.cache = get_cache(cache) if cache else None
+        self.ttl = ttl
+        self.max_size = max_size
+        self.local_cache = LocalCache(local_size, local_ttl) if local_size else None
+        super(CachedNodeStorage, self).__init__(**kwargs)
+
+    def _get_cache_key(self, id):
+        return self.prefix + id
+
+    def _dumps(self, data):
+        return pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+
+    def _loads(self, value):
+        return pickle.loads(value)
+
+    def _record(self, name, amount, tier):
+        if amount:
+            metrics.incr('nodestore.cache.%s' % (name, ), amount=amount, tags={'tier': tier})
+
+    def _invalidate(self, id_list):
+        if self.local_cache is not None:
+            for id in id_list:
+                self.local_cache.delete(id)
+
+        if self.cache is not None:
+            self.cache.delete_many([self._get_cache_key(id) for id in id_list])
+
+    def get(self, id):
+        return self.get_multi([id])[id]
+
+    def get_multi(self, id_list):
+        rv = {}
+        remaining = list(id_list)
+
+        if self.local_cache is not None:
+            missing = []
+            for id in remaining:
+                value = self.local_cache.get(id)
+                if value is None:
+                    missing.append(id)
+                else:
+                    rv[id] = self._loads(value)
+            self._record('hit', len(remaining) - len(missing), 'local')
+            self._record('miss', len(missing), 'local')
+            remaining = missing
+
+        if remaining and self.cache is not None:
+            cache_keys = {self._get_cache_key(id): id for id in remaining}
+            values = self.cache.get_many(cache_keys.keys())
+            for cache_key, value in six.iteritems(values):
+                id = cache_keys[cache_key]
+                rv[id] = self._loads(value)
+                if self.local_cache is not None:
+                    self.local_cache.set(id, value)
+            self._record('hit', len(values), 'shared')
+            self._record('miss', len(remaining) - len(values), 'shared')
+            remaining = [id for id in remaining if id not in rv]
+
+        if not remaining:
+            return rv
+
+        to_cache = {}
+        skipped = 0
+        for id, data in six.iteritems(self.backend.get_multi(remaining)):
+            rv[id] = data
+            if data is None:
+                continue
+
+            value = self._dumps(data)
+            if len(value) > self.max_size:
+                skipped += 1
+                continue
+
+            if self.local_cache is not None:
+                self.local_cache.set(id, value)
+            to_cache[self._get_cache_key(id)] = value
+
+        self._record('skipped', skipped, 'shared')
+        if to_cache and self.cache is not None:
+            self.cache.set_many(to_cache, self.ttl)
+
+        for id in remaining:
+            rv.setdefault(id, None)
+        return rv
+
+    def set(self, id, data, ttl=None):
+        self.backend.set(id, data, ttl=ttl)
+        self._invalidate([id])
+
+    def set_multi(self, values):
+        self.backend.set_multi(values)
+        self._invalidate(list(values))
+
+    def delete(self, id):
+        self.backend.delete(id)
+        self._invalidate([id])
+
+    def delete_multi(self, id_list):
+        self.backend.delete_multi(id_list)
+        self._invalidate(id_list)
+
+    def cleanup(self, cutoff_timestamp):
+        self.backend.cleanup(cutoff_timestamp)
+
+    def validate(self):
+        self.backend.validate()
+
+    def setup(self):
+        self.backend.setup()
+
+    def bootstrap(self):
+        bootstrap = getattr(self.backend, 'bootstrap', None)
+        if bootstrap is not None:
+            bootstrap()
@@ -47,8 +47,18 @@ class CassandraNodeStorage(NodeStorage):
     def get(self, id):
         return self.connection.get(id)
 
+    def delete_multi(self, id_list):
+        self.connection.delete_multi(id_list)
+
     def get_multi(self, id_list):
-        return self.connection.get_multi(id_list)
+        # The queries are executed concurrently on the session, missing rows
+        # are omitted from the response.
+        rv = dict.fromkeys(id_list)
+        rv.update(self.connection.get_multi(id_list))
+        return rv
 
     def set(self, id, data, ttl=None):
         self.connection.set(id, data)
+
+    def set_multi(self, values):
+        self.connection.set_multi(values)
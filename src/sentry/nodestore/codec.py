@@ -0,0 +1,307 @@
+"""
+sentry.nodestore.codec
+~~~~~~~~~~~~~~~~~~~~~~
+
+Encoding of node data for storage.
+
+Encoded payloads start with a small header that records the format version,
+the serializer, the compression and (optionally) the compression dictionary
+that were used, so that the configuration can be changed at any time without
+breaking reads of existing data::
+
+    magic (3 bytes) | version (1) | serializer (1) | compression (1) | dictionary id (4)
+
+Payloads without the header were written before the codec existed and have
+to be decoded by the backend in its legacy format (see ``is_encoded``.)
+
+Only pickle preserves all Python types.  msgpack and JSON decode tuples as
+lists, which is what reading the node back from JSON based storage has
+always done; data that msgpack or JSON cannot represent at all (e.g.
+datetimes) is pickled instead.
+
+Compression dictionaries are only supported with zstd (which requires the
+optional ``zstandard`` package.) They are read from ``*.dict`` files in a
+directory: ``<project_id>.dict`` is used to encode the nodes of that project,
+and ``global.dict`` for everything else. Any other files in the directory
+(e.g. retired dictionaries) are only used for decoding. Dictionaries are
+identified by a checksum of their contents, and must never be removed while
+data encoded with them still exists.
+
+:copyright: (c) 2010-2019 by the Sentry Team, see AUTHORS for more details.
+:license: BSD, see LICENSE for more details.
+"""
+
+from __future__ import absolute_import
+
+import os
+import struct
+import threading
+import zlib
+
+import msgpack
+import six
+
+from django.conf import settings
+
+from sentry.utils import json
+from sentry.utils.compat import pickle
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+__all__ = ('NodeCodec', 'CodecError', 'get_codec', 'get_decoder', 'is_encoded')
+
+MAGIC = b'\x93SN'
+VERSION = 1
+HEADER = struct.Struct('>3sBBBI')
+
+GLOBAL_DICTIONARY = 'global'
+DICTIONARY_EXTENSION = '.dict'
+
+
+class CodecError(ValueError):
+    pass
+
+
+class Serializer(object):
+    def __init__(self, id, dumps, loads):
+        self.id = id
+        self.dumps = dumps
+        self.loads = loads
+
+
+SERIALIZERS = {
+    'pickle': Serializer(
+        1,
+        lambda value: pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+        pickle.loads,
+    ),
+    'msgpack': Serializer(
+        2,
+        lambda value: msgpack.packb(value, use_bin_type=True),
+        lambda value: msgpack.unpackb(value, raw=False),
+    ),
+    'json': Serializer(
+        3,
+        lambda value: json.dumps(value).encode('utf-8'),
+        lambda value: json.loads(value.decode('utf-8')),
+    ),
+}
+
+COMPRESSIONS = {
+    'none': 0,
+    'zlib': 1,
+    'zstd': 2,
+}
+
+
+def is_encoded(value):
+    return isinstance(value, six.binary_type) and value[:len(MAGIC)] == MAGIC
+
+
+def load_dictionaries(path):
+    """
+    Load all compression dictionaries from ``path``, returning a mapping of
+    dictionary name to ``(id, data)``.
+    """
+    rv = {}
+    if not path or not os.path.isdir(path):
+        return rv
+
+    for filename in sorted(os.listdir(path)):
+        name, ext = os.path.splitext(filename)
+        if ext != DICTIONARY_EXTENSION:
+            continue
+        with open(os.path.join(path, filename), 'rb') as f:
+            data = f.read()
+        rv[name] = (get_dictionary_id(data), data)
+    return rv
+
+
+def get_dictionary_id(data):
+    # 0 is reserved for "no dictionary"
+    return (zlib.crc32(data) & 0xffffffff) or 1
+
+
+class NodeCodec(object):
+    """
+    Serializes and compresses node data.
+
+    >>> codec = NodeCodec(serializer='msgpack', compression='zstd', level=3)
+    >>> codec.decode(codec.encode({'foo': 'bar'}))
+    {'foo': 'bar'}
+    """
+
+    def __init__(self, serializer='msgpack', compression='zlib', level=None,
+                 dictionaries=None, dictionary_path=None):
+        if serializer not in SERIALIZERS:
+            raise CodecError('Unknown serializer: %r' % (serializer, ))
+        if compression not in COMPRESSIONS:
+            raise CodecError('Unknown compression: %r' % (compression, ))
+        if compression == 'zstd' and zstandard is None:
+            raise CodecError('zstd compression requires the zstandard package')
+
+        self.serializer = serializer
+        self.compression = compression
+        self.level = level
+
+        if dictionaries is None:
+            dictionaries = load_dictionaries(dictionary_path)
+        # name -> (id, data)
+        self.dictionaries = dictionaries
+        self.dictionaries_by_id = {
+            id: data for id, data in six.itervalues(dictionaries)
+        }
+
+        self.__local = threading.local()
+
+    def __get_cached(self, name, dictionary_id, factory):
+        # zstd (de)compressors must not be used concurrently, so every thread
+        # gets its own set of them.
+        cache = self.__local.__dict__.setdefault(name, {})
+        try:
+            return cache[dictionary_id]
+        except KeyError:
+            rv = cache[dictionary_id] = factory()
+            return rv
+
+    def __get_zstd_dictionary(self, dictionary_id):
+        try:
+            data = self.dictionaries_by_id[dictionary_id]
+        except KeyError:
+            raise CodecError('Unknown compression dictionary: %s' % (dictionary_id, ))
+        return zstandard.ZstdCompressionDict(data)
+
+    def get_dictionary_id(self, project_id=None):
+        if self.compression != 'zstd' or not self.dictionaries:
+            return 0
+
+        entry = None
+        if project_id is not None:
+            entry = self.dictionaries.get(six.text_type(project_id))
+        if entry is None:
+            entry = self.dictionaries.get(GLOBAL_DICTIONARY)
+        return entry[0] if entry is not None else 0
+
+    def compress(self, value, dictionary_id=0):
+        if self.compression == 'none':
+            return value
+        elif self.compression == 'zlib':
+            if self.level is None:
+                return zlib.compress(value)
+            return zlib.compress(value, self.level)
+
+        def make_compressor():
+            kwargs = {}
+            if self.level is not None:
+                kwargs['level'] = self.level
+            if dictionary_id:
+                kwargs['dict_data'] = self.__get_zstd_dictionary(dictionary_id)
+            return zstandard.ZstdCompressor(**kwargs)
+
+        return self.__get_cached('compressors', dictionary_id, make_compressor).compress(value)
+
+    def decompress(self, compression, value, dictionary_id=0):
+        if compression == COMPRESSIONS['none']:
+            return value
+        elif compression == COMPRESSIONS['zlib']:
+            return zlib.decompress(value)
+        elif compression == COMPRESSIONS['zstd']:
+            if zstandard is None:
+                raise CodecError('zstd compression requires the zstandard package')
+
+            def make_decompressor():
+                if dictionary_id:
+                    return zstandard.ZstdDecompressor(
+                        dict_data=self.__get_zstd_dictionary(dictionary_id))
+                return zstandard.ZstdDecompressor()
+
+            return self.__get_cached(
+                'decompressors', dictionary_id, make_decompressor).decompress(value)
+
+        raise CodecError('Unknown compression: %r' % (compression, ))
+
+    def encode(self, data, project_id=None):
+        serializer = SERIALIZERS[self.serializer]
+        try:
+            value = serializer.dumps(data)
+        except (TypeError, ValueError):
+            # Not all data that ends up in nodes is representable by the
+            # faster serializers, pickle handles everything.
+            serializer = SERIALIZERS['pickle']
+            value = serializer.dumps(data)
+
+        dictionary_id = self.get_dictionary_id(project_id)
+        return HEADER.pack(
+            MAGIC,
+            VERSION,
+            serializer.id,
+            COMPRESSIONS[self.compression],
+            dictionary_id,
+        ) + self.compress(value, dictionary_id)
+
+    def decode(self, value):
+        if not is_encoded(value):
+            raise CodecError('Value is not encoded with a node codec')
+
+        magic, version, serializer_id, compression, dictionary_id = \
+            HEADER.unpack_from(value)
+        if version != VERSION:
+            raise CodecError('Unsupported codec version: %s' % (version, ))
+
+        for serializer in six.itervalues(SERIALIZERS):
+            if serializer.id == serializer_id:
+                break
+        else:
+            raise CodecError('Unknown serializer: %s' % (serializer_id, ))
+
+        return serializer.loads(
+            self.decompress(compression, value[HEADER.size:], dictionary_id))
+
+
+def get_project_id(data):
+    """
+    Return the project of a node, if it is known.
+
+    Nodes bound to a model carry a reference to it (see ``NodeData.bind_ref``),
+    which is the project for events.
+    """
+    try:
+        ref = data.get('_ref')
+    except AttributeError:
+        return None
+    return ref if isinstance(ref, six.integer_types) else None
+
+
+_codecs = (None, None, None)
+
+
+def _get_codecs():
+    global _codecs
+    options = getattr(settings, 'SENTRY_NODESTORE_CODEC', None) or {}
+    cached_options, codec, decoder = _codecs
+    if cached_options != options or decoder is None:
+        if options:
+            codec = decoder = NodeCodec(**options)
+        else:
+            codec, decoder = None, NodeCodec(compression='none')
+        _codecs = (dict(options), codec, decoder)
+    return codec, decoder
+
+
+def get_codec():
+    """
+    Return the codec configured with ``SENTRY_NODESTORE_CODEC``, if any.
+    Without a configuration, backends keep writing their legacy formats.
+    """
+    return _get_codecs()[0]
+
+
+def get_decoder():
+    """
+    Return a codec that can read encoded payloads, even when no codec is
+    configured for writing.
+    """
+    return _get_codecs()[1]
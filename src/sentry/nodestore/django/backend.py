@@ -10,6 +10,9 @@ from __future__ import absolute_import
 
 import math
 
+import six
+
+from django.db import IntegrityError, router, transaction
 from django.utils import timezone
 
 from sentry.db.models import create_or_update
@@ -29,7 +32,9 @@ class DjangoNodeStorage(NodeStorage):
             return None
 
     def get_multi(self, id_list):
-        return {n.id: n.data for n in Node.objects.filter(id__in=id_list)}
+        rv = dict.fromkeys(id_list)
+        rv.update((n.id, n.data) for n in Node.objects.filter(id__in=id_list))
+        return rv
 
     def delete_multi(self, id_list):
         Node.objects.filter(id__in=id_list).delete()
@@ -44,6 +49,32 @@ class DjangoNodeStorage(NodeStorage):
             },
         )
 
+    def set_multi(self, values):
+        if not values:
+            return
+
+        # Nodes are almost always written once, so insert everything that
+        # doesn't exist yet in one statement and only update the rest
+        # individually.
+        existing = set(Node.objects.filter(
+            id__in=list(values),
+        ).values_list('id', flat=True))
+
+        timestamp = timezone.now()
+        try:
+            with transaction.atomic(using=router.db_for_write(Node)):
+                Node.objects.bulk_create([
+                    Node(id=id, data=data, timestamp=timestamp)
+                    for id, data in six.iteritems(values)
+                    if id not in existing
+                ])
+        except IntegrityError:
+            # Somebody else created some of these nodes in the meantime.
+            existing = set(values)
+
+        for id in existing:
+            self.set(id, values[id])
+
     def cleanup(self, cutoff_timestamp):
         from sentry.db.deletion import BulkDeleteQuery
 
@@ -8,10 +8,61 @@ sentry.nodestore.django.models
 
 from __future__ import absolute_import
 
+import logging
+import six
+
+from base64 import b64decode, b64encode
+
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
 from sentry.db.models import (BaseModel, GzippedDictField, sane_repr)
+from sentry.nodestore.codec import (
+    CodecError, get_codec, get_decoder, get_project_id, is_encoded
+)
+
+logger = logging.getLogger('sentry')
+
+
+class NodeDataField(GzippedDictField):
+    """
+    Stores node data encoded with the configured node codec (see
+    ``SENTRY_NODESTORE_CODEC``), falling back to the pickle+zlib format of
+    ``GzippedDictField`` when there is none. Both formats can be read.
+
+    Unlike ``GzippedDictField`` a payload that cannot be decoded raises a
+    ``CodecError`` rather than reading as an empty dict, which would
+    otherwise be written back over the stored data on the next save.
+    """
+
+    def to_python(self, value):
+        if isinstance(value, six.string_types) and value:
+            try:
+                decoded = b64decode(value)
+            except (TypeError, ValueError):
+                decoded = None
+            if decoded is not None and is_encoded(decoded):
+                try:
+                    return get_decoder().decode(decoded)
+                except Exception as e:
+                    logger.exception(e)
+                    if isinstance(e, CodecError):
+                        raise
+                    six.raise_from(CodecError('Could not decode node data: %s' % (e, )), e)
+        return super(NodeDataField, self).to_python(value)
+
+    def get_prep_value(self, value):
+        codec = get_codec()
+        if codec is None or (not value and self.null):
+            return super(NodeDataField, self).get_prep_value(value)
+        return b64encode(codec.encode(value, project_id=get_project_id(value))).decode('utf-8')
+
+
+if 'south' in settings.INSTALLED_APPS:
+    from south.modelsinspector import add_introspection_rules
+
+    add_introspection_rules([], ["^sentry\.nodestore\.django\.models\.NodeDataField"])
 
 
 class Node(BaseModel):
@@ -20,7 +71,7 @@ class Node(BaseModel):
     id = models.CharField(max_length=40, primary_key=True)
     # TODO(dcramer): this being pickle and not JSON has the ability to cause
     # hard errors as it accepts other serialization than native JSON
-    data = GzippedDictField()
+    data = NodeDataField()
     timestamp = models.DateTimeField(default=timezone.now, db_index=True)
 
     __repr__ = sane_repr('timestamp')
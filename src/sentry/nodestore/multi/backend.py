@@ -9,9 +9,12 @@ sentry.nodestore.multi.backend
 from __future__ import absolute_import
 
 import random
+import sys
 
 import six
 
+from concurrent.futures import ThreadPoolExecutor
+
 from sentry.nodestore.base import NodeStorage
 from sentry.utils.imports import import_string
 
@@ -24,13 +27,20 @@ class MultiNodeStorage(NodeStorage):
     This is not intended for consistency, but is instead designed to allow you
     to dual-write for purposes of migrations.
 
+    Writes are sent to every backend using each backend's own multi-key
+    operations. With ``write_concurrency`` greater than one, the backends are
+    written to in parallel threads. Since backends are thread-local, every
+    worker thread will set up its own connections, so this is only worthwhile
+    for network backends that do not share state with the calling thread
+    (i.e. not the Django backend inside a transaction.)
+
     >>> MultiNodeStorage(backends=[
     >>>     ('sentry.nodestore.django.backend.DjangoNodeStorage', {}),
     >>>     ('sentry.nodestore.riak.backend.RiakNodeStorage', {}),
     >>> ], read_selector=lambda backends: backends[0])
     """
 
-    def __init__(self, backends, read_selector=random.choice, **kwargs):
+    def __init__(self, backends, read_selector=random.choice, write_concurrency=1, **kwargs):
         assert backends, "you should provide at least one backend"
 
         self.backends = []
@@ -39,8 +49,40 @@ class MultiNodeStorage(NodeStorage):
                 backend = import_string(backend)
             self.backends.append(backend(**backend_options))
         self.read_selector = read_selector
+        self.write_concurrency = write_concurrency
         super(MultiNodeStorage, self).__init__(**kwargs)
 
+    def _call_all(self, method, *args, **kwargs):
+        """
+        Call ``method`` on every backend. Errors are raised after all
+        backends have been called, so that a failing backend doesn't prevent
+        writes to the others.
+        """
+        errors = []
+
+        if self.write_concurrency > 1 and len(self.backends) > 1:
+            workers = min(self.write_concurrency, len(self.backends))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(getattr(backend, method), *args, **kwargs)
+                    for backend in self.backends
+                ]
+
+            for future in futures:
+                try:
+                    future.result()
+                except Exception:
+                    errors.append(sys.exc_info())
+        else:
+            for backend in self.backends:
+                try:
+                    getattr(backend, method)(*args, **kwargs)
+                except Exception:
+                    errors.append(sys.exc_info())
+
+        if errors:
+            six.reraise(*errors[0])
+
     def get(self, id):
         # just fetch it from a random backend, we're not aiming for consistency
         backend = self.read_selector(self.backends)
@@ -51,45 +93,16 @@ class MultiNodeStorage(NodeStorage):
         return backend.get_multi(id_list=id_list)
 
     def set(self, id, data, ttl=None):
-        should_raise = False
-        for backend in self.backends:
-            try:
-                backend.set(id, data, ttl=ttl)
-            except Exception:
-                should_raise = True
-
-        if should_raise:
-            raise
+        self._call_all('set', id, data, ttl=ttl)
 
     def set_multi(self, values):
-        should_raise = False
-        for backend in self.backends:
-            try:
-                backend.set_multi(values)
-            except Exception:
-                should_raise = True
-
-        if should_raise:
-            raise
+        self._call_all('set_multi', values)
 
     def delete(self, id):
-        should_raise = False
-        for backend in self.backends:
-            try:
-                backend.delete(id)
-            except Exception:
-                should_raise = True
+        self._call_all('delete', id)
 
-        if should_raise:
-            raise
+    def delete_multi(self, id_list):
+        self._call_all('delete_multi', id_list)
 
     def cleanup(self, cutoff_timestamp):
-        should_raise = False
-        for backend in self.backends:
-            try:
-                backend.cleanup(cutoff_timestamp)
-            except Exception:
-                should_raise = True
-
-        if should_raise:
-            raise
+        self._call_all('cleanup', cutoff_timestamp)
@@ -13,6 +13,7 @@ import six
 from collections import namedtuple
 from time import time
 from random import random
+from uuid import uuid4
 
 from django.db.utils import ProgrammingError, OperationalError
 from django.utils import timezone
@@ -22,6 +23,12 @@ from sentry.utils.hashlib import md5_text
 
 Key = namedtuple('Key', ('name', 'default', 'type', 'flags', 'ttl', 'grace', 'cache_key'))
 
+# A snapshot of the values of all options, and the time at which it was last
+# verified to be the current one.
+Snapshot = namedtuple('Snapshot', ('version', 'values', 'verified'))
+
+SNAPSHOT_VERSION_KEY = 'o:snapshot'
+
 CACHE_FETCH_ERR = 'Unable to fetch option cache for %s'
 CACHE_UPDATE_ERR = 'Unable to update option cache for %s'
 
@@ -32,6 +39,10 @@ def _make_cache_key(key):
     return 'o:%s' % md5_text(key).hexdigest()
 
 
+def _make_snapshot_cache_key(version):
+    return 'o:snapshot:%s' % version
+
+
 def _make_cache_value(key, value):
     now = int(time())
     return (value, now + key.ttl, now + key.ttl + key.grace, )
@@ -49,9 +60,13 @@ class OptionsStore(object):
     OptionsManager instead, unless you need raw access to something.
     """
 
-    def __init__(self, cache=None, ttl=None):
+    def __init__(self, cache=None, ttl=None, snapshot=False):
         self.cache = cache
         self.ttl = ttl
+        # In snapshot mode, all options are loaded at once and kept in the
+        # cache as a single value. Its version is stored separately, so that
+        # checking whether the local snapshot is still current is cheap.
+        self.snapshot = snapshot
         self.flush_local_cache()
 
     @cached_property
@@ -66,6 +81,10 @@ class OptionsStore(object):
         """
         Fetches a value from the options store.
         """
+        # Without a cache, loading everything on every lookup isn't worth it.
+        if self.snapshot and self.cache is not None:
+            return self.get_snapshot(key, silent=silent)
+
         result = self.get_cache(key, silent=silent)
         if result is not None:
             return result
@@ -186,6 +205,121 @@ class OptionsStore(object):
                     }, exc_info=True)
         return value
 
+    def get_snapshot(self, key, silent=False):
+        """
+        Fetches a value from the snapshot of all options.
+
+        The local snapshot is used for the TTL of the key since it was last
+        verified to be current. Beyond that, it is checked against the version
+        in the cache (and replaced if there is a newer one.) If neither the
+        cache nor the database can be reached, the local snapshot is still
+        used within the grace period of the key.
+        """
+        now = int(time())
+        snapshot = self._local_snapshot
+        if snapshot is not None and now < snapshot.verified + key.ttl:
+            return snapshot.values.get(key.name)
+
+        values = self.refresh_snapshot(silent=silent)
+        if values is not None:
+            return values.get(key.name)
+
+        if snapshot is not None and now < snapshot.verified + key.ttl + key.grace:
+            return snapshot.values.get(key.name)
+
+        return None
+
+    def refresh_snapshot(self, silent=False):
+        """
+        Make sure that the local snapshot is the current one, and return its
+        values. Returns None if neither the cache nor the database could be
+        reached.
+        """
+        try:
+            version = self.cache.get(SNAPSHOT_VERSION_KEY)
+        except Exception:
+            if not silent:
+                logger.warn(CACHE_FETCH_ERR, SNAPSHOT_VERSION_KEY, extra={
+                    'key': SNAPSHOT_VERSION_KEY,
+                }, exc_info=True)
+            version = None
+
+        snapshot = self._local_snapshot
+        if version is not None and snapshot is not None and snapshot.version == version:
+            self._local_snapshot = snapshot._replace(verified=int(time()))
+            return snapshot.values
+
+        values = None
+        if version is not None:
+            try:
+                values = self.cache.get(_make_snapshot_cache_key(version))
+            except Exception:
+                if not silent:
+                    logger.warn(CACHE_FETCH_ERR, SNAPSHOT_VERSION_KEY, extra={
+                        'key': SNAPSHOT_VERSION_KEY,
+                    }, exc_info=True)
+
+        if values is None:
+            values = self.get_store_snapshot(silent=silent)
+            if values is None:
+                return None
+
+            # The database is at least as recent as an existing version, so
+            # the snapshot can be stored for it. Otherwise a new version is
+            # added, unless someone else (e.g. a writer) was faster.
+            new_version = version is None
+            if new_version:
+                version = uuid4().hex
+            try:
+                self.cache.set(_make_snapshot_cache_key(version), values, self.ttl)
+                if new_version:
+                    self.cache.add(SNAPSHOT_VERSION_KEY, version, self.ttl)
+            except Exception:
+                if not silent:
+                    logger.warn(CACHE_UPDATE_ERR, SNAPSHOT_VERSION_KEY, extra={
+                        'key': SNAPSHOT_VERSION_KEY,
+                    }, exc_info=True)
+
+        self._local_snapshot = Snapshot(version, values, int(time()))
+        return values
+
+    def get_store_snapshot(self, silent=False):
+        """
+        Load the values of all options from the database, or None if that
+        fails.
+        """
+        try:
+            return {
+                option.key: option.value
+                for option in self.model.objects.only('key', 'value')
+            }
+        except (ProgrammingError, OperationalError):
+            return None
+        except Exception:
+            if not silent:
+                logger.exception('option.failed-snapshot')
+            return None
+
+    def expire_snapshot(self):
+        """
+        Start a new snapshot version, so that all stores reload their
+        snapshots. A boolean is returned to indicate if the network cache was
+        updated successfully.
+        """
+        self._local_snapshot = None
+
+        if self.cache is None:
+            return None
+
+        try:
+            self.cache.set(SNAPSHOT_VERSION_KEY, uuid4().hex, self.ttl)
+            return True
+        except Exception:
+            logger.warn(CACHE_UPDATE_ERR, SNAPSHOT_VERSION_KEY, extra={
+                'key': SNAPSHOT_VERSION_KEY,
+            }, exc_info=True)
+            return False
+
     def set(self, key, value):
         """
         Store a value in the option store. Value must get persisted to database first,
@@ -196,7 +330,9 @@ class OptionsStore(object):
         assert self.cache is not None, 'cache must be configured before mutating options'
 
         self.set_store(key, value)
-        return self.set_cache(key, value)
+        result = self.set_cache(key, value)
+        self.expire_snapshot()
+        return result
 
     def set_store(self, key, value):
         create_or_update(
@@ -236,7 +372,9 @@ class OptionsStore(object):
         assert self.cache is not None, 'cache must be configured before mutating options'
 
         self.delete_store(key)
-        return self.delete_cache(key)
+        result = self.delete_cache(key)
+        self.expire_snapshot()
+        return result
 
     def delete_store(self, key):
         self.model.objects.filter(key=key.name).delete()
@@ -290,6 +428,7 @@ class OptionsStore(object):
         Empty store's local in-process cache.
         """
         self._local_cache = {}
+        self._local_snapshot = None
 
     def maybe_clean_local_cache(self, **kwargs):
         # Periodically force an expire on the local cache.
@@ -1,12 +1,15 @@
 from __future__ import absolute_import
 
+import re
+import six
+
 from collections import namedtuple
-from fnmatch import fnmatch
+from fnmatch import fnmatch, translate
 from parsimonious.grammar import Grammar, NodeVisitor
 from parsimonious.exceptions import ParseError  # noqa
 from sentry.utils.safe import get_path
 
-__all__ = ('parse_rules', 'dump_schema', 'load_schema')
+__all__ = ('parse_rules', 'dump_schema', 'load_schema', 'compile_rules')
 
 VERSION = 1
 
@@ -197,6 +200,93 @@ class OwnershipVisitor(NodeVisitor):
         return children or node
 
 
+class RuleIndex(object):
+    """
+    A compiled, read-only view over a list of Rules.
+
+    Every glob is translated into a regex once, and all globs of a
+    type are additionally combined into a single alternation. Matching
+    collects the url and the distinct frame filenames of an event in one
+    pass, rejects them against the combined regex, and only then
+    resolves which individual rules were hit. The result is identical
+    to calling `Rule.test` for every rule, in the same order.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self._patterns = {}
+        self._combined = {}
+
+        for matcher_type in ('path', 'url'):
+            patterns = []
+            for idx, rule in enumerate(self.rules):
+                if rule.matcher.type != matcher_type:
+                    continue
+                patterns.append((idx, translate(rule.matcher.pattern)))
+            self._patterns[matcher_type] = [
+                (idx, re.compile(pattern)) for idx, pattern in patterns
+            ]
+            if patterns:
+                self._combined[matcher_type] = re.compile(
+                    u'|'.join(u'(?:%s)' % pattern for _, pattern in patterns)
+                )
+
+    def __len__(self):
+        return len(self.rules)
+
+    def _match_values(self, matcher_type, values, matched):
+        combined = self._combined.get(matcher_type)
+        if combined is None:
+            return
+
+        pending = self._patterns[matcher_type]
+        for value in values:
+            if not pending:
+                break
+            if not isinstance(value, six.string_types) or combined.match(value) is None:
+                continue
+            remaining = []
+            for idx, regex in pending:
+                if regex.match(value) is not None:
+                    matched.add(idx)
+                else:
+                    remaining.append((idx, regex))
+            pending = remaining
+
+    def match(self, data):
+        """Return all rules matching the event data, in rule order."""
+        if not self.rules:
+            return []
+
+        matched = set()
+
+        if 'url' in self._combined:
+            try:
+                url = data['request']['url']
+            except KeyError:
+                pass
+            else:
+                self._match_values('url', [url], matched)
+
+        if 'path' in self._combined:
+            filenames = []
+            seen = set()
+            for frame in _iter_frames(data):
+                try:
+                    filename = frame['filename']
+                except KeyError:
+                    try:
+                        filename = frame['abs_path']
+                    except KeyError:
+                        continue
+                if filename not in seen:
+                    seen.add(filename)
+                    filenames.append(filename)
+            self._match_values('path', filenames, matched)
+
+        return [rule for idx, rule in enumerate(self.rules) if idx in matched]
+
+
 def _iter_frames(data):
     try:
         for frame in get_path(data, 'stacktrace', 'frames', filter=True) or ():
@@ -236,3 +326,8 @@ def load_schema(schema):
     if schema['$version'] != VERSION:
         raise RuntimeError('Invalid schema $version: %r' % schema['$version'])
     return [Rule.load(r) for r in schema['rules']]
+
+
+def compile_rules(rules):
+    """Convert a Rule tree into a RuleIndex for bulk matching"""
+    return RuleIndex(rules)
@@ -4,9 +4,20 @@ from sentry.utils.services import Service
 
 
 class RateLimiter(Service):
-    __all__ = ('is_limited', 'validate')
+    __all__ = ('is_limited', 'is_limited_multi', 'validate')
 
     window = 60
 
     def is_limited(self, key, limit, project=None, window=None):
         return False
+
+    def is_limited_multi(self, keys, project=None, window=None):
+        """
+        Check several limits at once. ``keys`` is a sequence of ``(key,
+        limit)`` pairs, and a list of whether every key is limited is
+        returned. Unlike consecutive calls to ``is_limited``, all keys are
+        counted even if one of them is limited.
+        """
+        return [
+            self.is_limited(key, limit, project=project, window=window) for key, limit in keys
+        ]
@@ -1,6 +1,7 @@
 from __future__ import absolute_import
 
 import six
+import threading
 
 from time import time
 
@@ -11,10 +12,38 @@ from sentry.utils.redis import get_cluster_from_options
 
 
 class RedisRateLimiter(RateLimiter):
+    """
+    Counts requests per key and window in Redis.
+
+    With the ``lease_ratio`` option, a process reserves a slice of
+    ``limit * lease_ratio`` requests of a window from Redis at once, and
+    answers further checks of that key from memory until the slice is used up
+    (or the window ends.) Once the budget of a window is exhausted, this is
+    remembered in memory too, so limited clients do not cause any Redis
+    traffic until the next window starts.
+
+    Slices are taken from the shared counter, so no more than ``limit``
+    requests are ever allowed in a window. Requests reserved by one process
+    are not available to others though: with ``n`` processes and slices of
+    ``s`` requests, a key may be limited after as few as
+    ``limit - (n - 1) * (s - 1)`` requests in a window. Slices of less than
+    two requests are never taken, so low limits are always counted exactly.
+    """
     window = 60
 
+    # The maximum number of keys with local leases, expired leases are
+    # dropped when it is exceeded.
+    max_leases = 10000
+
     def __init__(self, **options):
         self.cluster, options = get_cluster_from_options('SENTRY_RATELIMITER_OPTIONS', options)
+        self.lease_ratio = options.pop('lease_ratio', 0)
+        if not 0 <= self.lease_ratio <= 1:
+            raise InvalidConfiguration('lease_ratio must be between 0 and 1')
+
+        # redis key -> (window end, remaining requests, exhausted)
+        self.__leases = {}
+        self.__leases_lock = threading.Lock()
 
     def validate(self):
         try:
@@ -23,20 +52,89 @@ class RedisRateLimiter(RateLimiter):
         except Exception as e:
             raise InvalidConfiguration(six.text_type(e))
 
+    def get_lease_size(self, limit):
+        size = int(limit * self.lease_ratio)
+        return size if size > 1 else 1
+
+    def __use_lease(self, key, now):
+        """
+        Serves a request from a local lease. Returns whether the request is
+        limited, or `None` if the lease is used up.
+        """
+        with self.__leases_lock:
+            lease = self.__leases.get(key)
+            if lease is None:
+                return None
+
+            expires, remaining, exhausted = lease
+            if expires <= now:
+                del self.__leases[key]
+                return None
+
+            if remaining > 0:
+                self.__leases[key] = (expires, remaining - 1, exhausted)
+                return False
+            elif exhausted:
+                return True
+
+            del self.__leases[key]
+            return None
+
+    def __store_lease(self, key, expires, remaining, exhausted, now):
+        with self.__leases_lock:
+            if len(self.__leases) >= self.max_leases:
+                for k, lease in list(self.__leases.items()):
+                    if lease[0] <= now:
+                        del self.__leases[k]
+                if len(self.__leases) >= self.max_leases:
+                    self.__leases.clear()
+            self.__leases[key] = (expires, remaining, exhausted)
+
     def is_limited(self, key, limit, project=None, window=None):
+        return self.is_limited_multi([(key, limit)], project=project, window=window)[0]
+
+    def is_limited_multi(self, keys, project=None, window=None):
         if window is None:
             window = self.window
 
-        key_hex = md5_text(key).hexdigest()
-        bucket = int(time() / window)
+        now = time()
+        bucket = int(now / window)
+        expires = (bucket + 1) * window
+
+        rv = [None] * len(keys)
+        pending = []
+        for index, (key, limit) in enumerate(keys):
+            key_hex = md5_text(key).hexdigest()
+            if project:
+                key = 'rl:%s:%s:%s' % (key_hex, project.id, bucket)
+            else:
+                key = 'rl:%s:%s' % (key_hex, bucket)
 
-        if project:
-            key = 'rl:%s:%s:%s' % (key_hex, project.id, bucket)
-        else:
-            key = 'rl:%s:%s' % (key_hex, bucket)
+            size = self.get_lease_size(limit)
+            if size > 1:
+                rv[index] = self.__use_lease(key, now)
+            if rv[index] is None:
+                pending.append((index, key, limit, size))
+
+        if not pending:
+            return rv
 
         with self.cluster.map() as client:
-            result = client.incr(key)
-            client.expire(key, window)
+            results = []
+            for index, key, limit, size in pending:
+                results.append(client.incrby(key, size))
+                client.expire(key, window)
+
+        for (index, key, limit, size), result in zip(pending, results):
+            if size == 1:
+                rv[index] = result.value > limit
+                continue
+
+            # The counter already contained the requests of the previous
+            # leases (of all processes), only what is left of the limit can
+            # be handed out.
+            granted = min(size, limit - (result.value - size))
+            rv[index] = granted <= 0
+            self.__store_lease(key, expires, max(granted - 1, 0), granted < size, now)
 
-        return result.value > limit
+        return rv
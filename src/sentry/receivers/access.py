@@ -0,0 +1,81 @@
+from __future__ import absolute_import, print_function
+
+from django.db.models.signals import post_delete, post_save
+
+from sentry.auth.access import expire_access
+from sentry.models import (
+    AuthIdentity, AuthProvider, OrganizationMember, OrganizationMemberTeam, Project, ProjectTeam,
+    Team, UserPermission
+)
+
+
+def _expire_for_team(team_id):
+    expire_access(organization_ids=Team.objects.filter(
+        id=team_id,
+    ).values_list('organization_id', flat=True))
+
+
+def expire_on_organization_change(instance, **kwargs):
+    expire_access(organization_ids=[instance.organization_id])
+
+
+def expire_on_team_membership_change(instance, **kwargs):
+    _expire_for_team(instance.team_id)
+
+
+def expire_on_user_change(instance, **kwargs):
+    expire_access(user_ids=[instance.user_id])
+
+
+for signal in (post_save, post_delete):
+    signal.connect(
+        expire_on_organization_change,
+        sender=OrganizationMember,
+        dispatch_uid='expire_access_member',
+        weak=False,
+    )
+    signal.connect(
+        expire_on_organization_change,
+        sender=Team,
+        dispatch_uid='expire_access_team',
+        weak=False,
+    )
+    signal.connect(
+        expire_on_organization_change,
+        sender=AuthProvider,
+        dispatch_uid='expire_access_auth_provider',
+        weak=False,
+    )
+    signal.connect(
+        expire_on_team_membership_change,
+        sender=OrganizationMemberTeam,
+        dispatch_uid='expire_access_member_team',
+        weak=False,
+    )
+    signal.connect(
+        expire_on_team_membership_change,
+        sender=ProjectTeam,
+        dispatch_uid='expire_access_project_team',
+        weak=False,
+    )
+    signal.connect(
+        expire_on_user_change,
+        sender=AuthIdentity,
+        dispatch_uid='expire_access_auth_identity',
+        weak=False,
+    )
+    signal.connect(
+        expire_on_user_change,
+        sender=UserPermission,
+        dispatch_uid='expire_access_user_permission',
+        weak=False,
+    )
+
+# The teams of a project are tracked through ``ProjectTeam``, but deleted
+# projects should not linger in any access.
+post_delete.connect(
+    expire_on_organization_change,
+    sender=Project,
+    dispatch_uid='expire_access_project',
+    weak=False,
+)
@@ -0,0 +1,114 @@
+from __future__ import absolute_import, print_function
+
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from sentry.models import (
+    OrganizationMember, OrganizationMemberTeam, ProjectTeam, Team, User, UserEmail
+)
+from sentry.models.projectownership import invalidate_actors_cache
+
+
+def _invalidate_for_teams(team_ids):
+    project_ids = set(ProjectTeam.objects.filter(
+        team_id__in=team_ids,
+    ).values_list('project_id', flat=True))
+    if project_ids:
+        invalidate_actors_cache(project_ids)
+
+
+def _invalidate_for_users(user_ids):
+    _invalidate_for_teams(OrganizationMemberTeam.objects.filter(
+        organizationmember__user_id__in=user_ids,
+    ).values_list('team_id', flat=True))
+
+
+def invalidate_on_project_team_change(instance, **kwargs):
+    invalidate_actors_cache([instance.project_id])
+
+
+def invalidate_on_team_change(instance, **kwargs):
+    _invalidate_for_teams([instance.id])
+
+
+def invalidate_on_member_team_change(instance, **kwargs):
+    _invalidate_for_teams([instance.team_id])
+
+
+def invalidate_on_member_change(instance, **kwargs):
+    if instance.user_id is not None:
+        _invalidate_for_users([instance.user_id])
+
+
+def track_user_change(instance, **kwargs):
+    # Users are saved all the time (e.g. to record logins), but only their
+    # active state is part of the resolved actors, emails are handled through
+    # ``UserEmail``. The tracked values are reset by the time ``post_save``
+    # is sent, so the change is recorded beforehand.
+    instance._ownership_actors_changed = instance.has_changed('is_active')
+
+
+def invalidate_on_user_change(instance, created=False, **kwargs):
+    if created or not getattr(instance, '_ownership_actors_changed', False):
+        return
+    instance._ownership_actors_changed = False
+    _invalidate_for_users([instance.id])
+
+
+def invalidate_on_user_delete(instance, **kwargs):
+    _invalidate_for_users([instance.id])
+
+
+def invalidate_on_user_email_change(instance, **kwargs):
+    _invalidate_for_users([instance.user_id])
+
+
+for signal in (post_save, post_delete):
+    signal.connect(
+        invalidate_on_project_team_change,
+        sender=ProjectTeam,
+        dispatch_uid='invalidate_ownership_actors_project_team',
+        weak=False,
+    )
+    signal.connect(
+        invalidate_on_team_change,
+        sender=Team,
+        dispatch_uid='invalidate_ownership_actors_team',
+        weak=False,
+    )
+    signal.connect(
+        invalidate_on_member_team_change,
+        sender=OrganizationMemberTeam,
+        dispatch_uid='invalidate_ownership_actors_member_team',
+        weak=False,
+    )
+    signal.connect(
+        invalidate_on_member_change,
+        sender=OrganizationMember,
+        dispatch_uid='invalidate_ownership_actors_member',
+        weak=False,
+    )
+    signal.connect(
+        invalidate_on_user_email_change,
+        sender=UserEmail,
+        dispatch_uid='invalidate_ownership_actors_user_email',
+        weak=False,
+    )
+
+pre_save.connect(
+    track_user_change,
+    sender=User,
+    dispatch_uid='track_ownership_actors_user',
+    weak=False,
+)
+post_save.connect(
+    invalidate_on_user_change,
+    sender=User,
+    dispatch_uid='invalidate_ownership_actors_user',
+    weak=False,
+)
+post_delete.connect(
+    invalidate_on_user_delete,
+    sender=User,
+    dispatch_uid='invalidate_ownership_actors_user_delete',
+    weak=False,
+)
@@ -45,16 +45,21 @@ def resolved_in_commit(instance, created, **kwargs):
 
     groups = instance.find_referenced_groups()
 
-    # Delete GroupLinks where message may have changed
-    group_ids = {g.id for g in groups}
-    group_links = GroupLink.objects.filter(
-        linked_type=GroupLink.LinkedType.commit,
-        relationship=GroupLink.Relationship.resolves,
-        linked_id=instance.id,
-    )
-    for link in group_links:
-        if link.group_id not in group_ids:
-            remove_resolved_link(link)
+    # Delete GroupLinks where message may have changed, new commits cannot
+    # have any yet.
+    if not created:
+        group_ids = {g.id for g in groups}
+        group_links = GroupLink.objects.filter(
+            linked_type=GroupLink.LinkedType.commit,
+            relationship=GroupLink.Relationship.resolves,
+            linked_id=instance.id,
+        )
+        for link in group_links:
+            if link.group_id not in group_ids:
+                remove_resolved_link(link)
+
+    if not groups:
+        return
 
     try:
         repo = Repository.objects.get(id=instance.repository_id)
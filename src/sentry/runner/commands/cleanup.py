@@ -8,14 +8,16 @@ sentry.runner.commands.cleanup
 from __future__ import absolute_import, print_function
 
 import os
+import threading
 from datetime import timedelta
 from uuid import uuid4
 
 import click
+import six
 from django.utils import timezone
 
 from sentry.runner.decorators import log_options
-from six.moves import xrange
+from six.moves import queue, xrange
 
 
 # allows services like tagstore to add their own (abstracted) models
@@ -45,19 +47,43 @@ def get_project(value):
 # and child proc
 _STOP_WORKER = '91650ec271ae4b3e8a67cdc909d80f8c'
 
+# How often (in seconds) the workers are checked for unexpected exits while
+# waiting on them.
+_WORKER_CHECK_INTERVAL = 5
 
-def multiprocess_worker(task_queue):
+
+def multiprocess_worker(task_queue, result_queue=None):
     # Configure within each Process
     import logging
+    import time
+    from collections import defaultdict
     from sentry.utils.imports import import_string
 
     logger = logging.getLogger('sentry.cleanup')
 
     configured = False
 
+    # model name -> [rows deleted, seconds spent]
+    totals = defaultdict(lambda: [0, 0.0])
+
+    def delete_chunk(model, chunk):
+        task = deletions.get(
+            model=model,
+            query={'id__in': chunk},
+            skip_models=skip_models,
+            transaction_id=uuid4().hex,
+        )
+
+        while True:
+            if not task.chunk():
+                break
+        return len(chunk)
+
     while True:
         j = task_queue.get()
         if j == _STOP_WORKER:
+            if result_queue is not None:
+                result_queue.put(dict(totals))
             task_queue.task_done()
             return
 
@@ -69,6 +95,8 @@ def multiprocess_worker(task_queue):
             from sentry import models
             from sentry import deletions
             from sentry import similarity
+            from sentry.db.deletion import BulkDeleteQuery
+            from sentry.utils import metrics
 
             skip_models = [
                 # Handled by other parts of cleanup
@@ -85,20 +113,36 @@ def multiprocess_worker(task_queue):
 
             configured = True
 
-        model, chunk = j
-        model = import_string(model)
+        kind, args = j[0], j[1:]
+        started = time.time()
 
         try:
-            task = deletions.get(
-                model=model,
-                query={'id__in': chunk},
-                skip_models=skip_models,
-                transaction_id=uuid4().hex,
-            )
-
-            while True:
-                if not task.chunk():
-                    break
+            if kind == 'iterate':
+                # A shard of a `BulkDeleteQuery` whose matching rows are
+                # deleted through the deletions code path.
+                query_kwargs, = args
+                query_kwargs = dict(query_kwargs, model=import_string(query_kwargs['model']))
+                model_name = query_kwargs['model'].__name__
+                deleted = 0
+                for chunk in BulkDeleteQuery(**query_kwargs).iterator(chunk_size=100):
+                    try:
+                        deleted += delete_chunk(query_kwargs['model'], chunk)
+                    except Exception as e:
+                        logger.exception(e)
+            elif kind == 'bulk':
+                # A shard of a `BulkDeleteQuery` executed directly.
+                query_kwargs, chunk_size = args
+                query_kwargs = dict(query_kwargs, model=import_string(query_kwargs['model']))
+                model_name = query_kwargs['model'].__name__
+                deleted = BulkDeleteQuery(**query_kwargs).execute(chunk_size=chunk_size)
+            else:
+                raise ValueError('Unknown cleanup task: %r' % (kind, ))
+
+            duration = time.time() - started
+            totals[model_name][0] += deleted
+            totals[model_name][1] += duration
+            metrics.incr('cleanup.deleted', amount=deleted, tags={'model': model_name})
+            metrics.timing('cleanup.task.duration', duration, tags={'model': model_name})
         except Exception as e:
             logger.exception(e)
         finally:
@@ -136,6 +180,9 @@ def cleanup(days, project, concurrency, silent, model, router, timed):
     but if you have a specific project you want to limit this to this can be
     done with the `--project` flag which accepts a project ID or a string
     with the form `org/project` where both are slugs.
+
+    Every model is split into `--concurrency` id ranges which are deleted
+    by the worker processes in parallel.
     """
     if concurrency < 1:
         click.echo('Error: Minimum concurrency is 1', err=True)
@@ -145,12 +192,13 @@ def cleanup(days, project, concurrency, silent, model, router, timed):
 
     # Make sure we fork off multiprocessing pool
     # before we import or configure the app
-    from multiprocessing import Process, JoinableQueue as Queue
+    from multiprocessing import Process, JoinableQueue as Queue, Queue as ResultQueue
 
     pool = []
     task_queue = Queue(1000)
+    result_queue = ResultQueue()
     for _ in xrange(concurrency):
-        p = Process(target=multiprocess_worker, args=(task_queue,))
+        p = Process(target=multiprocess_worker, args=(task_queue, result_queue))
         p.daemon = True
         p.start()
         pool.append(p)
@@ -225,12 +273,14 @@ def cleanup(days, project, concurrency, silent, model, router, timed):
 
     project_id = None
     if project:
-        click.echo(
-            "Bulk NodeStore deletion not available for project selection", err=True)
         project_id = get_project(project)
         if project_id is None:
             click.echo('Error: Project not found', err=True)
             raise click.Abort()
+        if not silent:
+            # Node data of a single project can't be located by timestamp,
+            # it is removed in batches together with the expired events.
+            click.echo("Removing NodeStore values along with expired events")
     else:
         if not silent:
             click.echo("Removing old NodeStore values")
@@ -242,6 +292,52 @@ def cleanup(days, project, concurrency, silent, model, router, timed):
             click.echo(
                 "NodeStore backend does not support cleanup operation", err=True)
 
+    def check_workers(stopped=False):
+        # A worker that is killed (e.g. by the OOM killer) never marks its
+        # task as done or reports its totals, so waiting on it would block
+        # forever.
+        failed = [
+            p for p in pool
+            if p.exitcode is not None and (p.exitcode != 0 or not stopped)
+        ]
+        if failed:
+            raise click.ClickException(
+                u'{} cleanup worker(s) exited unexpectedly (exit codes: {})'.format(
+                    len(failed),
+                    ', '.join(six.text_type(p.exitcode) for p in failed),
+                )
+            )
+
+    def wait_for_tasks():
+        # `JoinableQueue.join` has no timeout, so it is waited on in a thread
+        # while the workers are being watched.
+        joiner = threading.Thread(target=task_queue.join)
+        joiner.daemon = True
+        joiner.start()
+        while True:
+            joiner.join(_WORKER_CHECK_INTERVAL)
+            if not joiner.is_alive():
+                return
+            check_workers()
+
+    def get_result():
+        while True:
+            try:
+                return result_queue.get(timeout=_WORKER_CHECK_INTERVAL)
+            except queue.Empty:
+                check_workers(stopped=True)
+                if all(p.exitcode is not None for p in pool):
+                    raise click.ClickException(
+                        'Cleanup workers exited without reporting their results')
+
+    def enqueue_shards(task, query, *args):
+        # Split each query into one id range per worker, so that the scan
+        # and the deletion of a single model are spread across the pool.
+        for shard in query.shard(concurrency):
+            task_queue.put((task, shard.get_kwargs()) + args)
+
+    # Independent bulk deletions are sent to the pool together with the
+    # event deletions, and run concurrently.
     for bqd in BULK_QUERY_DELETES:
         if len(bqd) == 4:
             model, dtfield, order_by, chunk_size = bqd
@@ -261,13 +357,17 @@ def cleanup(days, project, concurrency, silent, model, router, timed):
             if not silent:
                 click.echo('>> Skipping %s' % model.__name__)
         else:
-            BulkDeleteQuery(
-                model=model,
-                dtfield=dtfield,
-                days=days,
-                project_id=project_id,
-                order_by=order_by,
-            ).execute(chunk_size=chunk_size)
+            enqueue_shards(
+                'bulk',
+                BulkDeleteQuery(
+                    model=model,
+                    dtfield=dtfield,
+                    days=days,
+                    project_id=project_id,
+                    order_by=order_by,
+                ),
+                chunk_size,
+            )
 
     for model, dtfield, order_by in DELETES:
         if not silent:
@@ -283,20 +383,20 @@ def cleanup(days, project, concurrency, silent, model, router, timed):
             if not silent:
                 click.echo('>> Skipping %s' % model.__name__)
         else:
-            imp = '.'.join((model.__module__, model.__name__))
-
-            q = BulkDeleteQuery(
-                model=model,
-                dtfield=dtfield,
-                days=days,
-                project_id=project_id,
-                order_by=order_by,
+            enqueue_shards(
+                'iterate',
+                BulkDeleteQuery(
+                    model=model,
+                    dtfield=dtfield,
+                    days=days,
+                    project_id=project_id,
+                    order_by=order_by,
+                ),
             )
 
-            for chunk in q.iterator(chunk_size=100):
-                task_queue.put((imp, chunk))
-
-            task_queue.join()
+            # Groups are only removed once their events are gone, as the
+            # group deletion would otherwise cascade into the same events.
+            wait_for_tasks()
 
     # Clean up FileBlob instances which are no longer used and aren't super
     # recent (as there could be a race between blob creation and reference)
@@ -312,10 +412,30 @@ def cleanup(days, project, concurrency, silent, model, router, timed):
     for _ in pool:
         task_queue.put(_STOP_WORKER)
 
+    # Every worker reports its totals once when it is stopped.
+    totals = {}
+    for _ in pool:
+        for model_name, (deleted, duration) in six.iteritems(get_result()):
+            model_totals = totals.setdefault(model_name, [0, 0.0])
+            model_totals[0] += deleted
+            model_totals[1] += duration
+
     # And wait for it to drain
     for p in pool:
         p.join()
 
+    if not silent:
+        for model_name, (deleted, duration) in sorted(totals.items()):
+            click.echo(
+                u'{model}: removed {deleted} row(s) in {duration:.1f} worker second(s) '
+                u'({rate:.1f}/s)'.format(
+                    model=model_name,
+                    deleted=deleted,
+                    duration=duration,
+                    rate=deleted / duration if duration else 0.0,
+                )
+            )
+
     if timed:
         duration = int(time.time() - start_time)
         metrics.timing('cleanup.duration', duration, instance=router)
@@ -398,6 +398,7 @@ def bind_cache_to_option_store():
     from sentry.options import default_store
 
     default_store.cache = default_cache
+    default_store.snapshot = settings.SENTRY_OPTIONS_STORE_SNAPSHOT
 
 
 def show_big_error(message):
@@ -0,0 +1,14 @@
+-- Sets all of the keys, or none of them if any of the keys already exists.
+local uuid = ARGV[1]
+local duration = ARGV[2]
+
+for i, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        return 0
+    end
+end
+
+for i, key in ipairs(KEYS) do
+    redis.call('SET', key, uuid, 'EX', duration)
+end
+return 1
@@ -0,0 +1,18 @@
+-- Extends the duration of all of the keys, as long as all of them are still
+-- held by the same owner.
+local uuid = ARGV[1]
+local duration = ARGV[2]
+
+for i, key in ipairs(KEYS) do
+    local value = redis.call('GET', key)
+    if not value then
+        return redis.error_reply(string.format("No lock at key exists at key: %s", key))
+    elseif value ~= uuid then
+        return redis.error_reply(string.format("Lock at %s was set by %s, and cannot be renewed by %s.", key, value, uuid))
+    end
+end
+
+for i, key in ipairs(KEYS) do
+    redis.call('EXPIRE', key, duration)
+end
+return redis.status_reply("OK")
@@ -787,6 +787,11 @@ class SnubaCompatibilityTagStorage(SnubaTagStorage):
         # in our case this will never happen.) The return value is not used.
         pass
 
+    def incr_tag_values_times_seen_bulk(self, project_id, group_id, environment_id,
+                                        tags, last_seen, count=1):
+        # Called by ``Group.add_tags``. The return value is not used.
+        pass
+
     def update_group_for_events(self, project_id, event_ids, destination_id):
         # Called by ``unmerge.migrate_events``. The return value is not used.
         pass
@@ -670,6 +670,60 @@ class V2TagStorage(TagStorage):
                         },
                         extra=extra)
 
+    def incr_tag_values_times_seen_bulk(self, project_id, group_id, environment_id,
+                                        tags, last_seen, count=1):
+        items = []
+        for tag_item in tags:
+            if len(tag_item) == 2:
+                (key, value), data = tag_item, None
+            else:
+                key, value, data = tag_item
+            items.append((key, value, data))
+
+        if not items:
+            return
+
+        keys = set(key for key, _, _ in items)
+        increments = []
+        for env in [environment_id, AGGREGATE_ENVIRONMENT_ID]:
+            tagkeys = self.get_or_create_tag_keys_bulk(project_id, env, keys)
+            tagvalues = self.get_or_create_tag_values_bulk(
+                project_id, [(tagkeys[key], value) for key, value, _ in items])
+
+            for key, value, data in items:
+                tagkey = tagkeys[key]
+                tagvalue = tagvalues[(tagkey, value)]
+
+                increments.append((
+                    models.TagValue,
+                    {'times_seen': count},
+                    {
+                        'project_id': project_id,
+                        '_key_id': tagkey.id,
+                        'value': value,
+                    },
+                    {
+                        'last_seen': last_seen,
+                        'data': data,
+                    },
+                ))
+                increments.append((
+                    models.GroupTagValue,
+                    {'times_seen': count},
+                    {
+                        'project_id': project_id,
+                        'group_id': group_id,
+                        '_key_id': tagkey.id,
+                        '_value_id': tagvalue.id,
+                    },
+                    {
+                        'project_id': project_id,
+                        'last_seen': last_seen,
+                    },
+                ))
+
+        buffer.incr_multi(increments)
+
     def get_group_event_filter(self, project_id, group_id, environment_ids, tags, start, end):
         # NOTE: `environment_id=None` needs to be filtered differently in this method.
         # EventTag never has NULL `environment_id` fields (individual Events always have an environment),
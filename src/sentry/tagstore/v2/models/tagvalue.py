@@ -9,7 +9,8 @@ from __future__ import absolute_import, print_function
 
 import six
 
-from django.db import models, router, connections
+from django.db import models, router, connections, transaction, IntegrityError
+from django.db.models.signals import post_save
 from django.utils import timezone
 
 from sentry.api.serializers import Serializer, register
@@ -116,30 +117,83 @@ class TagValue(Model):
         # Attempt to create a bunch of models in one big batch with as few
         # queries and cache calls as possible.
         # In best case, this is all done in 1 cache get.
-        # If we miss cache hit here, we have to fall back to old behavior.
+        # In ideal case, we'll do 3 queries total instead of N.
         key_to_model = {tag: None for tag in tags}
-        tags_by_key_id = {tag[0].id: tag for tag in tags}
-        remaining_keys = set(tags)
+        tags_by_key_id_value = {(tk.id, v): (tk, v) for tk, v in tags}
+        remaining = set(tags_by_key_id_value)
+
+        def found(model, to_cache=None):
+            pair = (model._key_id, model.value)
+            if pair not in remaining:
+                return
+            key_to_model[tags_by_key_id_value[pair]] = model
+            remaining.remove(pair)
+            if to_cache is not None:
+                to_cache[cls.get_cache_key(project_id, model._key_id, model.value)] = model
 
         # First attempt to hit from cache, which in theory is the hot case
-        cache_key_to_key = {cls.get_cache_key(project_id, tk.id, v): (tk, v) for tk, v in tags}
-        cache_key_to_models = cache.get_many(cache_key_to_key.keys())
+        cache_key_to_models = cache.get_many(
+            [cls.get_cache_key(project_id, key_id, v) for key_id, v in remaining]
+        )
         for model in cache_key_to_models.values():
-            key_to_model[tags_by_key_id[model._key_id]] = model
-            remaining_keys.remove(tags_by_key_id[model._key_id])
+            found(model)
 
-        if not remaining_keys:
+        if not remaining:
             # 100% cache hit on all items, good work team
             return key_to_model
 
+        # A big OR over every (key, value) pair ends up using the wrong index,
+        # so select the cross product of keys and values instead and discard
+        # the pairs we did not ask for.
+        def fetch_remaining(to_cache):
+            for model in cls.objects.filter(
+                project_id=project_id,
+                _key_id__in=set(key_id for key_id, _ in remaining),
+                value__in=set(v for _, v in remaining),
+            ):
+                found(model, to_cache)
+
+        to_cache = {}
+        fetch_remaining(to_cache)
+
+        if not remaining:
+            cache.set_many(to_cache, 3600)
+            return key_to_model
+
+        # At this point, we need to create all of our values, since they
+        # don't exist in cache or the database.
+        created = set(remaining)
+        try:
+            with transaction.atomic(using=router.db_for_write(cls)):
+                cls.objects.bulk_create([
+                    cls(
+                        project_id=project_id,
+                        _key_id=key_id,
+                        value=value,
+                    )
+                    for key_id, value in remaining
+                ])
+        except IntegrityError:
+            pass
+        else:
+            # ``bulk_create`` neither returns ids nor sends ``post_save``, so
+            # fetch the rows back and send the signal ourselves to keep the
+            # ``values_seen`` bookkeeping on the tag keys intact.
+            fetch_remaining(to_cache)
+            for pair in created - remaining:
+                post_save.send(
+                    sender=cls,
+                    instance=key_to_model[tags_by_key_id_value[pair]],
+                    created=True,
+                )
+
+        cache.set_many(to_cache, 3600)
+
         # Fall back to just doing it manually
-        # Further optimizations start to become not so great.
-        # For some reason, when trying to do a bulk SELECT with all of the
-        # key value pairs in big OR ends up using the wrong index and ultimating
-        # generating a significantly less efficient query. The only alternative is to
-        # splice this up a bit and do all of the SELECTs, then do a bulk INSERT for remaining
-        for key in remaining_keys:
-            key_to_model[key] = cls.get_or_create(project_id, key[0].id, key[1])[0]
+        # This case will only ever happen in a race condition.
+        for pair in remaining:
+            tag = tags_by_key_id_value[pair]
+            key_to_model[tag] = cls.get_or_create(project_id, pair[0], pair[1])[0]
 
         return key_to_model
 
@@ -92,31 +92,29 @@ def assemble_file(project, name, checksum, chunks, file_type):
 
     # Load all FileBlobs from db since we can be sure here we already own all
     # chunks need to build the file
-    file_blobs = FileBlob.objects.filter(
-        checksum__in=chunks
-    ).values_list('id', 'checksum', 'size')
+    blobs_by_checksum = {
+        blob.checksum: blob for blob in FileBlob.objects.filter(checksum__in=chunks)
+    }
 
-    # Reject all files that exceed the maximum allowed size for this
-    # organization. This value cannot be
-    file_size = sum(x[2] for x in file_blobs)
-    if file_size > get_max_file_size(project.organization):
+    # Sanity check.  In case not all blobs exist at this point we have a
+    # race condition.
+    if set(blobs_by_checksum) != set(chunks):
         set_assemble_status(project, checksum, ChunkFileState.ERROR,
-                            detail='File exceeds maximum size')
+                            detail='Not all chunks available for assembling')
         return
 
     # We need to make sure the blobs are in the order in which
     # we received them from the request.
     # Otherwise it could happen that we assemble the file in the wrong order
     # and get an garbage file.
-    file_blob_ids = [x[0] for x in sorted(
-        file_blobs, key=lambda blob: chunks.index(blob[1])
-    )]
+    file_blobs = [blobs_by_checksum[chunk] for chunk in chunks]
 
-    # Sanity check.  In case not all blobs exist at this point we have a
-    # race condition.
-    if set(x[1] for x in file_blobs) != set(chunks):
+    # Reject all files that exceed the maximum allowed size for this
+    # organization. This value cannot be
+    file_size = sum(blob.size for blob in file_blobs)
+    if file_size > get_max_file_size(project.organization):
         set_assemble_status(project, checksum, ChunkFileState.ERROR,
-                            detail='Not all chunks available for assembling')
+                            detail='File exceeds maximum size')
         return
 
     file = File.objects.create(
@@ -125,7 +123,7 @@ def assemble_file(project, name, checksum, chunks, file_type):
         type=file_type,
     )
     try:
-        temp_file = file.assemble_from_file_blob_ids(file_blob_ids, checksum)
+        temp_file = file.assemble_from_file_blobs(file_blobs, checksum)
     except AssembleChecksumMismatch:
         file.delete()
         set_assemble_status(project, checksum, ChunkFileState.ERROR,
@@ -1,13 +1,18 @@
 from __future__ import absolute_import
 
 import logging
+import six
 import time
 
+from django.conf import settings
+
 from sentry.digests import get_option_key
 from sentry.digests.backends.base import InvalidState
 from sentry.digests.notifications import (
     build_digest,
+    fetch_states,
     split_key,
+    split_keys,
 )
 from sentry.models import (
     Project,
@@ -15,6 +20,7 @@ from sentry.models import (
 )
 from sentry.tasks.base import instrumented_task
 from sentry.utils import snuba
+from sentry.utils.iterators import chunked
 
 logger = logging.getLogger(__name__)
 
@@ -36,8 +42,15 @@ def schedule_digests():
     timeout = 300
     digests.maintenance(deadline - timeout)
 
-    for entry in digests.schedule(deadline):
-        deliver_digest.delay(entry.key, entry.timestamp)
+    batch_size = settings.SENTRY_DIGESTS_DELIVERY_BATCH_SIZE
+    if batch_size > 1:
+        # The schedule is iterated partition by partition, so the timelines
+        # of a batch mostly live on the same partition.
+        for entries in chunked(digests.schedule(deadline), batch_size):
+            deliver_digests.delay([entry.key for entry in entries])
+    else:
+        for entry in digests.schedule(deadline):
+            deliver_digest.delay(entry.key, entry.timestamp)
 
 
 @instrumented_task(name='sentry.tasks.digests.deliver_digest', queue='digests.delivery')
@@ -65,3 +78,60 @@ def deliver_digest(key, schedule_timestamp=None):
 
         if digest:
             plugin.notify_digest(project, digest)
+
+
+@instrumented_task(name='sentry.tasks.digests.deliver_digests', queue='digests.delivery')
+def deliver_digests(keys):
+    """
+    Deliver the digests of several timelines, like ``deliver_digest``.
+    Projects, options, groups and rules are fetched at once for all of them.
+    """
+    from sentry import digests
+
+    targets = {}
+    for key, target in six.iteritems(split_keys(keys)):
+        if target is None:
+            logger.info('Cannot deliver digest %r due to error: Project does not exist', key)
+            digests.delete(key)
+        else:
+            targets[key] = target
+
+    options = ProjectOption.objects.get_all_values_bulk(
+        project for _, project in six.itervalues(targets)
+    )
+    minimum_delays = {
+        key: options[project.id].get(get_option_key(plugin.get_conf_key(), 'minimum_delay'))
+        for key, (plugin, project) in six.iteritems(targets)
+    }
+
+    notifications = []
+    with snuba.options_override({'consistent': True}):
+        with digests.digest_many(
+            [key for key in keys if key in targets],
+            minimum_delays=minimum_delays,
+        ) as records:
+            # Empty timelines are closed without building anything.
+            keys_with_records = [key for key, value in six.iteritems(records) if value]
+            states = fetch_states([
+                (targets[key][1], records[key]) for key in keys_with_records
+            ])
+
+            for key, state in zip(keys_with_records, states):
+                plugin, project = targets[key]
+                try:
+                    digest = build_digest(project, records[key], state=state)
+                except Exception:
+                    # The timeline is not closed, so its records are kept for
+                    # a later delivery.
+                    logger.exception('Failed to build digest %r', key)
+                    del records[key]
+                    continue
+
+                if digest:
+                    notifications.append((key, plugin, project, digest))
+
+        for key, plugin, project, digest in notifications:
+            try:
+                plugin.notify_digest(project, digest)
+            except Exception:
+                logger.exception('Failed to deliver digest %r', key)
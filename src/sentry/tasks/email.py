@@ -12,7 +12,9 @@ import logging
 
 from sentry.auth import access
 from sentry.tasks.base import instrumented_task
-from sentry.utils.email import send_messages
+from sentry.utils.email import (
+    MESSAGE_ERRORS, close_reusable_connection, get_reusable_connection, send_messages
+)
 
 logger = logging.getLogger(__name__)
 
@@ -74,3 +76,38 @@ def process_inbound_email(mailfrom, group_id, payload):
 )
 def send_email(message):
     send_messages([message])
+
+
+@instrumented_task(
+    name='sentry.tasks.email.send_email_batch',
+    queue='email',
+    default_retry_delay=60 * 5,
+    max_retries=None
+)
+def send_email_batch(messages):
+    """
+    Sends the messages one by one over the reusable connection of the worker.
+    A message that is rejected by the server is logged and skipped. If the
+    connection fails, the message and all that follow it are queued to be
+    sent individually.
+    """
+    index = 0
+    try:
+        connection = get_reusable_connection()
+        for index, message in enumerate(messages):
+            try:
+                send_messages([message], connection=connection)
+            except MESSAGE_ERRORS:
+                logger.exception(
+                    'mail.batch.message-failed',
+                    extra={'message_id': message.extra_headers.get('Message-Id')},
+                )
+    except Exception:
+        # The state of the session is unknown, start with a new one.
+        close_reusable_connection()
+        logger.exception(
+            'mail.batch.connection-failed',
+            extra={'remaining': len(messages) - index},
+        )
+        for message in messages[index:]:
+            send_email.delay(message=message)
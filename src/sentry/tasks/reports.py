@@ -8,15 +8,16 @@ import math
 import operator
 import zlib
 from calendar import Calendar
-from collections import OrderedDict, namedtuple
+from collections import OrderedDict, defaultdict, namedtuple
 from datetime import datetime, timedelta
 
 import pytz
+import six
 from django.utils import dateformat, timezone
 
 from sentry.app import tsdb
 from sentry.models import (
-    Activity, GroupStatus, Organization, OrganizationStatus, Project, Team, User, UserOption
+    Activity, Group, GroupStatus, Organization, OrganizationStatus, Project, Team, User, UserOption
 )
 from sentry.tasks.base import instrumented_task
 from sentry.utils import json, redis
@@ -155,153 +156,19 @@ def merge_series(target, other, function=operator.add):
 
 
 def prepare_project_series(start__stop, project, rollup=60 * 60 * 24):
-    start, stop = start__stop
-    resolution, series = tsdb.get_optimal_rollup_series(start, stop, rollup)
-    assert resolution == rollup, 'resolution does not match requested value'
-    clean = functools.partial(clean_series, start, stop, rollup)
-    return merge_series(
-        reduce(
-            merge_series,
-            map(
-                clean,
-                tsdb.get_range(
-                    tsdb.models.group,
-                    list(
-                        project.group_set.filter(
-                            status=GroupStatus.RESOLVED,
-                            resolved_at__gte=start,
-                            resolved_at__lt=stop,
-                        ).values_list('id', flat=True),
-                    ),
-                    start,
-                    stop,
-                    rollup=rollup,
-                ).values(),
-            ),
-            clean([(timestamp, 0) for timestamp in series]),
-        ),
-        clean(
-            tsdb.get_range(
-                tsdb.models.project,
-                [project.id],
-                start,
-                stop,
-                rollup=rollup,
-            )[project.id],
-        ),
-        lambda resolved, total: (
-            resolved,
-            total - resolved,  # unresolved
-        ),
-    )
+    return prepare_project_series_batch(start__stop, [project.id], rollup=rollup)[project.id]
 
 
 def prepare_project_aggregates(ignore__stop, project):
-    # TODO: This needs to return ``None`` for periods that don't have any data
-    # (because the project is not old enough) and possibly extrapolate for
-    # periods that only have partial periods.
-    _, stop = ignore__stop
-    segments = 4
-    period = timedelta(days=7)
-    start = stop - (period * segments)
-
-    def get_aggregate_value(start, stop):
-        return tsdb.get_sums(
-            tsdb.models.project,
-            (project.id, ),
-            start,
-            stop,
-            rollup=60 * 60 * 24,
-        )[project.id]
-
-    return [
-        get_aggregate_value(
-            start + (period * i),
-            start + (period * (i + 1) - timedelta(seconds=1)),
-        ) for i in range(segments)
-    ]
+    return prepare_project_aggregates_batch(ignore__stop, [project.id])[project.id]
 
 
 def prepare_project_issue_summaries(interval, project):
-    start, stop = interval
-
-    queryset = project.group_set.exclude(status=GroupStatus.IGNORED)
-
-    # Fetch all new issues.
-    new_issue_ids = set(
-        queryset.filter(
-            first_seen__gte=start,
-            first_seen__lt=stop,
-        ).values_list('id', flat=True)
-    )
-
-    # Fetch all regressions. This is a little weird, since there's no way to
-    # tell *when* a group regressed using the Group model. Instead, we query
-    # all groups that have been seen in the last week and have ever regressed
-    # and query the Activity model to find out if they regressed within the
-    # past week. (In theory, the activity table *could* be used to answer this
-    # query without the subselect, but there's no suitable indexes to make it's
-    # performance predictable.)
-    reopened_issue_ids = set(
-        Activity.objects.filter(
-            group__in=queryset.filter(
-                last_seen__gte=start,
-                last_seen__lt=stop,
-                resolved_at__isnull=False,  # signals this has *ever* been resolved
-            ),
-            type__in=(Activity.SET_REGRESSION, Activity.SET_UNRESOLVED, ),
-            datetime__gte=start,
-            datetime__lt=stop,
-        ).distinct().values_list('group_id', flat=True)
-    )
-
-    rollup = 60 * 60 * 24
-
-    event_counts = tsdb.get_sums(
-        tsdb.models.group,
-        new_issue_ids | reopened_issue_ids,
-        start,
-        stop,
-        rollup=rollup,
-    )
-
-    new_issue_count = sum(event_counts[id] for id in new_issue_ids)
-    reopened_issue_count = sum(event_counts[id] for id in reopened_issue_ids)
-    existing_issue_count = max(
-        tsdb.get_sums(
-            tsdb.models.project,
-            [project.id],
-            start,
-            stop,
-            rollup=rollup,
-        )[project.id] - new_issue_count - reopened_issue_count,
-        0,
-    )
-
-    return [
-        new_issue_count,
-        reopened_issue_count,
-        existing_issue_count,
-    ]
+    return prepare_project_issue_summaries_batch(interval, [project.id])[project.id]
 
 
 def prepare_project_usage_summary(start__stop, project):
-    start, stop = start__stop
-    return (
-        tsdb.get_sums(
-            tsdb.models.project_total_blacklisted,
-            [project.id],
-            start,
-            stop,
-            rollup=60 * 60 * 24,
-        )[project.id], tsdb.get_sums(
-            tsdb.models.project_total_rejected,
-            [project.id],
-            start,
-            stop,
-            rollup=60 * 60 * 24,
-        )[project.id],
-    )
+    return prepare_project_usage_summary_batch(start__stop, [project.id])[project.id]
 
 
 def get_calendar_range(ignore__stop_time, months):
@@ -352,24 +219,7 @@ def clean_calendar_data(project, series, start, stop, rollup, timestamp=None):
 
 
 def prepare_project_calendar_series(interval, project):
-    start, stop = get_calendar_query_range(interval, 3)
-
-    rollup = 60 * 60 * 24
-    series = tsdb.get_range(
-        tsdb.models.project,
-        [project.id],
-        start,
-        stop,
-        rollup=rollup,
-    )[project.id]
-
-    return clean_calendar_data(
-        project,
-        series,
-        start,
-        stop,
-        rollup,
-    )
+    return prepare_project_calendar_series_batch(interval, [project])[project.id]
 
 
 def build(name, fields):
@@ -413,6 +263,236 @@ Report, prepare_project_report, merge_reports = build(
 )
 
 
+def prepare_project_reports(interval, projects):
+    """
+    Build reports for many projects at once.
+
+    This produces the same result as calling ``prepare_project_report`` for
+    every project, but issues a fixed number of batched TSDB reads and
+    database queries regardless of the number of projects, rather than
+    several of each per project. Returns a mapping of project ID to report.
+    """
+    projects = list(projects)
+    if not projects:
+        return {}
+
+    start, stop = interval
+    rollup = 60 * 60 * 24
+    project_ids = [project.id for project in projects]
+
+    # The project event series over the reporting interval is used for both
+    # the resolved/unresolved series and the issue summaries.
+    project_series = get_project_series(interval, project_ids, rollup)
+
+    series = prepare_project_series_batch(interval, project_ids, project_series, rollup)
+    aggregates = prepare_project_aggregates_batch(interval, project_ids)
+    issue_summaries = prepare_project_issue_summaries_batch(
+        interval, project_ids, project_series, rollup)
+    usage_summaries = prepare_project_usage_summary_batch(interval, project_ids)
+    calendar_series = prepare_project_calendar_series_batch(interval, projects)
+
+    return {
+        project_id: Report(
+            series[project_id],
+            aggregates[project_id],
+            issue_summaries[project_id],
+            usage_summaries[project_id],
+            calendar_series[project_id],
+        ) for project_id in project_ids
+    }
+
+
+def get_project_series(start__stop, project_ids, rollup=60 * 60 * 24):
+    start, stop = start__stop
+    return tsdb.get_range(
+        tsdb.models.project,
+        project_ids,
+        start,
+        stop,
+        rollup=rollup,
+    )
+
+
+def prepare_project_series_batch(start__stop, project_ids, project_series=None,
+                                 rollup=60 * 60 * 24):
+    start, stop = start__stop
+    if project_series is None:
+        project_series = get_project_series(start__stop, project_ids, rollup)
+    resolution, series = tsdb.get_optimal_rollup_series(start, stop, rollup)
+    assert resolution == rollup, 'resolution does not match requested value'
+    clean = functools.partial(clean_series, start, stop, rollup)
+
+    group_projects = dict(
+        Group.objects.filter(
+            project_id__in=project_ids,
+            status=GroupStatus.RESOLVED,
+            resolved_at__gte=start,
+            resolved_at__lt=stop,
+        ).values_list('id', 'project_id')
+    )
+
+    timestamps = [timestamp for timestamp, _ in clean([(timestamp, 0) for timestamp in series])]
+    resolved = {project_id: [0] * len(timestamps) for project_id in project_ids}
+
+    if group_projects:
+        group_series = tsdb.get_range(
+            tsdb.models.group,
+            list(group_projects),
+            start,
+            stop,
+            rollup=rollup,
+        )
+        for group_id, points in six.iteritems(group_series):
+            totals = resolved[group_projects[group_id]]
+            for i, (_, value) in enumerate(clean(points)):
+                totals[i] += value
+
+    return {
+        project_id: merge_series(
+            list(zip(timestamps, resolved[project_id])),
+            clean(project_series[project_id]),
+            lambda resolved, total: (
+                resolved,
+                total - resolved,  # unresolved
+            ),
+        ) for project_id in project_ids
+    }
+
+
+def prepare_project_aggregates_batch(ignore__stop, project_ids):
+    # TODO: This needs to return ``None`` for periods that don't have any data
+    # (because the project is not old enough) and possibly extrapolate for
+    # periods that only have partial periods.
+    _, stop = ignore__stop
+    segments = 4
+    period = timedelta(days=7)
+    start = stop - (period * segments)
+
+    sums = [
+        tsdb.get_sums(
+            tsdb.models.project,
+            project_ids,
+            start + (period * i),
+            start + (period * (i + 1) - timedelta(seconds=1)),
+            rollup=60 * 60 * 24,
+        ) for i in range(segments)
+    ]
+
+    return {
+        project_id: [values[project_id] for values in sums]
+        for project_id in project_ids
+    }
+
+
+def prepare_project_issue_summaries_batch(interval, project_ids, project_series=None,
+                                          rollup=60 * 60 * 24):
+    start, stop = interval
+    if project_series is None:
+        project_series = get_project_series(interval, project_ids, rollup)
+
+    queryset = Group.objects.filter(
+        project_id__in=project_ids,
+    ).exclude(status=GroupStatus.IGNORED)
+
+    new_issue_ids = defaultdict(set)
+    for group_id, project_id in queryset.filter(
+        first_seen__gte=start,
+        first_seen__lt=stop,
+    ).values_list('id', 'project_id'):
+        new_issue_ids[project_id].add(group_id)
+
+    # Fetch all regressions. This is a little weird, since there's no way to
+    # tell *when* a group regressed using the Group model. Instead, we query
+    # all groups that have been seen in the last week and have ever regressed
+    # and query the Activity model to find out if they regressed within the
+    # past week. (In theory, the activity table *could* be used to answer this
+    # query without the subselect, but there's no suitable indexes to make it's
+    # performance predictable.)
+    reopened_issue_ids = defaultdict(set)
+    for group_id, project_id in Activity.objects.filter(
+        group__in=queryset.filter(
+            last_seen__gte=start,
+            last_seen__lt=stop,
+            resolved_at__isnull=False,  # signals this has *ever* been resolved
+        ),
+        type__in=(Activity.SET_REGRESSION, Activity.SET_UNRESOLVED, ),
+        datetime__gte=start,
+        datetime__lt=stop,
+    ).distinct().values_list('group_id', 'project_id'):
+        reopened_issue_ids[project_id].add(group_id)
+
+    issue_ids = set()
+    for ids in itertools.chain(new_issue_ids.values(), reopened_issue_ids.values()):
+        issue_ids.update(ids)
+
+    event_counts = tsdb.get_sums(
+        tsdb.models.group,
+        issue_ids,
+        start,
+        stop,
+        rollup=rollup,
+    ) if issue_ids else {}
+
+    results = {}
+    for project_id in project_ids:
+        new_issue_count = sum(event_counts[id] for id in new_issue_ids[project_id])
+        reopened_issue_count = sum(event_counts[id] for id in reopened_issue_ids[project_id])
+        existing_issue_count = max(
+            sum(value for _, value in project_series[project_id]) -
+            new_issue_count - reopened_issue_count,
+            0,
+        )
+        results[project_id] = [
+            new_issue_count,
+            reopened_issue_count,
+            existing_issue_count,
+        ]
+    return results
+
+
+def prepare_project_usage_summary_batch(start__stop, project_ids):
+    start, stop = start__stop
+    blacklisted, rejected = [
+        tsdb.get_sums(
+            model,
+            project_ids,
+            start,
+            stop,
+            rollup=60 * 60 * 24,
+        ) for model in (
+            tsdb.models.project_total_blacklisted,
+            tsdb.models.project_total_rejected,
+        )
+    ]
+    return {
+        project_id: (blacklisted[project_id], rejected[project_id])
+        for project_id in project_ids
+    }
+
+
+def prepare_project_calendar_series_batch(interval, projects):
+    start, stop = get_calendar_query_range(interval, 3)
+
+    rollup = 60 * 60 * 24
+    series = tsdb.get_range(
+        tsdb.models.project,
+        [project.id for project in projects],
+        start,
+        stop,
+        rollup=rollup,
+    )
+
+    return {
+        project.id: clean_calendar_data(
+            project,
+            series[project.id],
+            start,
+            stop,
+            rollup,
+        ) for project in projects
+    }
+
+
 class ReportBackend(object):
     def build(self, timestamp, duration, project):
         return prepare_project_report(
@@ -420,6 +500,16 @@ class ReportBackend(object):
             project,
         )
 
+    def build_many(self, timestamp, duration, projects):
+        """
+        Build reports for a set of projects using batched queries, returning
+        a mapping of project ID to report.
+        """
+        return prepare_project_reports(
+            _to_interval(timestamp, duration),
+            projects,
+        )
+
     def prepare(self, timestamp, duration, organization):
         """
         Build and store reports for all projects in the organization.
@@ -440,14 +530,8 @@ class DummyReportBackend(ReportBackend):
 
     def fetch(self, timestamp, duration, organization, projects):
         assert all(project.organization_id == organization.id for project in projects)
-        return map(
-            functools.partial(
-                self.build,
-                timestamp,
-                duration,
-            ),
-            projects,
-        )
+        reports = self.build_many(timestamp, duration, projects)
+        return [reports[project.id] for project in projects]
 
 
 class RedisReportBackend(ReportBackend):
@@ -477,11 +561,12 @@ class RedisReportBackend(ReportBackend):
         return Report(*json.loads(zlib.decompress(value)))
 
     def prepare(self, timestamp, duration, organization):
-        reports = {}
-        for project in organization.project_set.all():
-            reports[project.id] = self.__encode(
-                self.build(timestamp, duration, project),
+        reports = {
+            project_id: self.__encode(report)
+            for project_id, report in six.iteritems(
+                self.build_many(timestamp, duration, organization.project_set.all()),
             )
+        }
 
         if not reports:
             # XXX: HMSET requires at least one key/value pair, so we need to
@@ -10,7 +10,6 @@ from __future__ import absolute_import
 
 import logging
 from datetime import datetime
-import six
 
 from time import time
 from django.conf import settings
@@ -62,7 +61,7 @@ def should_process(data):
 
 def submit_process(project, from_reprocessing, cache_key, event_id, start_time, data):
     if features.has('projects:kafka-ingest', project=project):
-        kafka.produce_sync(
+        kafka.produce(
             settings.KAFKA_PROCESS,
             value=json.dumps({
                 'cache_key': cache_key,
@@ -78,7 +77,7 @@ def submit_process(project, from_reprocessing, cache_key, event_id, start_time,
 
 def submit_save_event(project, cache_key, event_id, start_time, data):
     if features.has('projects:kafka-ingest', project=project):
-        kafka.produce_sync(
+        kafka.produce(
             settings.KAFKA_SAVE,
             value=json.dumps({
                 'cache_key': cache_key,
@@ -368,7 +367,7 @@ def save_attachment(event, attachment):
         type=attachment.type,
         headers={'Content-Type': attachment.content_type},
     )
-    file.putfile(six.BytesIO(attachment.data))
+    file.putfile(attachment.open())
 
     EventAttachment.objects.create(
         event_id=event.event_id,
@@ -2,6 +2,7 @@ from __future__ import absolute_import
 
 import logging
 from collections import defaultdict, OrderedDict
+from time import time
 
 from django.db import transaction
 
@@ -15,11 +16,16 @@ from sentry.models import (
 )
 from sentry.similarity import features
 from sentry.tasks.base import instrumented_task
+from sentry.utils.dates import to_datetime
 from six.moves import reduce
 
 
 logger = logging.getLogger(__name__)
 
+# Number of seconds an unmerge task keeps processing batches of events before
+# it continues in a new task.
+TASK_DURATION = 30
+
 
 def cache(function):
     results = {}
@@ -293,19 +299,20 @@ def truncate_denormalizations(group):
     features.delete(group)
 
 
-def collect_group_environment_data(events):
+def collect_group_environment_data(events, results=None):
     """\
     Find the first release for a each group and environment pair from a
     date-descending sorted list of events.
     """
-    results = OrderedDict()
+    if results is None:
+        results = OrderedDict()
     for event in events:
         results[(event.group_id, get_environment_name(event))] = event.get_tag('sentry:release')
     return results
 
 
-def repair_group_environment_data(caches, project, events):
-    for (group_id, env_name), first_release in collect_group_environment_data(events).items():
+def repair_group_environment_data(caches, project, data):
+    for (group_id, env_name), first_release in data.items():
         fields = {}
         if first_release:
             fields['first_release'] = caches['Release'](
@@ -320,8 +327,9 @@ def repair_group_environment_data(caches, project, events):
         )
 
 
-def collect_tag_data(events):
-    results = OrderedDict()
+def collect_tag_data(events, results=None):
+    if results is None:
+        results = OrderedDict()
 
     for event in events:
         environment = get_environment_name(event)
@@ -339,8 +347,8 @@ def collect_tag_data(events):
     return results
 
 
-def repair_tag_data(caches, project, events):
-    for (group_id, env_name), keys in collect_tag_data(events).items():
+def repair_tag_data(caches, project, data):
+    for (group_id, env_name), keys in data.items():
         environment = caches['Environment'](
             project.organization_id,
             env_name,
@@ -386,8 +394,9 @@ def get_environment_name(event):
     return Environment.get_name_or_default(event.get_tag('environment'))
 
 
-def collect_release_data(caches, project, events):
-    results = OrderedDict()
+def collect_release_data(caches, project, events, results=None):
+    if results is None:
+        results = OrderedDict()
 
     for event in events:
         release = event.get_tag('sentry:release')
@@ -411,9 +420,8 @@ def collect_release_data(caches, project, events):
     return results
 
 
-def repair_group_release_data(caches, project, events):
-    attributes = collect_release_data(caches, project, events).items()
-    for (group_id, environment, release_id), (first_seen, last_seen) in attributes:
+def repair_group_release_data(caches, project, data):
+    for (group_id, environment, release_id), (first_seen, last_seen) in data.items():
         instance, created = GroupRelease.objects.get_or_create(
             project_id=project.id,
             group_id=group_id,
@@ -438,89 +446,148 @@ def get_event_user_from_interface(value):
     )
 
 
-def collect_tsdb_data(caches, project, events):
-    counters = defaultdict(
-        lambda: defaultdict(
-            lambda: defaultdict(int),
-        ),
-    )
-
-    sets = defaultdict(
-        lambda: defaultdict(
-            lambda: defaultdict(set),
-        ),
-    )
+def get_tsdb_timestamp(timestamp):
+    """\
+    Round a timestamp down to the start of the shortest rollup interval.
 
-    frequencies = defaultdict(
-        lambda: defaultdict(
-            lambda: defaultdict(
-                lambda: defaultdict(int),
+    All rollup intervals are multiples of the shortest one, so this doesn't
+    change the interval a timestamp is counted in, but it allows the writes
+    of all events in the same interval to be combined.
+    """
+    rollup = min(tsdb.get_rollups())
+    return to_datetime(tsdb.normalize_to_epoch(timestamp, rollup))
+
+
+def collect_tsdb_data(caches, project, events, results=None):
+    if results is None:
+        results = (
+            # counters
+            defaultdict(
+                lambda: defaultdict(
+                    lambda: defaultdict(int),
+                ),
             ),
-        ),
-    )
+            # sets
+            defaultdict(
+                lambda: defaultdict(
+                    lambda: defaultdict(set),
+                ),
+            ),
+            # frequencies
+            defaultdict(
+                lambda: defaultdict(
+                    lambda: defaultdict(
+                        lambda: defaultdict(int),
+                    ),
+                ),
+            ),
+            # release frequencies, which are recorded by ``GroupRelease`` and
+            # have to be resolved after the release data has been repaired
+            defaultdict(
+                lambda: defaultdict(
+                    lambda: defaultdict(int),
+                ),
+            ),
+        )
+
+    counters, sets, frequencies, release_frequencies = results
 
     for event in events:
+        timestamp = get_tsdb_timestamp(event.datetime)
         environment = caches['Environment'](
             project.organization_id,
             get_environment_name(event),
         )
 
-        counters[event.datetime][tsdb.models.group][(event.group_id, environment.id)] += 1
+        counters[timestamp][tsdb.models.group][(event.group_id, environment.id)] += 1
 
         user = event.data.get('user')
         if user:
-            sets[event.datetime][tsdb.models.users_affected_by_group][(event.group_id, environment.id)].add(
+            sets[timestamp][tsdb.models.users_affected_by_group][(event.group_id, environment.id)].add(
                 get_event_user_from_interface(user).tag_value,
             )
 
-        frequencies[event.datetime][tsdb.models.frequent_environments_by_group
-                                    ][event.group_id][environment.id] += 1
+        frequencies[timestamp][tsdb.models.frequent_environments_by_group
+                               ][event.group_id][environment.id] += 1
 
         release = event.get_tag('sentry:release')
         if release:
             # TODO: I'm also not sure if "environment" here is correct, see
             # similar comment above during creation.
-            grouprelease = caches['GroupRelease'](
-                event.group_id,
+            release_frequencies[timestamp][event.group_id][(
                 get_environment_name(event),
                 caches['Release'](
                     project.organization_id,
                     release,
                 ).id,
-            )
+            )] += 1
 
-            frequencies[event.datetime][tsdb.models.frequent_releases_by_group
-                                        ][event.group_id][grouprelease.id] += 1
+    return results
 
-    return counters, sets, frequencies
 
+def repair_tsdb_data(caches, project, data):
+    counters, sets, frequencies, release_frequencies = data
 
-def repair_tsdb_data(caches, project, events):
-    counters, sets, frequencies = collect_tsdb_data(caches, project, events)
+    # Counters can only be incremented by the same amount in a single write.
+    increments = defaultdict(list)
+    for timestamp, models in counters.items():
+        for model, keys in models.items():
+            for (key, environment_id), count in keys.items():
+                increments[(timestamp, environment_id, count)].append((model, key))
 
-    for timestamp, data in counters.items():
-        for model, keys in data.items():
-            for (key, environment_id), value in keys.items():
-                tsdb.incr(model, key, timestamp, value, environment_id=environment_id)
+    for (timestamp, environment_id, count), items in increments.items():
+        tsdb.incr_multi(items, timestamp, count, environment_id=environment_id)
 
-    for timestamp, data in sets.items():
-        for model, keys in data.items():
+    records = defaultdict(list)
+    for timestamp, models in sets.items():
+        for model, keys in models.items():
             for (key, environment_id), values in keys.items():
-                # TODO: This should use `record_multi` rather than `record`.
-                tsdb.record(model, key, values, timestamp, environment_id=environment_id)
+                records[(timestamp, environment_id)].append((model, key, values))
 
-    for timestamp, data in frequencies.items():
-        tsdb.record_frequency_multi(data.items(), timestamp)
+    for (timestamp, environment_id), items in records.items():
+        tsdb.record_multi(items, timestamp, environment_id=environment_id)
 
+    for timestamp, groups in release_frequencies.items():
+        for group_id, releases in groups.items():
+            for (environment, release_id), count in releases.items():
+                grouprelease = caches['GroupRelease'](group_id, environment, release_id)
+                frequencies[timestamp][tsdb.models.frequent_releases_by_group
+                                       ][group_id][grouprelease.id] += count
 
-def repair_denormalizations(caches, project, events):
-    repair_group_environment_data(caches, project, events)
-    repair_tag_data(caches, project, events)
-    repair_group_release_data(caches, project, events)
-    repair_tsdb_data(caches, project, events)
+    for timestamp, models in frequencies.items():
+        tsdb.record_frequency_multi(models.items(), timestamp)
 
-    for event in events:
-        features.record([event])
+
+class DenormalizationBuffer(object):
+    """\
+    Collects the denormalized data of events, so that it can be repaired with
+    as few writes as possible. Events must be added in date-descending order.
+    """
+
+    def __init__(self, caches, project):
+        self.caches = caches
+        self.project = project
+        self.clear()
+
+    def clear(self):
+        self.group_environment_data = OrderedDict()
+        self.tag_data = OrderedDict()
+        self.release_data = OrderedDict()
+        self.tsdb_data = None
+
+    def add(self, events):
+        collect_group_environment_data(events, self.group_environment_data)
+        collect_tag_data(events, self.tag_data)
+        collect_release_data(self.caches, self.project, events, self.release_data)
+        self.tsdb_data = collect_tsdb_data(self.caches, self.project, events, self.tsdb_data)
+
+    def flush(self):
+        repair_group_environment_data(self.caches, self.project, self.group_environment_data)
+        repair_tag_data(self.caches, self.project, self.tag_data)
+        repair_group_release_data(self.caches, self.project, self.release_data)
+        if self.tsdb_data is not None:
+            repair_tsdb_data(self.caches, self.project, self.tsdb_data)
+        self.clear()
 
 
 def lock_hashes(project_id, source_id, fingerprints):
@@ -543,11 +610,48 @@ def lock_hashes(project_id, source_id, fingerprints):
 
 
 def unlock_hashes(project_id, fingerprints):
-    GroupHash.objects.filter(
+    group_hashes = GroupHash.objects.filter(
         project_id=project_id,
         hash__in=fingerprints,
         state=GroupHash.State.LOCKED_IN_MIGRATION,
-    ).update(state=GroupHash.State.UNLOCKED)
+    )
+    GroupHash.delete_unmerge_progress(group_hashes.values_list('id', flat=True))
+    group_hashes.update(state=GroupHash.State.UNLOCKED)
+
+
+def record_progress(project_id, fingerprints, progress):
+    GroupHash.record_unmerge_progress(
+        GroupHash.objects.filter(
+            project_id=project_id,
+            hash__in=fingerprints,
+        ).values_list('id', flat=True),
+        progress,
+    )
+
+
+def get_progress(project_id, fingerprints):
+    group_hash_ids = GroupHash.objects.filter(
+        project_id=project_id,
+        hash__in=fingerprints,
+    ).values_list('id', flat=True)
+    for progress in GroupHash.fetch_unmerge_progress(group_hash_ids):
+        if progress is not None:
+            return progress
+    return {'processed': 0, 'migrated': 0}
+
+
+def get_events(project_id, source_id, cursor, batch_size):
+    # We fetch the events in descending order by their primary key to get the
+    # best approximation of the most recently received events.
+    queryset = Event.objects.filter(
+        project_id=project_id,
+        group_id=source_id,
+    ).order_by('-id')
+
+    if cursor is not None:
+        queryset = queryset.filter(id__lt=cursor)
+
+    return list(queryset[:batch_size])
 
 
 @instrumented_task(name='sentry.tasks.unmerge', queue='unmerge')
@@ -561,11 +665,18 @@ def unmerge(
     batch_size=500,
     source_fields_reset=False,
     eventstream_state=None,
+    progress=None,
 ):
-    # XXX: The queryset chunking logic below is awfully similar to
-    # ``RangeQuerySetWrapper``. Ideally that could be refactored to be able to
-    # be run without iteration by passing around a state object and we could
-    # just use that here instead.
+    # Batches of events are processed until the task has been running for
+    # ``TASK_DURATION`` seconds, after which the unmerge continues from the
+    # last event in a new task. The denormalizations of each batch are
+    # repaired before its progress is recorded, so nothing is lost if the task
+    # dies between batches.
+    #
+    # ``progress`` is not passed on to the next task (so that workers which
+    # don't know the argument can still run it), it is read back from where
+    # it is recorded instead.
+    deadline = time() + TASK_DURATION
 
     source = Group.objects.get(
         project_id=project_id,
@@ -579,21 +690,70 @@ def unmerge(
         fingerprints = lock_hashes(project_id, source_id, fingerprints)
         truncate_denormalizations(source)
 
+    if progress is None:
+        if cursor is None:
+            progress = {'processed': 0, 'migrated': 0}
+        else:
+            progress = get_progress(project_id, fingerprints)
+
     caches = get_caches()
 
     project = caches['Project'](project_id)
 
-    # We fetch the events in descending order by their primary key to get the
-    # best approximation of the most recently received events.
-    queryset = Event.objects.filter(
-        project_id=project_id,
-        group_id=source_id,
-    ).order_by('-id')
+    buffer = DenormalizationBuffer(caches, project)
 
-    if cursor is not None:
-        queryset = queryset.filter(id__lt=cursor)
+    while True:
+        events = get_events(project_id, source_id, cursor, batch_size)
+        if not events:
+            break
+
+        Event.objects.bind_nodes(events, 'data')
+
+        source_events = []
+        destination_events = []
+
+        for event in events:
+            (destination_events
+             if get_fingerprint(event) in fingerprints else source_events).append(event)
+
+        if source_events:
+            if not source_fields_reset:
+                source.update(**get_group_creation_attributes(
+                    caches,
+                    source_events,
+                ))
+                source_fields_reset = True
+            else:
+                source.update(**get_group_backfill_attributes(
+                    caches,
+                    source,
+                    source_events,
+                ))
+
+        (destination_id, eventstream_state) = migrate_events(
+            caches,
+            project,
+            source_id,
+            destination_id,
+            fingerprints,
+            destination_events,
+            actor_id,
+            eventstream_state,
+        )
+
+        buffer.add(events)
+        buffer.flush()
 
-    events = list(queryset[:batch_size])
+        for event in events:
+            features.record([event])
+
+        cursor = events[-1].id
+        progress['processed'] += len(events)
+        progress['migrated'] += len(destination_events)
+        record_progress(project_id, fingerprints, progress)
+
+        if time() >= deadline:
+            break
 
     # If there are no more events to process, we're done with the migration.
     if not events:
@@ -606,53 +766,13 @@ def unmerge(
 
         return destination_id
 
-    Event.objects.bind_nodes(events, 'data')
-
-    source_events = []
-    destination_events = []
-
-    for event in events:
-        (destination_events
-         if get_fingerprint(event) in fingerprints else source_events).append(event)
-
-    if source_events:
-        if not source_fields_reset:
-            source.update(**get_group_creation_attributes(
-                caches,
-                source_events,
-            ))
-            source_fields_reset = True
-        else:
-            source.update(**get_group_backfill_attributes(
-                caches,
-                source,
-                source_events,
-            ))
-
-    (destination_id, eventstream_state) = migrate_events(
-        caches,
-        project,
-        source_id,
-        destination_id,
-        fingerprints,
-        destination_events,
-        actor_id,
-        eventstream_state,
-    )
-
-    repair_denormalizations(
-        caches,
-        project,
-        events,
-    )
-
     unmerge.delay(
         project_id,
         source_id,
         destination_id,
         fingerprints,
         actor_id,
-        cursor=events[-1].id,
+        cursor=cursor,
         batch_size=batch_size,
         source_fields_reset=source_fields_reset,
         eventstream_state=eventstream_state,
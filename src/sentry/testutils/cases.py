@@ -846,6 +846,8 @@ class SnubaTestCase(TestCase):
                        self.snuba_tagstore.incr_tag_value_times_seen),
             mock.patch('sentry.tagstore.incr_group_tag_value_times_seen',
                        self.snuba_tagstore.incr_group_tag_value_times_seen),
+            mock.patch('sentry.tagstore.incr_tag_values_times_seen_bulk',
+                       self.snuba_tagstore.incr_tag_values_times_seen_bulk),
         ):
             return super(SnubaTestCase, self).store_event(*args, **kwargs)
 
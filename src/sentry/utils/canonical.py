@@ -59,7 +59,7 @@ def get_legacy_name(key):
 class CanonicalKeyView(collections.Mapping):
     def __init__(self, data):
         self.data = data
-        self._len = len(set(get_canonical_name(key) for key in self.data))
+        self._len = None
 
     def copy(self):
         return self
@@ -67,6 +67,9 @@ class CanonicalKeyView(collections.Mapping):
     __copy__ = copy
 
     def __len__(self):
+        # Computed on demand, as the view may wrap a lazy mapping.
+        if self._len is None:
+            self._len = len(set(get_canonical_name(key) for key in self.data))
         return self._len
 
     def __iter__(self):
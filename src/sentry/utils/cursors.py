@@ -9,8 +9,11 @@ from __future__ import absolute_import
 
 import six
 
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from collections import Sequence
 
+from sentry.utils import json
+
 
 class Cursor(object):
     def __init__(self, value, offset=0, is_prev=False, has_results=None):
@@ -49,13 +52,56 @@ class Cursor(object):
         return cls(*bits)
 
 
+class KeysetCursor(Cursor):
+    """
+    A cursor pointing at a row by its ``(value, id)`` sort key.
+
+    ``value`` can be any JSON serializable value, and ``offset`` holds the id
+    of the row, which breaks ties between rows with the same value.
+
+    Cursors in the format of ``Cursor`` (e.g. from links issued before an
+    endpoint switched to keyset pagination) are accepted and point at the
+    first page.
+    """
+
+    def __init__(self, value, offset=0, is_prev=False, has_results=None):
+        self.value = value
+        self.offset = int(offset)
+        self.is_prev = bool(is_prev)
+        self.has_results = has_results
+
+    def __str__(self):
+        value = urlsafe_b64encode(json.dumps(self.value).encode('utf-8')).rstrip(b'=')
+        return '%s:%s:%s' % (value.decode('ascii'), self.offset, int(self.is_prev))
+
+    @classmethod
+    def from_string(cls, value):
+        bits = value.split(':')
+        if len(bits) != 3:
+            raise ValueError
+        # The base64 encoding of JSON never starts with a digit or a minus
+        # sign, so this can only be a legacy cursor.
+        if bits[0][:1] in '-0123456789':
+            Cursor.from_string(value)
+            return cls(None)
+
+        try:
+            encoded = bits[0].encode('ascii')
+            value = json.loads(urlsafe_b64decode(encoded + b'=' * (-len(encoded) % 4)))
+            bits = value, int(bits[1]), int(bits[2])
+        except (TypeError, ValueError, UnicodeError):
+            raise ValueError
+        return cls(*bits)
+
+
 class CursorResult(Sequence):
-    def __init__(self, results, next, prev, hits=None, max_hits=None):
+    def __init__(self, results, next, prev, hits=None, max_hits=None, hits_estimated=False):
         self.results = results
         self.next = next
         self.prev = prev
         self.hits = hits
         self.max_hits = max_hits
+        self.hits_estimated = hits_estimated
 
     def __len__(self):
         return len(self.results)
@@ -199,7 +245,7 @@ def _build_prev_values(cursor, results, key, limit, is_desc):
 
 
 def build_cursor(results, key, limit=100, is_desc=False, cursor=None, hits=None,
-        max_hits=None, on_results=None):
+        max_hits=None, on_results=None, hits_estimated=False):
     if cursor is None:
         cursor = Cursor(0, 0, 0)
 
@@ -243,4 +289,5 @@ def build_cursor(results, key, limit=100, is_desc=False, cursor=None, hits=None,
         prev=prev_cursor,
         hits=hits,
         max_hits=max_hits,
+        hits_estimated=hits_estimated,
     )
@@ -10,8 +10,10 @@ from __future__ import absolute_import
 import logging
 import os
 import six
+import smtplib
 import subprocess
 import tempfile
+import threading
 import time
 
 from email.utils import parseaddr
@@ -34,6 +36,7 @@ from sentry import options
 from sentry.logging import LoggingFormat
 from sentry.models import (Activity, Event, Group, GroupEmailThread, Project, User, UserOption)
 from sentry.utils import metrics
+from sentry.utils.iterators import chunked
 from sentry.utils.safe import safe_execute
 from sentry.utils.strings import is_valid_dot_atom
 from sentry.web.helpers import render_to_string
@@ -298,6 +301,7 @@ class MessageBuilder(object):
         self.from_email = from_email or options.get('mail.from')
         self._send_to = set()
         self.type = type if type else 'generic'
+        self.__bodies = None
 
         if reference is not None and 'List-Id' not in headers:
             try:
@@ -322,6 +326,13 @@ class MessageBuilder(object):
             return render_to_string(self.template, self.context)
         return self._txt_body
 
+    def __render_bodies(self):
+        # The bodies do not depend on the recipient, so they are only rendered
+        # once for all messages that are built.
+        if self.__bodies is None:
+            self.__bodies = (self.__render_text_body(), self.__render_html_body())
+        return self.__bodies
+
     def add_users(self, user_ids, project=None):
         self._send_to.update(get_email_addresses(user_ids, project).values())
 
@@ -366,9 +377,11 @@ class MessageBuilder(object):
                 headers.setdefault('In-Reply-To', thread.msgid)
                 headers.setdefault('References', thread.msgid)
 
+        text_body, html_body = self.__render_bodies()
+
         msg = EmailMultiAlternatives(
             subject=subject.splitlines()[0],
-            body=self.__render_text_body(),
+            body=text_body,
             from_email=self.from_email,
             to=(to, ),
             cc=cc or (),
@@ -376,7 +389,6 @@ class MessageBuilder(object):
             headers=headers,
         )
 
-        html_body = self.__render_html_body()
         if html_body:
             msg.attach_alternative(html_body.decode('utf-8'), 'text/html')
 
@@ -405,7 +417,7 @@ class MessageBuilder(object):
         )
 
     def send_async(self, to=None, cc=None, bcc=None):
-        from sentry.tasks.email import send_email
+        from sentry.tasks.email import send_email, send_email_batch
         fmt = options.get('system.logging-format')
         messages = self.get_built_messages(to, cc=cc, bcc=bcc)
         extra = {'message_type': self.type}
@@ -413,13 +425,24 @@ class MessageBuilder(object):
         for context in loggable:
             extra['%s_id' % type(context).__name__.lower()] = context.id
 
+        batch_size = settings.SENTRY_EMAIL_BATCH_SIZE
+        if batch_size > 1:
+            for batch in chunked(messages, batch_size):
+                safe_execute(
+                    send_email_batch.delay,
+                    messages=batch,
+                    _with_transaction=False,
+                )
+        else:
+            for message in messages:
+                safe_execute(
+                    send_email.delay,
+                    message=message,
+                    _with_transaction=False,
+                )
+
         log_mail_queued = partial(logger.info, 'mail.queued', extra=extra)
         for message in messages:
-            safe_execute(
-                send_email.delay,
-                message=message,
-                _with_transaction=False,
-            )
             extra['message_id'] = message.extra_headers['Message-Id']
             metrics.incr('email.queued', instance=self.type, skip_internal=False)
             if fmt == LoggingFormat.HUMAN:
@@ -431,9 +454,38 @@ class MessageBuilder(object):
                     log_mail_queued()
 
 
-def send_messages(messages, fail_silently=False):
-    connection = get_connection(fail_silently=fail_silently)
-    sent = connection.send_messages(messages)
+# Errors that are specific to a single message. The SMTP session is reset
+# before they are raised, so the connection can still be used afterwards.
+MESSAGE_ERRORS = (
+    smtplib.SMTPRecipientsRefused,
+    smtplib.SMTPSenderRefused,
+    smtplib.SMTPDataError,
+)
+
+
+def send_messages(messages, fail_silently=False, reuse_connection=False, connection=None):
+    """
+    Sends the messages over a single connection. With ``reuse_connection``,
+    the connection of the current thread is used and kept open afterwards
+    (see ``get_reusable_connection``.) It is only closed if sending failed
+    with an error other than one of ``MESSAGE_ERRORS``.
+
+    An already open ``connection`` can be passed in as well, it is left to
+    the caller to handle its errors.
+    """
+    if connection is not None:
+        sent = connection.send_messages(messages)
+    elif not reuse_connection:
+        sent = get_connection(fail_silently=fail_silently).send_messages(messages)
+    else:
+        try:
+            sent = get_reusable_connection(fail_silently=fail_silently).send_messages(messages)
+        except MESSAGE_ERRORS:
+            raise
+        except Exception:
+            # The state of the session is unknown, start with a new one.
+            close_reusable_connection()
+            raise
     metrics.incr('email.sent', len(messages), skip_internal=False)
     for message in messages:
         extra = {
@@ -452,20 +504,88 @@ def get_mail_backend():
         return backend
 
 
+def _get_connection_options(fail_silently=False):
+    return {
+        'backend': get_mail_backend(),
+        'host': options.get('mail.host'),
+        'port': options.get('mail.port'),
+        'username': options.get('mail.username'),
+        'password': options.get('mail.password'),
+        'use_tls': options.get('mail.use-tls'),
+        'timeout': options.get('mail.timeout'),
+        'fail_silently': fail_silently,
+    }
+
+
 def get_connection(fail_silently=False):
     """
     Gets an SMTP connection using our OptionsStore
     """
-    return _get_connection(
-        backend=get_mail_backend(),
-        host=options.get('mail.host'),
-        port=options.get('mail.port'),
-        username=options.get('mail.username'),
-        password=options.get('mail.password'),
-        use_tls=options.get('mail.use-tls'),
-        timeout=options.get('mail.timeout'),
-        fail_silently=fail_silently,
-    )
+    return _get_connection(**_get_connection_options(fail_silently=fail_silently))
+
+
+_reusable_connection = threading.local()
+
+
+def _is_connection_usable(connection, probe=True):
+    # Only SMTP connections have a session that can go away.
+    if not hasattr(connection, 'connection'):
+        return True
+    if connection.connection is None:
+        return False
+    if not probe:
+        return True
+    try:
+        return connection.connection.noop()[0] == 250
+    except Exception:
+        return False
+
+
+def get_reusable_connection(fail_silently=False):
+    """
+    Gets a connection that is kept open for later calls in the current
+    thread, so that a worker does not set up a new SMTP session for every
+    batch of messages. The connection is replaced once it has been idle for
+    ``SENTRY_EMAIL_CONNECTION_MAX_IDLE`` seconds, the mail options change or
+    the server closed it. To save a round trip, the server is only asked
+    whether the session is still alive once the connection has been idle for
+    ``SENTRY_EMAIL_CONNECTION_CHECK_INTERVAL`` seconds. Until then a session
+    that went away is only noticed (and replaced) when sending fails.
+    """
+    connection_options = _get_connection_options(fail_silently=fail_silently)
+    now = time.time()
+
+    state = getattr(_reusable_connection, 'state', None)
+    if state is not None:
+        connection, previous_options, last_used = state
+        idle = now - last_used
+        if (
+            previous_options == connection_options and
+            idle <= settings.SENTRY_EMAIL_CONNECTION_MAX_IDLE and
+            _is_connection_usable(
+                connection,
+                probe=idle > settings.SENTRY_EMAIL_CONNECTION_CHECK_INTERVAL,
+            )
+        ):
+            _reusable_connection.state = (connection, connection_options, now)
+            return connection
+        close_reusable_connection()
+
+    connection = _get_connection(**connection_options)
+    # Connections that were opened explicitly are not closed after sending.
+    connection.open()
+    _reusable_connection.state = (connection, connection_options, now)
+    return connection
+
+
+def close_reusable_connection():
+    state = getattr(_reusable_connection, 'state', None)
+    _reusable_connection.state = None
+    if state is not None:
+        try:
+            state[0].close()
+        except Exception:
+            pass
 
 
 def send_mail(subject, message, from_email, recipient_list, fail_silently=False):
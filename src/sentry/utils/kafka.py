@@ -1,36 +1,195 @@
 from __future__ import absolute_import
 
+import atexit
 import logging
+import threading
+import time
 
 from django.conf import settings
 
+from sentry.utils import metrics
+
 
 logger = logging.getLogger(__name__)
 
 
+class AsyncProducer(object):
+    """\
+    Wraps a `confluent_kafka.Producer` so that publishing never waits for the
+    broker.
+
+    Messages are handed to the producer's local queue, where they are batched
+    according to the ``linger.ms`` setting of the cluster. A background thread
+    polls the producer so that delivery callbacks are fired (and failures are
+    recorded) without the publishing thread having to do it. When the local
+    queue is full, ``produce`` polls until there is room again, for at most
+    ``block_timeout`` seconds, before giving up with ``BufferError``.
+
+    The queue is only drained by ``flush``, which is called when the process
+    exits, or explicitly by callers that need a delivery barrier.
+    """
+
+    def __init__(self, producer, name='default', poll_interval=0.1, block_timeout=10.0):
+        self.producer = producer
+        self.name = name
+        self.poll_interval = poll_interval
+        self.block_timeout = block_timeout
+
+        self.__closed = threading.Event()
+        self.__thread = threading.Thread(
+            target=self.__run,
+            name='kafka-producer-%s' % (name, ),
+        )
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def __run(self):
+        while not self.__closed.is_set():
+            try:
+                self.producer.poll(self.poll_interval)
+            except Exception as error:
+                logger.error('Error polling Kafka producer: %s', error, exc_info=True)
+                time.sleep(self.poll_interval)
+
+    def __len__(self):
+        return len(self.producer)
+
+    def __wrap_callback(self, topic, callback):
+        tags = {'cluster': self.name, 'topic': topic}
+
+        def on_delivery(error, message):
+            if error is not None:
+                metrics.incr('kafka.producer.delivery_failed', tags=tags, skip_internal=True)
+            else:
+                metrics.incr('kafka.producer.delivered', tags=tags, skip_internal=True)
+
+            if callback is not None:
+                callback(error, message)
+
+        return on_delivery
+
+    def produce(self, topic, on_delivery=None, **kwargs):
+        on_delivery = self.__wrap_callback(topic, on_delivery)
+        deadline = time.time() + self.block_timeout
+        while True:
+            try:
+                return self.producer.produce(topic=topic, on_delivery=on_delivery, **kwargs)
+            except BufferError:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    metrics.incr('kafka.producer.queue_full', tags={
+                        'cluster': self.name,
+                        'topic': topic,
+                    }, skip_internal=True)
+                    raise
+                # Serve delivery reports until there is room in the local
+                # queue again. This is what applies backpressure to callers.
+                self.producer.poll(min(remaining, self.poll_interval))
+
+    def poll(self, timeout=0.0):
+        # Callbacks are served by the background thread, so this does not need
+        # to block even when callers ask it to.
+        return 0
+
+    def flush(self, timeout=None):
+        if timeout is None:
+            return self.producer.flush()
+        return self.producer.flush(timeout)
+
+    def close(self, timeout=None):
+        self.__closed.set()
+        self.__thread.join()
+        remaining = self.flush(timeout)
+        if remaining:
+            metrics.incr('kafka.producer.undelivered', amount=remaining, tags={
+                'cluster': self.name,
+            }, skip_internal=True)
+            logger.error('Could not deliver %s Kafka message(s) before shutdown.', remaining)
+        return remaining
+
+
 class ProducerManager(object):
     """\
     Manages one `confluent_kafka.Producer` per Kafka cluster.
 
+    When ``asynchronous`` is enabled (see ``KAFKA_PRODUCER_ASYNC``), each
+    producer is wrapped in an ``AsyncProducer`` that is flushed when the
+    process exits.
+
     See `KAFKA_CLUSTERS` and `KAFKA_TOPICS` in settings.
     """
 
-    def __init__(self):
+    def __init__(self, asynchronous=None, producer_factory=None):
+        self.__asynchronous = asynchronous
+        self.__producer_factory = producer_factory
         self.__producers = {}
+        self.__lock = threading.Lock()
+        self.__registered = False
+
+    @property
+    def asynchronous(self):
+        if self.__asynchronous is None:
+            return settings.KAFKA_PRODUCER_ASYNC
+        return self.__asynchronous
+
+    def __create(self, cluster_name):
+        cluster_options = dict(settings.KAFKA_CLUSTERS[cluster_name])
+
+        factory = self.__producer_factory
+        if factory is None:
+            from confluent_kafka import Producer as factory
+
+        if not self.asynchronous:
+            return factory(cluster_options)
+
+        cluster_options.setdefault('linger.ms', settings.KAFKA_PRODUCER_LINGER_MS)
+        return AsyncProducer(
+            factory(cluster_options),
+            name=cluster_name,
+            block_timeout=settings.KAFKA_PRODUCER_BLOCK_TIMEOUT,
+        )
 
     def get(self, key):
         cluster_name = settings.KAFKA_TOPICS[key]['cluster']
+        # Producers define ``__len__`` (the number of queued messages), so
+        # these checks can't rely on truthiness.
         producer = self.__producers.get(cluster_name)
 
-        if producer:
+        if producer is not None:
             return producer
 
-        from confluent_kafka import Producer
+        with self.__lock:
+            producer = self.__producers.get(cluster_name)
+            if producer is not None:
+                return producer
 
-        cluster_options = settings.KAFKA_CLUSTERS[cluster_name]
-        producer = self.__producers[cluster_name] = Producer(cluster_options)
+            producer = self.__producers[cluster_name] = self.__create(cluster_name)
+            if self.asynchronous and not self.__registered:
+                atexit.register(self.close)
+                self.__registered = True
         return producer
 
+    def flush(self, timeout=None):
+        """\
+        Block until all messages published so far have been delivered (or
+        failed to be delivered), returning the number of messages that are
+        still outstanding.
+        """
+        remaining = 0
+        for producer in list(self.__producers.values()):
+            remaining += (producer.flush() if timeout is None else producer.flush(timeout)) or 0
+        return remaining
+
+    def close(self, timeout=None):
+        with self.__lock:
+            producers, self.__producers = self.__producers, {}
+
+        for producer in producers.values():
+            if isinstance(producer, AsyncProducer):
+                producer.close(timeout)
+            else:
+                producer.flush() if timeout is None else producer.flush(timeout)
+
 
 producers = ProducerManager()
 
@@ -40,9 +199,7 @@ def delivery_callback(error, message):
         logger.error('Could not publish message (error: %s): %r', error, message)
 
 
-def produce_sync(topic_key, **kwargs):
-    producer = producers.get(topic_key)
-
+def _produce(producer, topic_key, kwargs):
     try:
         producer.produce(
             topic=settings.KAFKA_TOPICS[topic_key]['topic'],
@@ -51,6 +208,23 @@ def produce_sync(topic_key, **kwargs):
         )
     except Exception as error:
         logger.error('Could not publish message: %s', error, exc_info=True)
-        return
+        return False
+    return True
+
+
+def produce(topic_key, **kwargs):
+    """\
+    Publish a message to the topic configured for ``topic_key``.
 
-    producer.flush()
+    With an asynchronous producer manager this returns as soon as the message
+    has been queued, otherwise it waits for the message to be delivered.
+    """
+    producer = producers.get(topic_key)
+    if _produce(producer, topic_key, kwargs) and not isinstance(producer, AsyncProducer):
+        producer.flush()
+
+
+def produce_sync(topic_key, **kwargs):
+    producer = producers.get(topic_key)
+    if _produce(producer, topic_key, kwargs):
+        producer.flush()
@@ -26,3 +26,55 @@ class LockBackend(object):
         Release a lock. The return value is not used.
         """
         raise NotImplementedError
+
+    def acquire_many(self, keys, duration, routing_key=None):
+        """
+        Acquire the locks for all of the given keys, or none of them. Like
+        ``acquire``, this should attempt to acquire the locks once, and raise
+        an exception if any of them cannot be acquired.
+
+        This implementation acquires the locks one after another, and
+        releases the ones that were acquired if one fails. Backends should
+        provide a more efficient implementation where possible.
+        """
+        acquired = []
+        try:
+            for key in keys:
+                self.acquire(key, duration, routing_key)
+                acquired.append(key)
+        except Exception:
+            for key in acquired:
+                try:
+                    self.release(key, routing_key)
+                except Exception:
+                    pass
+            raise
+
+    def release_many(self, keys, routing_key=None):
+        """
+        Release the locks for all of the given keys. An exception is raised
+        if any of them cannot be released, after all others were released.
+        """
+        error = None
+        for key in keys:
+            try:
+                self.release(key, routing_key)
+            except Exception as e:
+                error = e
+        if error is not None:
+            raise error
+
+    def renew(self, key, duration, routing_key=None):
+        """
+        Extend a lock that is still held to expire in the given duration (in
+        seconds) from now. If the lock is not held anymore, an exception
+        should be raised.
+        """
+        raise NotImplementedError
+
+    def renew_many(self, keys, duration, routing_key=None):
+        """
+        Extend the locks for all of the given keys, see ``renew``.
+        """
+        for key in keys:
+            self.renew(key, duration, routing_key)
@@ -2,12 +2,15 @@ from __future__ import absolute_import
 
 import six
 
+from collections import OrderedDict
 from uuid import uuid4
 
 from sentry.utils import redis
 from sentry.utils.locking.backends import LockBackend
 
+acquire_lock = redis.load_script('utils/locking/acquire_lock.lua')
 delete_lock = redis.load_script('utils/locking/delete_lock.lua')
+renew_lock = redis.load_script('utils/locking/renew_lock.lua')
 
 
 class RedisLockBackend(LockBackend):
@@ -19,7 +22,7 @@ class RedisLockBackend(LockBackend):
         self.prefix = prefix
         self.uuid = uuid
 
-    def get_client(self, key, routing_key=None):
+    def get_host_id(self, key, routing_key=None):
         # This is a bit of an abstraction leak, but if an integer is provided
         # we use that value to determine placement rather than the cluster
         # router. This leaking allows us us to have more fine-grained control
@@ -31,25 +34,78 @@ class RedisLockBackend(LockBackend):
         # different keys that would otherwise be placed on different
         # partitions.)
         if isinstance(routing_key, six.integer_types):
-            index = routing_key % len(self.cluster.hosts)
-            return self.cluster.get_local_client(index)
+            return routing_key % len(self.cluster.hosts)
 
         if routing_key is not None:
             key = routing_key
         else:
             key = self.prefix_key(key)
 
-        return self.cluster.get_local_client_for_key(key)
+        return self.cluster.get_router().get_host_for_key(key)
+
+    def get_client(self, key, routing_key=None):
+        return self.cluster.get_local_client(self.get_host_id(key, routing_key))
 
     def prefix_key(self, key):
         return u'{}{}'.format(self.prefix, key)
 
+    def _group_keys(self, keys, routing_key=None):
+        """
+        Returns the prefixed keys by the client of the host they are placed
+        on, in the order of the given keys.
+        """
+        keys_by_host = OrderedDict()
+        for key in keys:
+            full_key = self.prefix_key(key)
+            host_keys = keys_by_host.setdefault(self.get_host_id(key, routing_key), [])
+            if full_key not in host_keys:
+                host_keys.append(full_key)
+        return [
+            (self.cluster.get_local_client(host_id), full_keys)
+            for host_id, full_keys in six.iteritems(keys_by_host)
+        ]
+
     def acquire(self, key, duration, routing_key=None):
         client = self.get_client(key, routing_key)
         full_key = self.prefix_key(key)
         if client.set(full_key, self.uuid, ex=duration, nx=True) is not True:
             raise Exception(u'Could not set key: {!r}'.format(full_key))
 
+    def acquire_many(self, keys, duration, routing_key=None):
+        # The keys on every host are set atomically. If they are spread over
+        # several hosts and one of them fails, the locks that were acquired on
+        # the other hosts are released again.
+        acquired = []
+        try:
+            for client, full_keys in self._group_keys(keys, routing_key):
+                if not acquire_lock(client, full_keys, (self.uuid, duration)):
+                    raise Exception(u'Could not set keys: {!r}'.format(full_keys))
+                acquired.append((client, full_keys))
+        except Exception:
+            for client, full_keys in acquired:
+                try:
+                    delete_lock(client, full_keys, (self.uuid, ))
+                except Exception:
+                    pass
+            raise
+
     def release(self, key, routing_key=None):
         client = self.get_client(key, routing_key)
         delete_lock(client, (self.prefix_key(key), ), (self.uuid, ))
+
+    def release_many(self, keys, routing_key=None):
+        error = None
+        for client, full_keys in self._group_keys(keys, routing_key):
+            try:
+                delete_lock(client, full_keys, (self.uuid, ))
+            except Exception as e:
+                error = e
+        if error is not None:
+            raise error
+
+    def renew(self, key, duration, routing_key=None):
+        self.renew_many((key, ), duration, routing_key)
+
+    def renew_many(self, keys, duration, routing_key=None):
+        for client, full_keys in self._group_keys(keys, routing_key):
+            renew_lock(client, full_keys, (self.uuid, duration))
@@ -1,26 +1,72 @@
 from __future__ import absolute_import
 
 import logging
+import random
 import six
+import threading
 
 from contextlib import contextmanager
 
 from sentry.utils.locking import UnableToAcquireLock
+from sentry.utils.retries import RetryException, TimedRetryPolicy
 
 logger = logging.getLogger(__name__)
 
 
+class LockRenewer(threading.Thread):
+    """
+    Renews a lock in the background until it is stopped.
+    """
+
+    def __init__(self, lock, interval):
+        super(LockRenewer, self).__init__(name=u'lock-renewer:{!r}'.format(lock))
+        self.daemon = True
+        self.lock = lock
+        self.interval = interval
+        self.__stopped = threading.Event()
+
+    def run(self):
+        while not self.__stopped.wait(self.interval):
+            try:
+                self.lock.renew()
+            except Exception as error:
+                # The lock may have been lost, but the error could also be
+                # temporary, so renewing is attempted again until stopped.
+                logger.warning('Failed to renew %r due to error: %r', self.lock, error,
+                               exc_info=True)
+
+    def stop(self, timeout=None):
+        """
+        Stop renewing, and wait up to ``timeout`` seconds for a renewal that
+        is in progress to finish.
+        """
+        self.__stopped.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+        return not self.is_alive()
+
+
 class Lock(object):
     def __init__(self, backend, key, duration, routing_key=None):
         self.backend = backend
         self.key = key
         self.duration = duration
         self.routing_key = routing_key
+        self.__renewer = None
 
     def __repr__(self):
         return u'<Lock: {!r}>'.format(self.key)
 
-    def acquire(self):
+    def _acquire(self):
+        self.backend.acquire(self.key, self.duration, self.routing_key)
+
+    def _release(self):
+        self.backend.release(self.key, self.routing_key)
+
+    def _renew(self):
+        self.backend.renew(self.key, self.duration, self.routing_key)
+
+    def acquire(self, renew=False):
         """
         Attempt to acquire the lock.
 
@@ -28,15 +74,24 @@ class Lock(object):
         manager that will automatically release the lock when exited. If the
         lock cannot be acquired, an ``UnableToAcquireLock`` error will be
         raised.
+
+        With ``renew``, the lock is renewed in the background every third of
+        its duration until it is released, so that a short duration can be
+        used for an operation that may take longer: if the process dies, the
+        lock still expires soon.
         """
         try:
-            self.backend.acquire(self.key, self.duration, self.routing_key)
+            self._acquire()
         except Exception as error:
             six.raise_from(
                 UnableToAcquireLock(u'Unable to acquire {!r} due to error: {}'.format(self, error)),
                 error
             )
 
+        if renew:
+            self.__renewer = LockRenewer(self, self.duration / 3.0)
+            self.__renewer.start()
+
         @contextmanager
         def releaser():
             try:
@@ -46,6 +101,40 @@ class Lock(object):
 
         return releaser()
 
+    def blocking_acquire(self, timeout, renew=False, initial_delay=0.05, max_delay=1.0):
+        """
+        Attempt to acquire the lock until it succeeds or ``timeout`` seconds
+        have passed, waiting between attempts with an exponential backoff
+        (from ``initial_delay`` up to ``max_delay`` seconds) and random
+        jitter, so that waiting processes do not retry in lockstep.
+
+        Returns a context manager like ``acquire``, or raises an
+        ``UnableToAcquireLock`` error after the timeout.
+        """
+        def delay(attempt):
+            backoff = min(max_delay, initial_delay * 2 ** (attempt - 1))
+            return backoff / 2 + random.random() * backoff / 2
+
+        try:
+            return TimedRetryPolicy(
+                timeout,
+                delay=delay,
+                exceptions=(UnableToAcquireLock, ),
+            )(lambda: self.acquire(renew=renew))
+        except RetryException as error:
+            six.raise_from(
+                UnableToAcquireLock(u'Unable to acquire {!r} within {} seconds'.format(
+                    self, timeout)),
+                error.exception
+            )
+
+    def renew(self):
+        """
+        Extend the lock to expire in its duration from now. Raises an error if
+        the lock is not held anymore.
+        """
+        self._renew()
+
     def release(self):
         """
         Attempt to release the lock.
@@ -53,7 +142,36 @@ class Lock(object):
         Any exceptions raised when attempting to release the lock are logged
         and supressed.
         """
+        if self.__renewer is not None:
+            # A renewal that is still running when the key is deleted could
+            # fail, or even extend the lock if it has been acquired again.
+            if not self.__renewer.stop(timeout=self.duration):
+                logger.warning('Timed out waiting for the renewal of %r to finish', self)
+            self.__renewer = None
+
         try:
-            self.backend.release(self.key, self.routing_key)
+            self._release()
         except Exception as error:
             logger.warning('Failed to release %r due to error: %r', self, error, exc_info=True)
+
+
+class MultiLock(Lock):
+    """
+    A lock on several keys at once, which is acquired for all of them or for
+    none. The ``key`` of a multi-key lock is the tuple of its keys.
+    """
+
+    def __init__(self, backend, keys, duration, routing_key=None):
+        super(MultiLock, self).__init__(backend, tuple(keys), duration, routing_key)
+
+    def __repr__(self):
+        return u'<MultiLock: {!r}>'.format(self.key)
+
+    def _acquire(self):
+        self.backend.acquire_many(self.key, self.duration, self.routing_key)
+
+    def _release(self):
+        self.backend.release_many(self.key, self.routing_key)
+
+    def _renew(self):
+        self.backend.renew_many(self.key, self.duration, self.routing_key)
@@ -1,6 +1,6 @@
 from __future__ import absolute_import
 
-from sentry.utils.locking.lock import Lock
+from sentry.utils.locking.lock import Lock, MultiLock
 
 
 class LockManager(object):
@@ -12,3 +12,10 @@ class LockManager(object):
         Retrieve a ``Lock`` instance.
         """
         return Lock(self.backend, key, duration, routing_key)
+
+    def get_many(self, keys, duration, routing_key=None):
+        """
+        Retrieve a ``MultiLock`` instance, which locks all of the given keys
+        at once.
+        """
+        return MultiLock(self.backend, keys, duration, routing_key)
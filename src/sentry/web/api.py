@@ -30,6 +30,7 @@ from symbolic import ProcessMinidumpError, Unreal4Error
 
 from sentry import features, quotas, tsdb, options
 from sentry.attachments import CachedAttachment
+from sentry.attachments.base import read_chunks
 from sentry.coreapi import (
     Auth, APIError, APIForbidden, APIRateLimited, ClientApiHelper, ClientAuthHelper,
     SecurityAuthHelper, MinidumpAuthHelper, safely_load_json_string, logger as api_logger
@@ -808,7 +809,7 @@ class UnrealView(StoreView):
             if file.type == "minidump" or attachments_enabled:
                 attachments.append(CachedAttachment(
                     name=file.name,
-                    data=file.open_stream().read(),
+                    stream=lambda file=file: read_chunks(file.open_stream()),
                     type=unreal_attachment_type(file),
                 ))
 
@@ -104,36 +104,22 @@ class AuthenticationForm(forms.Form):
         return value.lower()
 
     def is_rate_limited(self):
-        if self._is_ip_rate_limited():
-            return True
-        if self._is_user_rate_limited():
-            return True
-        return False
+        # Both limits are checked with a single round trip.
+        limits = []
 
-    def _is_ip_rate_limited(self):
-        limit = options.get('auth.ip-rate-limit')
-        if not limit:
-            return False
-
-        ip_address = self.request.META['REMOTE_ADDR']
-        return ratelimiter.is_limited(
-            u'auth:ip:{}'.format(ip_address),
-            limit,
-        )
-
-    def _is_user_rate_limited(self):
-        limit = options.get('auth.user-rate-limit')
-        if not limit:
-            return False
+        ip_limit = options.get('auth.ip-rate-limit')
+        if ip_limit:
+            ip_address = self.request.META['REMOTE_ADDR']
+            limits.append((u'auth:ip:{}'.format(ip_address), ip_limit))
 
+        user_limit = options.get('auth.user-rate-limit')
         username = self.cleaned_data.get('username')
-        if not username:
-            return False
+        if user_limit and username:
+            limits.append((u'auth:username:{}'.format(username), user_limit))
 
-        return ratelimiter.is_limited(
-            u'auth:username:{}'.format(username),
-            limit,
-        )
+        if not limits:
+            return False
+        return any(ratelimiter.is_limited_multi(limits))
 
     def clean(self):
         username = self.cleaned_data.get('username')
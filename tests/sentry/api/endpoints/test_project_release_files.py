@@ -46,6 +46,14 @@ class ReleaseFilesListTest(APITestCase):
         assert len(response.data) == 1
         assert response.data[0]['id'] == six.text_type(releasefile.id)
 
+        # Cursors from before keyset pagination load the first page.
+        response = self.client.get(url + '?cursor=0:100:0')
+        assert response.status_code == 200, response.content
+        assert len(response.data) == 1
+
+        response = self.client.get(url + '?cursor=garbage')
+        assert response.status_code == 400, response.content
+
 
 class ReleaseFileCreateTest(APITestCase):
     def test_simple(self):
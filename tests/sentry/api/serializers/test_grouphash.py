@@ -18,6 +18,28 @@ class GroupHashSerializerTest(TestCase):
         result = serialize(hash, user=user)
         assert result['latestEvent'] is None
 
+    def test_unmerge_progress(self):
+        user = self.create_user()
+        group = self.create_group()
+        hash = GroupHash.objects.create(
+            project=group.project,
+            group=group,
+            hash='xyz',
+            state=GroupHash.State.LOCKED_IN_MIGRATION,
+        )
+
+        result = serialize(hash, user=user)
+        assert result['state'] == 'locked'
+        assert result['unmergeProgress'] is None
+
+        GroupHash.record_unmerge_progress([hash.id], {'processed': 10, 'migrated': 4})
+        result = serialize(hash, user=user)
+        assert result['unmergeProgress'] == {'processed': 10, 'migrated': 4}
+
+        GroupHash.delete_unmerge_progress([hash.id])
+        result = serialize(hash, user=user)
+        assert result['unmergeProgress'] is None
+
     def test_missing_latest_event(self):
         user = self.create_user()
         group = self.create_group()
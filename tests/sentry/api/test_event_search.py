@@ -9,9 +9,10 @@ from parsimonious.exceptions import IncompleteParseError
 
 from sentry.api.event_search import (
     convert_endpoint_params, event_search_grammar, get_snuba_query_args,
-    parse_search_query, InvalidSearchQuery, SearchFilter, SearchKey,
-    SearchValue, SearchVisitor,
+    parse_search_query, InvalidSearchQuery, ParsedQueryCache, SearchFilter,
+    SearchKey, SearchValue, SearchVisitor,
 )
+from sentry.api.issue_search import IssueSearchVisitor
 from sentry.testutils import TestCase
 
 
@@ -684,6 +685,78 @@ class GetSnubaQueryArgsTest(TestCase):
         }
 
 
+class ParsedQueryCacheTest(TestCase):
+    queries = [
+        '',
+        'user.email:foo@example.com release:1.2.1 fruit:apple hello',
+        '!user.email:foo@example.com !has:release has:fruit',
+        'release:3.1.* user.email:*@example.com message:"foo bar"',
+        'first_seen:-24h last_seen:+7d timestamp:>2015-05-18',
+        'timestamp:2015-05-18 stack.lineno:>10 random:-2w',
+        'is:unresolved assigned:me timesSeen:>5 firstSeen:-1w',
+    ]
+
+    def test_equivalence(self):
+        cache = ParsedQueryCache(max_size=100)
+        now = timezone.now()
+        with freeze_time(now):
+            for visitor_cls in (SearchVisitor, IssueSearchVisitor):
+                for query in self.queries:
+                    try:
+                        expected = visitor_cls().visit(event_search_grammar.parse(query))
+                    except InvalidSearchQuery:
+                        with self.assertRaises(InvalidSearchQuery):
+                            cache.get(query, visitor_cls)
+                        continue
+
+                    # the second call is served from the cache
+                    assert cache.get(query, visitor_cls).get_filters() == expected
+                    assert cache.get(query, visitor_cls).get_filters() == expected
+
+    def test_relative_time_resolved_on_use(self):
+        cache = ParsedQueryCache(max_size=100)
+        now = timezone.now()
+        with freeze_time(now):
+            parsed = cache.get('first_seen:-1d')
+            assert parsed.get_filters()[0].value.raw_value == now - timedelta(days=1)
+            assert parsed.get_snuba_filters() == [
+                ('conditions', 'first_seen', ['first_seen', '>=', now - timedelta(days=1)]),
+            ]
+
+        later = now + timedelta(hours=1)
+        with freeze_time(later):
+            parsed = cache.get('first_seen:-1d')
+            assert parsed.get_filters()[0].value.raw_value == later - timedelta(days=1)
+            assert parsed.get_snuba_filters() == [
+                ('conditions', 'first_seen', ['first_seen', '>=', later - timedelta(days=1)]),
+            ]
+
+    def test_lru(self):
+        cache = ParsedQueryCache(max_size=2)
+        first = cache.get('foo:1')
+        second = cache.get('foo:2')
+        assert cache.get('foo:1') is first
+        cache.get('foo:3')
+        # foo:2 was the least recently used query
+        assert cache.get('foo:1') is first
+        assert cache.get('foo:2') is not second
+
+    def test_disabled(self):
+        cache = ParsedQueryCache(max_size=0)
+        assert cache.get('foo:1') is not cache.get('foo:1')
+
+    def test_results_are_not_shared(self):
+        result = get_snuba_query_args('fruit:apple')
+        result['conditions'][0].append('modified')
+        parse_search_query('fruit:apple').append('modified')
+
+        assert get_snuba_query_args('fruit:apple') == {
+            'conditions': [[['ifNull', ['tags[fruit]', "''"]], '=', 'apple']],
+            'filter_keys': {},
+        }
+        assert len(parse_search_query('fruit:apple')) == 1
+
+
 class ConvertEndpointParamsTests(TestCase):
     def test_simple(self):
         assert convert_endpoint_params({
@@ -1,6 +1,8 @@
 from __future__ import absolute_import
 
+import mock
 import pytest
+import six
 from datetime import timedelta
 from django.utils import timezone
 from unittest import TestCase as SimpleTestCase
@@ -8,13 +10,14 @@ from unittest import TestCase as SimpleTestCase
 from sentry.api.paginator import (
     Paginator,
     DateTimePaginator,
+    KeysetPaginator,
     OffsetPaginator,
     SequencePaginator,
     GenericOffsetPaginator,
     reverse_bisect_left)
 from sentry.models import User
 from sentry.testutils import TestCase
-from sentry.utils.cursors import Cursor
+from sentry.utils.cursors import Cursor, KeysetCursor
 from sentry.utils.db import is_mysql
 
 
@@ -60,6 +63,42 @@ class PaginatorTest(TestCase):
         result = paginator.count_hits(1)
         assert result == 1
 
+    def test_cached_hits(self):
+        self.create_user('foo@example.com')
+
+        paginator = self.cls(User.objects.all(), 'id', hits_cache_ttl=60)
+        result = paginator.get_result(limit=10, count_hits=True)
+        assert result.hits == 1
+        assert not result.hits_estimated
+
+        self.create_user('bar@example.com')
+        paginator = self.cls(User.objects.all(), 'id', hits_cache_ttl=60)
+        with mock.patch.object(self.cls, '_execute_count') as execute_count:
+            assert paginator.get_result(limit=10, count_hits=True).hits == 1
+            assert not execute_count.called
+
+        paginator = self.cls(User.objects.all(), 'id', hits_cache_ttl=0)
+        assert paginator.get_result(limit=10, count_hits=True).hits == 2
+
+    def test_estimated_hits(self):
+        self.create_user('foo@example.com')
+
+        paginator = self.cls(User.objects.all(), 'id', estimate_hits=True)
+        with mock.patch.object(self.cls, 'estimate_count', return_value=100000):
+            result = paginator.get_result(limit=10, count_hits=True)
+        assert result.hits == 1000
+        assert result.hits_estimated
+
+        with mock.patch.object(self.cls, 'estimate_count', return_value=100):
+            result = paginator.get_result(limit=10, count_hits=True)
+        assert result.hits == 1
+        assert not result.hits_estimated
+
+        with mock.patch.object(self.cls, 'estimate_count', return_value=None):
+            result = paginator.get_result(limit=10, count_hits=True)
+        assert result.hits == 1
+        assert not result.hits_estimated
+
     def test_prev_emptyset(self):
         queryset = User.objects.all()
 
@@ -377,6 +416,85 @@ def test_reverse_bisect_left():
     assert reverse_bisect_left([3, 2, 1], 2, hi=10) == 1
 
 
+class KeysetPaginatorTest(TestCase):
+    def test_ascending_with_ties(self):
+        joined = timezone.now()
+        users = [
+            self.create_user('foo@example.com', date_joined=joined),
+            self.create_user('bar@example.com', date_joined=joined),
+            self.create_user('baz@example.com', date_joined=joined),
+            self.create_user('qux@example.com', date_joined=joined + timedelta(seconds=1)),
+        ]
+
+        paginator = KeysetPaginator(User.objects.all(), 'date_joined')
+        result1 = paginator.get_result(limit=2)
+        assert list(result1) == users[:2]
+        assert result1.next
+        assert not result1.prev
+
+        result2 = paginator.get_result(limit=2, cursor=result1.next)
+        assert list(result2) == users[2:]
+        assert not result2.next
+        assert result2.prev
+
+        result3 = paginator.get_result(limit=1, cursor=result2.prev)
+        assert list(result3) == users[1:2]
+        assert result3.next
+        assert result3.prev
+
+        result4 = paginator.get_result(limit=1, cursor=result3.prev)
+        assert list(result4) == users[:1]
+        assert result4.next
+        assert not result4.prev
+
+    def test_descending(self):
+        users = [
+            self.create_user('a@example.com'),
+            self.create_user('b@example.com'),
+            self.create_user('c@example.com'),
+        ]
+
+        paginator = KeysetPaginator(User.objects.all(), '-username')
+        result1 = paginator.get_result(limit=2)
+        assert list(result1) == users[:0:-1]
+        assert result1.next
+
+        # cursors survive the round trip through their string form
+        cursor = KeysetCursor.from_string(six.text_type(result1.next))
+        result2 = paginator.get_result(limit=2, cursor=cursor)
+        assert list(result2) == users[:1]
+        assert not result2.next
+        assert result2.prev
+
+        result3 = paginator.get_result(limit=2, cursor=result2.prev)
+        assert list(result3) == users[:0:-1]
+        assert result3.next
+        assert not result3.prev
+
+
+class KeysetCursorTest(SimpleTestCase):
+    def test_string_roundtrip(self):
+        for value in (u'foo:bar', 1548979200000000, None, [1, u'\xe9']):
+            cursor = KeysetCursor(value, 5, True)
+            parsed = KeysetCursor.from_string(six.text_type(cursor))
+            assert parsed.value == value
+            assert parsed.offset == 5
+            assert parsed.is_prev
+
+    def test_legacy(self):
+        # Offset cursors issued before keyset pagination start at the top.
+        for value in ('0:100:0', '1548979200000.0:5:1'):
+            cursor = KeysetCursor.from_string(value)
+            assert cursor.value is None
+            assert cursor.offset == 0
+            assert not cursor.is_prev
+
+    def test_invalid(self):
+        for value in ('', 'foo', 'Zm9v:1:0', 'IjEi:a:0'):
+            with pytest.raises(ValueError):
+                KeysetCursor.from_string(value)
+
+
 class SequencePaginatorTestCase(SimpleTestCase):
     def test_empty_results(self):
         paginator = SequencePaginator([])
@@ -0,0 +1,58 @@
+from __future__ import absolute_import
+
+import os
+import zlib
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from sentry.attachments.base import DEFAULT_CHUNK_SIZE, CachedAttachment
+from sentry.attachments.default import DefaultAttachmentCache
+from sentry.testutils import TestCase
+
+
+class DefaultAttachmentCacheTest(TestCase):
+    def setUp(self):
+        super(DefaultAttachmentCacheTest, self).setUp()
+        self.attachment_cache = DefaultAttachmentCache()
+        self.addCleanup(self.attachment_cache.delete, 'foo')
+
+    def test_chunked_roundtrip(self):
+        data = os.urandom(DEFAULT_CHUNK_SIZE * 2 + 10)
+        upload = SimpleUploadedFile('foo.dmp', data, content_type='application/octet-stream')
+        self.attachment_cache.set('foo', [
+            CachedAttachment.from_upload(upload, type='event.minidump'),
+            CachedAttachment(name='bar.txt', data=b'Hello World!'),
+            CachedAttachment(name='empty.txt', data=b''),
+        ])
+
+        inner = self.attachment_cache.inner
+        assert inner.get('foo:a:0:2', raw=True) is not None
+        assert inner.get('foo:a:0:3', raw=True) is None
+        assert inner.get('foo:a:chunks', raw=False) == [3, None, None]
+
+        # Small attachments and the metadata are stored like before, so that
+        # previous versions can still read them.
+        assert zlib.decompress(inner.get('foo:a:1', raw=True)) == b'Hello World!'
+        assert zlib.decompress(inner.get('foo:a:2', raw=True)) == b''
+        for meta in inner.get('foo:a', raw=False):
+            assert sorted(meta) == ['content_type', 'name', 'type']
+
+        rv = self.attachment_cache.get('foo')
+        assert [a.meta() for a in rv] == [
+            {'name': 'foo.dmp', 'content_type': 'application/octet-stream',
+             'type': 'event.minidump'},
+            {'name': 'bar.txt', 'content_type': None, 'type': 'event.attachment'},
+            {'name': 'empty.txt', 'content_type': None, 'type': 'event.attachment'},
+        ]
+        assert [len(chunk) for chunk in rv[0].iter_chunks()] == \
+            [DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_SIZE, 10]
+        assert rv[0].open().read(DEFAULT_CHUNK_SIZE + 5) == data[:DEFAULT_CHUNK_SIZE + 5]
+        assert rv[0].data == data
+        assert rv[1].data == b'Hello World!'
+        assert rv[2].data == b''
+
+        self.attachment_cache.delete('foo')
+        assert self.attachment_cache.get('foo') is None
+        assert inner.get('foo:a:0:0', raw=True) is None
+        assert inner.get('foo:a:1', raw=True) is None
+        assert inner.get('foo:a:chunks', raw=False) is None
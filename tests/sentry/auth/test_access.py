@@ -1,10 +1,14 @@
 from __future__ import absolute_import
 
 from django.contrib.auth.models import AnonymousUser
+from django.utils import timezone
 from mock import Mock
 
 from sentry.auth import access
-from sentry.models import AuthProvider, AuthIdentity, Organization
+from sentry.models import (
+    AuthProvider, AuthIdentity, Organization, OrganizationMember, OrganizationMemberTeam,
+    ProjectTeam, UserPermission
+)
 from sentry.testutils import TestCase
 
 
@@ -215,6 +219,96 @@ class FromUserTest(TestCase):
         assert result is access.DEFAULT
 
 
+class FromMemberCacheTest(TestCase):
+    def setUp(self):
+        super(FromMemberCacheTest, self).setUp()
+        access.member_state_cache.clear()
+        self.user = self.create_user()
+        self.organization = self.create_organization(flags=0)
+        self.team = self.create_team(organization=self.organization)
+        self.project = self.create_project(organization=self.organization, teams=[self.team])
+        self.member = self.create_member(
+            organization=self.organization,
+            user=self.user,
+            teams=[self.team],
+        )
+
+    def get_access(self):
+        member = OrganizationMember.objects.get(id=self.member.id)
+        member.organization = self.organization
+        return access.from_member(member)
+
+    def test_cached(self):
+        result = self.get_access()
+        assert result.has_project_access(self.project)
+
+        member = OrganizationMember.objects.get(id=self.member.id)
+        member.organization = self.organization
+        with self.assertNumQueries(0):
+            result = access.from_member(member)
+            assert result.has_team_access(self.team)
+            assert result.has_project_membership(self.project)
+
+        # The shared cache is used without the local one.
+        access.member_state_cache.clear()
+        with self.assertNumQueries(0):
+            access.from_member(member)
+
+        assert result.teams == [self.team]
+        assert result.projects == [self.project]
+
+    def test_expired_on_team_changes(self):
+        assert self.get_access().has_project_access(self.project)
+
+        other_team = self.create_team(organization=self.organization)
+        other_project = self.create_project(organization=self.organization, teams=[other_team])
+        assert not self.get_access().has_project_access(other_project)
+
+        self.create_team_membership(other_team, member=self.member)
+        assert self.get_access().has_project_access(other_project)
+
+        ProjectTeam.objects.filter(project=other_project).delete()
+        assert not self.get_access().has_project_access(other_project)
+
+        OrganizationMemberTeam.objects.get(
+            organizationmember=self.member,
+            team=self.team,
+        ).delete()
+        assert not self.get_access().has_team_access(self.team)
+
+    def test_expired_on_sso_changes(self):
+        assert not self.get_access().requires_sso
+
+        auth_provider = AuthProvider.objects.create(
+            organization=self.organization,
+            provider='dummy',
+        )
+        result = self.get_access()
+        assert result.requires_sso
+        assert not result.sso_is_valid
+
+        AuthIdentity.objects.create(
+            auth_provider=auth_provider,
+            user=self.user,
+            last_verified=timezone.now(),
+        )
+        member = OrganizationMember.objects.get(id=self.member.id)
+        setattr(member.flags, 'sso:linked', True)
+        member.save()
+        assert self.get_access().sso_is_valid
+
+    def test_expired_on_permission_changes(self):
+        assert not self.get_access().has_permission('broadcasts.admin')
+        UserPermission.objects.create(user=self.user, permission='broadcasts.admin')
+        assert self.get_access().has_permission('broadcasts.admin')
+
+    def test_disabled(self):
+        self.get_access()
+        with self.settings(SENTRY_ACCESS_CACHE_TTL=0):
+            with self.assertNumQueries(5):
+                self.get_access()
+
+
 class FromSentryAppTest(TestCase):
     def setUp(self):
         super(FromSentryAppTest, self).setUp()
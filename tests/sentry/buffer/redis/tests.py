@@ -127,6 +127,24 @@ class RedisBufferTest(TestCase):
         pending = client.zrange('b:p', 0, -1)
         assert pending == ['foo']
 
+    def test_incr_multi(self):
+        client = self.buf.cluster.get_routing_client()
+        model = mock.Mock()
+        model.__name__ = 'Mock'
+        items = [
+            (model, {'times_seen': 1}, {'pk': 1}, None),
+            (model, {'times_seen': 2}, {'pk': 2}, {'foo': 'bar'}),
+            (model, {'times_seen': 3}, {'pk': 1}, None),
+        ]
+        self.buf.incr_multi(items)
+
+        key1 = self.buf._make_key(model, {'pk': 1})
+        key2 = self.buf._make_key(model, {'pk': 2})
+        assert client.hget(key1, 'i+times_seen') == '4'
+        assert client.hget(key2, 'i+times_seen') == '2'
+        assert client.hexists(key2, 'e+foo')
+        assert set(client.zrange('b:p', 0, -1)) == {key1, key2}
+
     @mock.patch('sentry.buffer.redis.RedisBuffer._make_key', mock.Mock(return_value='foo'))
     @mock.patch('sentry.buffer.redis.process_incr')
     @mock.patch('sentry.buffer.redis.process_pending')
@@ -47,7 +47,7 @@ class TestConsumer(PluginTestCase):
 
     @patch('sentry.tasks.store.save_event')
     @patch('sentry.tasks.store.preprocess_event')
-    @patch('sentry.utils.kafka.produce_sync')
+    @patch('sentry.utils.kafka.produce')
     def test_process_path(self, mock_produce, mock_preprocess_event, mock_save_event):
         with self.feature('projects:kafka-ingest'):
             project = self.create_project()
@@ -76,7 +76,7 @@ class TestConsumer(PluginTestCase):
     @patch('sentry.tasks.store.save_event')
     @patch('sentry.tasks.store.process_event')
     @patch('sentry.tasks.store.preprocess_event')
-    @patch('sentry.utils.kafka.produce_sync')
+    @patch('sentry.utils.kafka.produce')
     def test_save_path(self, mock_produce, mock_preprocess_event,
                        mock_process_event, mock_save_event):
         with self.feature('projects:kafka-ingest'):
@@ -42,6 +42,40 @@ class BulkDeleteQueryTest(TestCase):
         assert not Group.objects.filter(id=group1_2.id).exists()
         assert Group.objects.filter(id=group1_3.id).exists()
 
+    def test_execute_returns_deleted_count(self):
+        project1 = self.create_project()
+        self.create_group(project1)
+        self.create_group(project1)
+        assert BulkDeleteQuery(
+            model=Group,
+            project_id=project1.id,
+        ).execute() == 2
+
+    def test_shard(self):
+        now = timezone.now()
+        project1 = self.create_project()
+        groups = [
+            self.create_group(project1, last_seen=now - timedelta(days=2))
+            for _ in range(5)
+        ]
+        recent = self.create_group(project1, last_seen=now)
+
+        query = BulkDeleteQuery(
+            model=Group,
+            project_id=project1.id,
+            dtfield='last_seen',
+            days=1,
+        )
+        shards = query.shard(2)
+        assert len(shards) == 2
+
+        for shard in shards:
+            shard.execute()
+
+        assert not Group.objects.filter(id__in=[g.id for g in groups]).exists()
+        assert Group.objects.filter(id=recent.id).exists()
+        assert query.shard(2) == []
+
 
 class BulkDeleteQueryIteratorTestCase(TransactionTestCase):
     def test_iteration(self):
@@ -65,3 +99,21 @@ class BulkDeleteQueryIteratorTestCase(TransactionTestCase):
             results.update(chunk)
 
         assert results == expected_group_ids
+
+    def test_iteration_id_range(self):
+        group_ids = sorted(self.create_group().id for i in range(4))
+
+        iterator = BulkDeleteQuery(
+            model=Group,
+            project_id=self.project.id,
+            dtfield='last_seen',
+            order_by='last_seen',
+            days=0,
+            id_range=(group_ids[1], group_ids[3]),
+        ).iterator(1)
+
+        results = set()
+        for chunk in iterator:
+            results.update(chunk)
+
+        assert results == set(group_ids[1:3])
@@ -1,5 +1,6 @@
 from __future__ import absolute_import
 
+import mock
 import pytest
 import time
 
@@ -154,3 +155,54 @@ class RedisBackendTestCase(TestCase):
 
         with backend.digest('timeline', 0) as records:
             assert len(set(records)) == n
+
+    def test_digest_many(self):
+        backend = RedisBackend()
+
+        record_1 = Record('record:1', 'value', time.time())
+        record_2 = Record('record:2', 'value', time.time())
+        backend.add('timeline:1', record_1)
+        backend.add('timeline:2', record_2)
+        backend.add('timeline:3', Record('record:3', 'value', time.time()))
+
+        with backend.digest('timeline:3', 0):
+            pass
+
+        # The third timeline is waiting, so it can't be digested.
+        with backend.digest_many(['timeline:1', 'timeline:2', 'timeline:3'], {
+            'timeline:1': 0,
+            'timeline:2': 0,
+        }) as digests:
+            assert list(digests) == ['timeline:1', 'timeline:2']
+            assert digests['timeline:1'] == [record_1]
+            assert digests['timeline:2'] == [record_2]
+
+            # Removed timelines are not closed.
+            del digests['timeline:2']
+
+        with pytest.raises(InvalidState):
+            with backend.digest('timeline:1', 0):
+                pass
+
+        backend.maintenance(time.time())
+        assert set(entry.key for entry in backend.schedule(time.time())) == \
+            set(['timeline:1', 'timeline:2', 'timeline:3'])
+
+        with backend.digest_many(['timeline:1', 'timeline:2']) as digests:
+            assert digests == {'timeline:1': [], 'timeline:2': [record_2]}
+
+    def test_digest_many_lock_duration(self):
+        backend = RedisBackend()
+        keys = [u'timeline:{}'.format(i) for i in range(10)]
+        for key in keys:
+            backend.add(key, Record(u'record:{}'.format(key), 'value', time.time()))
+
+        with mock.patch.object(backend, '_get_timeline_lock',
+                               wraps=backend._get_timeline_lock) as get_timeline_lock:
+            with backend.digest_many(keys) as digests:
+                assert list(digests) == keys
+
+        # The locks are held until all digests are built, which takes longer
+        # the more timelines there are.
+        assert set(call[1]['duration'] for call in get_timeline_lock.call_args_list) == \
+            set([30 + 3 * len(keys)])
@@ -11,6 +11,7 @@ from sentry.digests import Record
 from sentry.digests.notifications import (
     Notification,
     event_to_record,
+    fetch_states,
     rewrite_record,
     group_records,
     sort_group_contents,
@@ -141,3 +142,27 @@ class SortRecordsTestCase(TestCase):
                 (rules[0], OrderedDict(((groups[0], []), ))),
             )
         )
+
+
+class FetchStatesTestCase(TestCase):
+    def test_fetch_states(self):
+        project = self.create_project()
+        rule = Rule.objects.create(project=project, label='rule')
+        group_1 = self.create_group(project=project)
+        group_2 = self.create_group(project=project)
+        event_1 = self.create_event(group=group_1)
+        event_2 = self.create_event(group=group_2)
+
+        records_1 = [event_to_record(event_1, [rule])]
+        records_2 = [event_to_record(event_2, [rule]), event_to_record(event_1, [rule])]
+
+        with self.assertNumQueries(2):
+            state_1, state_2 = fetch_states([(project, records_1), (project, records_2)])
+
+        assert state_1['project'] == state_2['project'] == project
+        assert state_1['groups'] == {group_1.id: group_1}
+        assert state_2['groups'] == {group_1.id: group_1, group_2.id: group_2}
+        assert state_1['rules'] == state_2['rules'] == {rule.id: rule}
+
+        # Every digest gets its own instances.
+        assert state_1['groups'][group_1.id] is not state_2['groups'][group_1.id]
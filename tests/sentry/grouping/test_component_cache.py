@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import os
+import json
+import pytest
+
+from django.test.utils import override_settings
+
+from sentry.models import Event
+from sentry.event_manager import EventManager
+from sentry.grouping.component import GroupingComponent
+from sentry.grouping.strategies.base import ComponentCache, component_cache
+
+from tests.sentry.grouping.test_variants import _fixture_path, load_configs
+
+
+def get_variants(test_name, config_name):
+    with open(os.path.join(_fixture_path, test_name + '.json')) as f:
+        input = json.load(f)
+
+    mgr = EventManager(data=input)
+    mgr.normalize()
+    data = mgr.get_data()
+    evt = Event(data=data, platform=data['platform'])
+
+    return {
+        key: (variant.get_hash(), variant.as_dict())
+        for key, variant in evt.get_grouping_variants(force_config=config_name).items()
+    }
+
+
+@pytest.mark.parametrize(
+    'config_name,test_name',
+    load_configs(),
+    ids=lambda x: x.replace("-", "_")
+)
+def test_cached_variants_match(config_name, test_name):
+    with override_settings(SENTRY_GROUPING_COMPONENT_CACHE_SIZE=0):
+        expected = get_variants(test_name, config_name)
+
+    component_cache.clear()
+    with override_settings(SENTRY_GROUPING_COMPONENT_CACHE_SIZE=10000):
+        # The first run fills the cache, the second one is served from it.
+        assert get_variants(test_name, config_name) == expected
+        assert get_variants(test_name, config_name) == expected
+
+
+def test_cache_hands_out_copies():
+    cache = ComponentCache(max_size=2)
+
+    def factory():
+        return GroupingComponent(
+            id='frame',
+            values=[GroupingComponent(id='function', values=['foo'])],
+        )
+
+    component = cache.get_or_create('a', factory)
+    component.update(contributes=False, hint='non app frame')
+
+    cached = cache.get_or_create('a', factory)
+    assert cached is not component
+    assert cached.contributes
+    assert cached.hint is None
+    assert cached.as_dict() == factory().as_dict()
+
+    cached.values[0].update(values=['bar'])
+    assert cache.get_or_create('a', factory).as_dict() == factory().as_dict()
+
+
+def test_cache_eviction():
+    cache = ComponentCache(max_size=1)
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return GroupingComponent(id='frame')
+
+    cache.get_or_create('a', factory)
+    cache.get_or_create('a', factory)
+    assert len(calls) == 1
+
+    cache.get_or_create('b', factory)
+    cache.get_or_create('a', factory)
+    assert len(calls) == 3
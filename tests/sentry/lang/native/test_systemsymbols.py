@@ -0,0 +1,128 @@
+from __future__ import absolute_import
+
+import mock
+
+from sentry.lang.native import systemsymbols
+from sentry.lang.native.systemsymbols import local_cache, lookup_system_symbols
+from sentry.testutils import TestCase
+from sentry.utils.cache import cache
+
+SDK_INFO = {
+    'sdk_name': 'iOS',
+    'version_major': 12,
+    'version_minor': 1,
+    'version_patchlevel': 0,
+    'build': '16B91',
+}
+
+
+def make_symbol(addr):
+    return {
+        'object_uuid': '3e3d0d1b-4b80-3b3f-9a0b-7b5f1c8d3a2e',
+        'object_name': '/usr/lib/system/libsystem_kernel.dylib',
+        'addr': addr,
+    }
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+class FakeSession(object):
+    """
+    Answers lookups for every address in ``known`` and records the requests.
+    """
+
+    def __init__(self, known=(), status_code=200):
+        self.known = known
+        self.status_code = status_code
+        self.requests = []
+
+    def post(self, url, json):
+        self.requests.append(json)
+        return FakeResponse(self.status_code, {
+            'symbols': [
+                {'symbol': 'sym_%s' % s['addr']} if s['addr'] in self.known else None
+                for s in json['symbols']
+            ],
+        })
+
+
+class LookupSystemSymbolsTest(TestCase):
+    def setUp(self):
+        super(LookupSystemSymbolsTest, self).setUp()
+        local_cache.clear()
+        cache.clear()
+        self.session = FakeSession(known=('0x1000', '0x2000'))
+        patcher = mock.patch.object(systemsymbols, 'get_session', return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(local_cache.clear)
+
+    def lookup(self, addrs):
+        with self.options({
+            'symbolserver.enabled': True,
+            'symbolserver.options': {'url': 'http://symbolserver.invalid/'},
+        }):
+            return lookup_system_symbols(
+                [make_symbol(addr) for addr in addrs],
+                sdk_info=SDK_INFO,
+                cpu_name='arm64',
+            )
+
+    def test_disabled(self):
+        assert lookup_system_symbols([make_symbol('0x1000')], SDK_INFO, 'arm64') is None
+        assert self.session.requests == []
+
+    def test_deduplicates_lookups(self):
+        rv = self.lookup(['0x1000', '0x2000', '0x1000', '0x3000'])
+        assert rv == [
+            {'symbol': 'sym_0x1000'},
+            {'symbol': 'sym_0x2000'},
+            {'symbol': 'sym_0x1000'},
+            None,
+        ]
+
+        assert len(self.session.requests) == 1
+        assert [s['addr'] for s in self.session.requests[0]['symbols']] == \
+            ['0x1000', '0x2000', '0x3000']
+
+    def test_caches_matches_and_misses(self):
+        expected = [{'symbol': 'sym_0x1000'}, None]
+        assert self.lookup(['0x1000', '0x3000']) == expected
+        assert self.lookup(['0x1000', '0x3000']) == expected
+        assert len(self.session.requests) == 1
+
+        # Without the process local cache, the shared cache is used.
+        local_cache.clear()
+        assert self.lookup(['0x1000', '0x3000']) == expected
+        assert len(self.session.requests) == 1
+
+        # Only symbols that were not seen before are sent.
+        assert self.lookup(['0x1000', '0x2000']) == \
+            [{'symbol': 'sym_0x1000'}, {'symbol': 'sym_0x2000'}]
+        assert len(self.session.requests) == 2
+        assert [s['addr'] for s in self.session.requests[1]['symbols']] == ['0x2000']
+
+    def test_unknown_sdk(self):
+        self.session.status_code = 404
+        assert self.lookup(['0x1000', '0x2000']) == [None, None]
+        assert self.lookup(['0x1000', '0x2000']) == [None, None]
+        assert len(self.session.requests) == 1
+
+    @mock.patch('sentry.lang.native.systemsymbols.time.sleep')
+    def test_failure_is_not_cached(self, mock_sleep):
+        self.session.post = mock.Mock(side_effect=IOError('down'))
+        assert self.lookup(['0x1000']) is None
+        assert self.session.post.call_count == systemsymbols.MAX_ATTEMPTS + 1
+
+        del self.session.post
+        assert self.lookup(['0x1000']) == [{'symbol': 'sym_0x1000'}]
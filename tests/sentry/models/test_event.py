@@ -2,7 +2,10 @@ from __future__ import absolute_import
 
 import pickle
 
-from sentry.models import Environment
+from mock import patch
+
+from sentry.interfaces import base as interfaces
+from sentry.models import Environment, Event
 from sentry.testutils import TestCase
 from sentry.db.models.fields.node import NodeData
 from sentry.event_manager import EventManager
@@ -56,6 +59,32 @@ class EventTest(TestCase):
         event2 = pickle.loads(data)
         assert event2.data == event.data
 
+    def test_interfaces_are_lazy(self):
+        event = self.create_event(
+            data={
+                'logentry': {'message': 'Hello world'},
+                'user': {'id': '1', 'email': 'foo@example.com'},
+                'exception': {'values': [{'type': 'ValueError', 'value': 'foo'}]},
+            }
+        )
+        # a fresh instance, that has not built any interfaces yet
+        event = Event.objects.get(id=event.id)
+
+        with patch.object(interfaces, '_to_python', wraps=interfaces._to_python) as to_python:
+            assert event.get_interface('user').email == 'foo@example.com'
+            assert event.get_interface('sentry.interfaces.User').email == 'foo@example.com'
+            assert event.get_interface('csp') is None
+            assert [call[0][0] for call in to_python.call_args_list] == [
+                'user', 'csp', 'sentry.interfaces.Csp',
+            ]
+
+            expected = interfaces.get_interfaces(event.data)
+            assert list(event.interfaces) == list(expected)
+            assert len(event.interfaces) == len(expected)
+
+            # the user interface is not built again
+            assert [call[0][0] for call in to_python.call_args_list].count('user') == 2
+
     def test_event_as_dict(self):
         event = self.create_event(
             data={
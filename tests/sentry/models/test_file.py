@@ -1,10 +1,15 @@
 from __future__ import absolute_import
 
 import os
+import shutil
+import tempfile
+import time
 
 from django.core.files.base import ContentFile
+from mock import patch
 
 from sentry.models import File, FileBlob
+from sentry.models.file import _open_cached_blob, _prune_blob_cache
 from sentry.testutils import TestCase
 
 
@@ -24,6 +29,25 @@ class FileBlobTest(TestCase):
         assert my_file1.checksum == my_file2.checksum
         assert my_file1.path == my_file2.path
 
+    def test_from_files_blob_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            with patch('sentry.models.file.BLOB_CACHE_DIR', cache_dir), \
+                    patch('sentry.models.file.BLOB_CACHE_MAX_SIZE', 6):
+                FileBlob.from_files([
+                    ContentFile(b'foo'),
+                    ContentFile(b'bar'),
+                    ContentFile(b'quux'),
+                ])
+
+                # Uploaded chunks are cached, but never beyond the limit
+                sizes = [os.path.getsize(os.path.join(cache_dir, name))
+                         for name in os.listdir(cache_dir)]
+                assert sizes
+                assert sum(sizes) <= 6
+        finally:
+            shutil.rmtree(cache_dir)
+
     def test_generate_unique_path(self):
         path = FileBlob.generate_unique_path()
         assert path
@@ -91,3 +115,83 @@ class FileTest(TestCase):
 
         f = file.getfile(prefetch=True)
         assert f.read() == random_data
+
+    def test_readahead(self):
+        fileobj = ContentFile('foo bar baz quux'.encode('utf-8'))
+        file1 = File.objects.create(
+            name='baz.js',
+            type='default',
+            size=16,
+        )
+        file1.putfile(fileobj, 3)
+
+        with file1.getfile(readahead=2) as fp:
+            assert fp.read().decode('utf-8') == 'foo bar baz quux'
+            fp.seek(7)
+            assert fp.tell() == 7
+            assert fp.read(5).decode('utf-8') == ' baz '
+            fp.seek(2)
+            assert fp.read().decode('utf-8') == 'o bar baz quux'
+
+    def test_blob_cache_dir(self):
+        fileobj = ContentFile('foo bar baz'.encode('utf-8'))
+        file1 = File.objects.create(
+            name='baz.js',
+            type='default',
+            size=11,
+        )
+        results = file1.putfile(fileobj, 4)
+
+        cache_dir = tempfile.mkdtemp()
+        try:
+            with patch('sentry.models.file.BLOB_CACHE_DIR', cache_dir):
+                with file1.getfile() as fp:
+                    assert fp.read().decode('utf-8') == 'foo bar baz'
+
+                assert sorted(os.listdir(cache_dir)) == sorted(
+                    r.blob.checksum for r in results
+                )
+
+                # Blobs are now served from the local cache
+                with patch.object(FileBlob, 'getfile', side_effect=AssertionError):
+                    with file1.getfile() as fp:
+                        fp.seek(5)
+                        assert fp.read().decode('utf-8') == 'ar baz'
+                    assert file1.getfile(prefetch=True).read().decode('utf-8') == 'foo bar baz'
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_blob_cache_eviction(self):
+        fileobj = ContentFile('foo bar baz'.encode('utf-8'))
+        file1 = File.objects.create(
+            name='baz.js',
+            type='default',
+            size=11,
+        )
+        results = file1.putfile(fileobj, 4)
+        blobs = [r.blob for r in results]
+
+        cache_dir = tempfile.mkdtemp()
+        try:
+            with patch('sentry.models.file.BLOB_CACHE_DIR', cache_dir), \
+                    patch('sentry.models.file.BLOB_CACHE_MAX_SIZE', 8):
+                with file1.getfile() as fp:
+                    assert fp.read().decode('utf-8') == 'foo bar baz'
+
+                # Every store past a tenth of the limit prunes, so only the
+                # most recently used blobs fit into the cache.
+                assert sorted(os.listdir(cache_dir)) == sorted(
+                    b.checksum for b in blobs[1:]
+                )
+
+                now = time.time()
+                os.utime(os.path.join(cache_dir, blobs[1].checksum), (now - 60, now - 60))
+                os.utime(os.path.join(cache_dir, blobs[2].checksum), (now - 30, now - 30))
+                f = _open_cached_blob(blobs[1])
+                assert f.read() == b'bar '
+                f.close()
+
+                _prune_blob_cache(4)
+                assert os.listdir(cache_dir) == [blobs[1].checksum]
+        finally:
+            shutil.rmtree(cache_dir)
@@ -35,3 +35,18 @@ class ProjectOptionManagerTest(TestCase):
         ProjectOption.objects.create(project=self.project, key='foo', value='bar')
         result = ProjectOption.objects.get_value_bulk([self.project], 'foo')
         assert result == {self.project: 'bar'}
+
+    def test_get_all_values_bulk(self):
+        other = self.create_project()
+        ProjectOption.objects.create(project=self.project, key='foo', value='bar')
+
+        ProjectOption.objects.clear_local_cache()
+        result = ProjectOption.objects.get_all_values_bulk([self.project, other.id])
+        assert result == {self.project.id: {'foo': 'bar'}, other.id: {}}
+
+        # Both the local and the shared cache are filled.
+        with self.assertNumQueries(0):
+            assert ProjectOption.objects.get_value(other, 'foo') is None
+            ProjectOption.objects.clear_local_cache()
+            assert ProjectOption.objects.get_all_values_bulk([self.project]) == \
+                {self.project.id: {'foo': 'bar'}}
@@ -1,5 +1,12 @@
 from __future__ import absolute_import
 
+import six
+import threading
+
+from collections import OrderedDict
+from django.utils import timezone
+from mock import patch
+
 from sentry.testutils import TestCase
 from sentry.api.fields.actor import Actor
 from sentry.models import ProjectOwnership, User, Team
@@ -81,9 +88,9 @@ class ProjectOwnershipTestCase(TestCase):
         ) == (ProjectOwnership.Everyone, None)
 
         # When fallthrough = False, we don't implicitly assign to Everyone
-        ProjectOwnership.objects.filter(
-            project_id=self.project.id,
-        ).update(fallthrough=False)
+        ownership = ProjectOwnership.objects.get(project_id=self.project.id)
+        ownership.fallthrough = False
+        ownership.save()
 
         assert ProjectOwnership.get_owners(
             self.project.id, {
@@ -95,6 +102,93 @@ class ProjectOwnershipTestCase(TestCase):
             }
         ) == ([], None)
 
+    def test_get_owners_cache_invalidation(self):
+        rule_a = Rule(
+            Matcher('path', '*.py'), [
+                Owner('team', self.team.slug),
+            ])
+        data = {
+            'stacktrace': {
+                'frames': [{
+                    'filename': 'foo.py',
+                }]
+            }
+        }
+
+        # Prime the cache with a project without ownership
+        assert ProjectOwnership.get_owners(self.project.id, data) == (ProjectOwnership.Everyone, None)
+
+        ownership = ProjectOwnership.objects.create(
+            project_id=self.project.id,
+            schema=dump_schema([rule_a]),
+            fallthrough=True,
+        )
+        self.assert_ownership_equals(
+            ProjectOwnership.get_owners(self.project.id, data),
+            ([Actor(self.team.id, Team)], [rule_a]),
+        )
+
+        # Removing the team from the project drops it as an owner
+        self.project.remove_team(self.team)
+        assert ProjectOwnership.get_owners(self.project.id, data) == ([], [rule_a])
+
+        ownership.delete()
+        assert ProjectOwnership.get_owners(self.project.id, data) == (ProjectOwnership.Everyone, None)
+
+    def test_get_owners_user_cache_invalidation(self):
+        rule = Rule(
+            Matcher('path', '*.py'), [
+                Owner('user', self.user.email),
+            ])
+        ProjectOwnership.objects.create(
+            project_id=self.project.id,
+            schema=dump_schema([rule]),
+            fallthrough=True,
+        )
+        data = {
+            'stacktrace': {
+                'frames': [{
+                    'filename': 'foo.py',
+                }]
+            }
+        }
+        self.assert_ownership_equals(
+            ProjectOwnership.get_owners(self.project.id, data),
+            ([Actor(self.user.id, User)], [rule]),
+        )
+
+        # Unrelated changes keep the cached actors
+        with patch('sentry.receivers.ownership.invalidate_actors_cache') as invalidate:
+            self.user.update(last_active=timezone.now())
+            self.user.name = 'Someone else'
+            self.user.save()
+        assert not invalidate.called
+
+        self.user.is_active = False
+        self.user.save()
+        assert ProjectOwnership.get_owners(self.project.id, data) == ([], [rule])
+
+    def test_get_rule_index_concurrently(self):
+        errors = []
+
+        def worker(n):
+            try:
+                for i in range(200):
+                    ProjectOwnership.get_rule_index(n, None, six.text_type(i % 10))
+            except Exception as e:
+                errors.append(e)
+
+        with patch('sentry.models.projectownership.MAX_LOCAL_INDEXES', 5), \
+                patch('sentry.models.projectownership._local_indexes', OrderedDict()) as indexes:
+            threads = [threading.Thread(target=worker, args=(n, )) for n in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            assert not errors
+            assert len(indexes) <= 5
+
 
 class ResolveActorsTestCase(TestCase):
     def test_no_actors(self):
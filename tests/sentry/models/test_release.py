@@ -3,14 +3,17 @@ from __future__ import absolute_import
 import pytest
 import six
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from mock import patch
 
 from sentry.api.exceptions import InvalidRepository
 from sentry.models import (
-    Commit, CommitAuthor, Environment, Group, GroupRelease, GroupResolution, GroupLink, GroupStatus,
-    ExternalIssue, Integration, OrganizationIntegration, Release, ReleaseCommit, ReleaseEnvironment,
-    ReleaseHeadCommit, ReleaseProject, ReleaseProjectEnvironment, Repository
+    Commit, CommitAuthor, CommitFileChange, Environment, Group, GroupRelease, GroupResolution,
+    GroupLink, GroupStatus, ExternalIssue, Integration, OrganizationIntegration, Release,
+    ReleaseCommit, ReleaseEnvironment, ReleaseHeadCommit, ReleaseProject,
+    ReleaseProjectEnvironment, Repository
 )
 
 from sentry.testutils import TestCase, SetRefsTestCase
@@ -396,6 +399,126 @@ class SetCommitsTestCase(TestCase):
         assert release.authors == [six.text_type(author.id)]
         assert release.last_commit_id == latest_commit.id
 
+    def test_file_changes_and_duplicates(self):
+        org = self.create_organization()
+        project = self.create_project(organization=org, name='foo')
+        repo = Repository.objects.create(
+            organization_id=org.id,
+            name='test/repo',
+        )
+        existing = Commit.objects.create(
+            organization_id=org.id,
+            repository_id=repo.id,
+            key='a' * 40,
+            message='old message',
+        )
+        CommitFileChange.objects.create(
+            organization_id=org.id,
+            commit=existing,
+            filename='foo.py',
+            type='M',
+        )
+
+        release = Release.objects.create(version='abcdabc', organization=org)
+        release.add_project(project)
+        release.set_commits([
+            {
+                'id': 'a' * 40,
+                'repository': repo.name,
+                'message': 'new message',
+                'author_name': 'Foo Bar',
+                'patch_set': [
+                    {'path': 'foo.py', 'type': 'M'},
+                    {'path': 'bar.py', 'type': 'A'},
+                    {'path': 'bar.py', 'type': 'A'},
+                ],
+            }, {
+                'id': 'b' * 40,
+                'repository': repo.name,
+                'author_email': 'foo@example.com',
+                'author_name': 'Foo',
+                'patch_set': [{'path': 'baz.py', 'type': 'D'}],
+            }, {
+                'id': 'a' * 40,
+                'repository': repo.name,
+            },
+        ])
+
+        commit = Commit.objects.get(id=existing.id)
+        assert commit.message == 'new message'
+        assert commit.author.email == 'foobar@localhost'
+        assert commit.author.name == 'Foo Bar'
+        commit2 = Commit.objects.get(repository_id=repo.id, key='b' * 40)
+        assert commit2.author.email == 'foo@example.com'
+
+        assert sorted(CommitFileChange.objects.filter(
+            commit_id=commit.id,
+        ).values_list('filename', 'type')) == [('bar.py', 'A'), ('foo.py', 'M')]
+        assert list(CommitFileChange.objects.filter(
+            commit_id=commit2.id,
+        ).values_list('filename', 'type')) == [('baz.py', 'D')]
+
+        assert list(ReleaseCommit.objects.filter(
+            release=release,
+        ).order_by('order').values_list('commit_id', 'order')) == [
+            (commit.id, 0), (commit2.id, 1),
+        ]
+        release = Release.objects.get(id=release.id)
+        assert release.commit_count == 3
+        assert sorted(release.authors) == sorted([
+            six.text_type(commit.author_id), six.text_type(commit2.author_id),
+        ])
+
+    def test_query_count_does_not_depend_on_commits(self):
+        org = self.create_organization()
+        project = self.create_project(organization=org, name='foo')
+        for i in range(2):
+            Repository.objects.create(
+                organization_id=org.id,
+                name='test/repo-%d' % i,
+            )
+
+        def set_commits(version, count):
+            release = Release.objects.create(version=version, organization=org)
+            release.add_project(project)
+            commits = [{
+                'id': '%s%d' % (version, i),
+                'repository': 'test/repo-%d' % (i % 2),
+                'author_email': 'author%d@example.com' % i,
+                'message': 'commit %d' % i,
+                'patch_set': [
+                    {'path': 'file%d.py' % j, 'type': 'M'} for j in range(3)
+                ],
+            } for i in range(count)]
+            with CaptureQueriesContext(connection) as queries:
+                release.set_commits(commits)
+            return len(queries)
+
+        assert set_commits('a', 5) == set_commits('b', 25)
+        assert ReleaseCommit.objects.filter(release__version='b').count() == 25
+        assert CommitFileChange.objects.filter(commit__key__startswith='b').count() == 75
+
+    def test_new_commit_resolves_group(self):
+        org = self.create_organization()
+        project = self.create_project(organization=org, name='foo')
+        group = self.create_group(project=project)
+
+        release = self.create_release(project=project, version='abcdabc')
+        release.set_commits([{
+            'id': 'a' * 40,
+            'repository': 'test/repo',
+            'message': 'fixes %s' % (group.qualified_short_id),
+        }])
+
+        commit = Commit.objects.get(key='a' * 40)
+        assert GroupLink.objects.filter(
+            group_id=group.id,
+            linked_type=GroupLink.LinkedType.commit,
+            linked_id=commit.id).exists()
+        resolution = GroupResolution.objects.get(group=group)
+        assert resolution.release == release
+        assert Group.objects.get(id=group.id).status == GroupStatus.RESOLVED
+
     def test_resolution_support_full_featured(self):
         org = self.create_organization(owner=self.user)
         project = self.create_project(organization=org, name='foo')
@@ -0,0 +1,67 @@
+from __future__ import absolute_import
+
+import abc
+
+
+class NodeStorageBackendTestMixin(object):
+    """
+    Behavior shared by all node storage backends. Test cases provide the
+    backend under test as ``ns``.
+    """
+    __meta__ = abc.ABCMeta
+
+    @abc.abstractproperty
+    def ns(self):
+        pass
+
+    def test_get_and_set(self):
+        node_id = self.ns.create({'foo': 'bar'})
+        assert self.ns.get(node_id) == {'foo': 'bar'}
+
+        self.ns.set(node_id, {'foo': 'baz'})
+        assert self.ns.get(node_id) == {'foo': 'baz'}
+
+        assert self.ns.get('missing') is None
+
+    def test_get_multi(self):
+        self.ns.set('node1', {'foo': 'bar'})
+        self.ns.set('node2', {'foo': 'baz'})
+
+        assert self.ns.get_multi(['node1', 'node2', 'missing']) == {
+            'node1': {'foo': 'bar'},
+            'node2': {'foo': 'baz'},
+            'missing': None,
+        }
+        assert self.ns.get_multi(['node1']) == {'node1': {'foo': 'bar'}}
+        assert self.ns.get_multi([]) == {}
+
+    def test_set_multi(self):
+        self.ns.set('node1', {'foo': 'bar'})
+
+        self.ns.set_multi({
+            'node1': {'foo': 'biz'},
+            'node2': {'foo': 'bir'},
+        })
+
+        assert self.ns.get_multi(['node1', 'node2']) == {
+            'node1': {'foo': 'biz'},
+            'node2': {'foo': 'bir'},
+        }
+
+        self.ns.set_multi({})
+
+    def test_delete_multi(self):
+        self.ns.set_multi({
+            'node1': {'foo': 'bar'},
+            'node2': {'foo': 'baz'},
+            'node3': {'foo': 'biz'},
+        })
+
+        self.ns.delete('node1')
+        self.ns.delete_multi(['node2', 'missing'])
+
+        assert self.ns.get_multi(['node1', 'node2', 'node3']) == {
+            'node1': None,
+            'node2': None,
+            'node3': {'foo': 'biz'},
+        }
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+
+from collections import namedtuple
+
+import pytest
+
+from sentry.testutils import TestCase
+
+from tests.sentry.nodestore.base import NodeStorageBackendTestMixin
+
+pytest.importorskip('google.cloud.bigtable')
+
+from sentry.nodestore.bigtable.backend import BigtableNodeStorage  # NOQA
+
+
+Cell = namedtuple('Cell', 'value timestamp')
+
+
+class InMemoryRow(object):
+    def __init__(self, table, row_key):
+        self.table = table
+        self.row_key = row_key
+        self.cells = None
+
+    def delete(self):
+        self.cells = {}
+
+    def set_cell(self, column_family, column, value, timestamp=None):
+        self.cells.setdefault(column_family, {})[column] = [Cell(value, timestamp)]
+
+
+class InMemoryTable(object):
+    """
+    Mimics the subset of ``google.cloud.bigtable.table.Table`` used by the
+    backend, and counts the requests made against it.
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.requests = 0
+
+    def row(self, row_key):
+        return InMemoryRow(self, row_key)
+
+    def read_row(self, row_key):
+        self.requests += 1
+        return self.rows.get(row_key)
+
+    def read_rows(self, row_set):
+        self.requests += 1
+        for row_key in row_set.row_keys:
+            if row_key in self.rows:
+                yield self.rows[row_key]
+
+    def mutate_rows(self, rows):
+        self.requests += 1
+        for row in rows:
+            if row.cells:
+                self.rows[row.row_key] = row
+            else:
+                self.rows.pop(row.row_key, None)
+
+
+class BigtableNodeStorageStandInTest(NodeStorageBackendTestMixin, TestCase):
+    def setUp(self):
+        self.ns = BigtableNodeStorage(project='test')
+        self.ns.connection = InMemoryTable()
+
+    def test_multi_requests(self):
+        self.ns.set_multi({
+            'node%d' % i: {'foo': i} for i in range(10)
+        })
+        assert self.ns.connection.requests == 1
+
+        result = self.ns.get_multi(['node%d' % i for i in range(10)])
+        assert result == {'node%d' % i: {'foo': i} for i in range(10)}
+        assert self.ns.connection.requests == 2
+
+    def test_compression(self):
+        self.ns.compression = True
+        self.ns.set_multi({'node1': {'foo': 'bar'}, 'node2': {'foo': 'baz'}})
+        assert self.ns.get_multi(['node1', 'node2']) == {
+            'node1': {'foo': 'bar'},
+            'node2': {'foo': 'baz'},
+        }
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import mock
+import pytest
+
+from datetime import datetime
+
+from sentry.exceptions import InvalidConfiguration
+from sentry.nodestore.cache.backend import CachedNodeStorage, LocalCache
+from sentry.nodestore.django.backend import DjangoNodeStorage
+from sentry.testutils import TestCase
+
+from tests.sentry.nodestore.base import NodeStorageBackendTestMixin
+
+
+class CachedNodeStorageTest(NodeStorageBackendTestMixin, TestCase):
+    def setUp(self):
+        self.ns = CachedNodeStorage(
+            backend='sentry.nodestore.django.backend.DjangoNodeStorage',
+            max_size=100,
+        )
+        self.ns.cache.clear()
+
+    def test_cached_reads(self):
+        self.ns.set('node1', {'foo': 'bar'})
+        assert self.ns.get('node1') == {'foo': 'bar'}
+
+        with mock.patch.object(DjangoNodeStorage, 'get_multi') as get_multi:
+            assert self.ns.get('node1') == {'foo': 'bar'}
+            assert self.ns.get_multi(['node1']) == {'node1': {'foo': 'bar'}}
+            assert not get_multi.called
+
+            # served from the shared cache if the local one is empty
+            self.ns.local_cache.delete('node1')
+            assert self.ns.get('node1') == {'foo': 'bar'}
+            assert not get_multi.called
+
+    def test_cached_reads_match_backend(self):
+        data = {'tags': (('foo', 'bar'), ), 'timestamp': datetime(2019, 1, 1)}
+        self.ns.set('node1', data)
+        assert self.ns.get('node1') == data
+
+        with mock.patch.object(DjangoNodeStorage, 'get_multi') as get_multi:
+            assert self.ns.get('node1') == data
+            self.ns.local_cache.delete('node1')
+            assert self.ns.get('node1') == data
+            assert not get_multi.called
+
+    def test_delegates_to_backend(self):
+        with mock.patch.object(DjangoNodeStorage, 'validate',
+                               side_effect=InvalidConfiguration) as validate:
+            with pytest.raises(InvalidConfiguration):
+                self.ns.validate()
+        validate.assert_called_once_with()
+
+        # Backends without bootstrap are fine.
+        self.ns.bootstrap()
+        self.ns.backend.bootstrap = mock.Mock()
+        self.ns.bootstrap()
+        self.ns.backend.bootstrap.assert_called_once_with()
+
+    def test_invalidation(self):
+        self.ns.set('node1', {'foo': 'bar'})
+        assert self.ns.get('node1') == {'foo': 'bar'}
+
+        self.ns.set('node1', {'foo': 'baz'})
+        assert self.ns.get('node1') == {'foo': 'baz'}
+
+        self.ns.delete('node1')
+        assert self.ns.get('node1') is None
+
+    def test_large_values_are_not_cached(self):
+        self.ns.set('node1', {'foo': 'x' * 1000})
+        assert self.ns.get('node1') == {'foo': 'x' * 1000}
+        assert self.ns.local_cache.get('node1') is None
+        assert self.ns.cache.get(self.ns._get_cache_key('node1')) is None
+
+    def test_returned_data_is_not_shared(self):
+        self.ns.set('node1', {'foo': 'bar'})
+        self.ns.get('node1')['foo'] = 'baz'
+        assert self.ns.get('node1') == {'foo': 'bar'}
+
+
+class LocalCacheTest(TestCase):
+    def test_eviction(self):
+        cache = LocalCache(max_size=10, ttl=60)
+        cache.set('a', '12345')
+        cache.set('b', '12345')
+        assert cache.get('a') == '12345'
+
+        # "b" is the least recently used item now
+        cache.set('c', '123')
+        assert cache.get('b') is None
+        assert cache.get('a') == '12345'
+        assert cache.get('c') == '123'
+        assert cache.size == 8
+
+        cache.set('d', '12345678901')
+        assert cache.get('d') is None
+
+    def test_expiry(self):
+        cache = LocalCache(max_size=10, ttl=60)
+        with mock.patch('sentry.nodestore.cache.backend.time', return_value=0):
+            cache.set('a', '12345')
+        with mock.patch('sentry.nodestore.cache.backend.time', return_value=61):
+            assert cache.get('a') is None
+        assert cache.size == 0
@@ -5,6 +5,8 @@ from __future__ import absolute_import
 from sentry.nodestore.cassandra.backend import CassandraNodeStorage
 from sentry.testutils import TestCase, requires_cassandra
 
+from tests.sentry.nodestore.base import NodeStorageBackendTestMixin
+
 
 @requires_cassandra
 class CassandraNodeStorageTest(TestCase):
@@ -39,3 +41,37 @@ class CassandraNodeStorageTest(TestCase):
         assert result[node_id2] == {
             'foo': 'bar',
         }
+
+
+class InMemoryCasscacheClient(object):
+    """
+    Mimics the subset of ``casscache.Client`` used by the backend.
+    """
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def get_multi(self, keys):
+        return {key: self.data[key] for key in keys if key in self.data}
+
+    def set(self, key, val, time=0):
+        self.data[key] = val
+
+    def set_multi(self, mapping, time=0):
+        self.data.update(mapping)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def delete_multi(self, keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+class CassandraNodeStorageStandInTest(NodeStorageBackendTestMixin, TestCase):
+    def setUp(self):
+        self.ns = CassandraNodeStorage(servers=['127.0.0.1:9042'])
+        self.ns.connection = InMemoryCasscacheClient()
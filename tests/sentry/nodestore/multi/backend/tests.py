@@ -2,10 +2,15 @@
 
 from __future__ import absolute_import
 
+import mock
+import pytest
+
 from sentry.nodestore.base import NodeStorage
 from sentry.nodestore.multi.backend import MultiNodeStorage
 from sentry.testutils import TestCase
 
+from tests.sentry.nodestore.base import NodeStorageBackendTestMixin
+
 
 class InMemoryBackend(NodeStorage):
     def __init__(self):
@@ -17,6 +22,22 @@ class InMemoryBackend(NodeStorage):
     def get(self, id):
         return self._data.get(id)
 
+    def delete(self, id):
+        self._data.pop(id, None)
+
+
+class FailingBackend(InMemoryBackend):
+    def set_multi(self, values):
+        raise ValueError('failed')
+
+
+class MultiNodeStorageBackendTest(NodeStorageBackendTestMixin, TestCase):
+    def setUp(self):
+        self.ns = MultiNodeStorage([
+            (InMemoryBackend, {}),
+            (InMemoryBackend, {}),
+        ])
+
 
 class MultiNodeStorageTest(TestCase):
     def setUp(self):
@@ -80,3 +101,25 @@ class MultiNodeStorageTest(TestCase):
             assert backend.get(node_id2) == {
                 'foo': 'bir',
             }
+
+    def test_set_multi_partial_failure(self):
+        ns = MultiNodeStorage([
+            (FailingBackend, {}),
+            (InMemoryBackend, {}),
+        ], read_selector=lambda backends: backends[1])
+
+        with pytest.raises(ValueError):
+            ns.set_multi({'node1': {'foo': 'bar'}})
+
+        # The healthy backend is still written to.
+        assert ns.get('node1') == {'foo': 'bar'}
+
+    def test_set_multi_mocked_backends(self):
+        ns = MultiNodeStorage([
+            (mock.Mock, {}),
+            (mock.Mock, {}),
+        ], write_concurrency=2)
+
+        ns.set_multi({'node1': {'foo': 'bar'}})
+        for backend in ns.backends:
+            backend.set_multi.assert_called_once_with({'node1': {'foo': 'bar'}})
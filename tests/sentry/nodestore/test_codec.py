@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+
+from base64 import b64encode
+from datetime import datetime
+
+import pytest
+
+from sentry.nodestore.codec import (
+    HEADER, MAGIC, VERSION, CodecError, NodeCodec, get_codec, get_dictionary_id, is_encoded
+)
+from sentry.nodestore.django.backend import DjangoNodeStorage
+from sentry.nodestore.django.models import Node
+from sentry.testutils import TestCase
+from sentry.utils.compat import pickle
+from sentry.utils.strings import compress
+
+
+DATA = {
+    'message': u'h\xe9llo',
+    'tags': [['foo', 'bar']],
+    'extra': {'count': 1, 'ratio': 0.5, 'missing': None},
+}
+
+
+@pytest.mark.parametrize('serializer', ['pickle', 'msgpack', 'json'])
+@pytest.mark.parametrize('compression', ['none', 'zlib'])
+def test_roundtrip(serializer, compression):
+    codec = NodeCodec(serializer=serializer, compression=compression)
+    value = codec.encode(DATA)
+    assert is_encoded(value)
+    assert codec.decode(value) == DATA
+
+
+def test_decode_with_other_configuration():
+    value = NodeCodec(serializer='json', compression='zlib').encode(DATA)
+    assert NodeCodec(serializer='msgpack', compression='none').decode(value) == DATA
+
+
+def test_fallback_to_pickle():
+    codec = NodeCodec(serializer='msgpack')
+    data = {'timestamp': datetime(2019, 1, 1)}
+    assert codec.decode(codec.encode(data)) == data
+
+
+@pytest.mark.parametrize('serializer', ['msgpack', 'json'])
+def test_tuples_decode_as_lists(serializer):
+    codec = NodeCodec(serializer=serializer)
+    assert codec.decode(codec.encode({'tags': (('foo', 'bar'), )})) == {
+        'tags': [['foo', 'bar']],
+    }
+
+
+def test_decode_legacy():
+    assert not is_encoded(b'{"foo": "bar"}')
+    with pytest.raises(CodecError):
+        NodeCodec().decode(b'{"foo": "bar"}')
+
+
+def test_zstd_dictionaries():
+    zstandard = pytest.importorskip('zstandard')
+
+    samples = [
+        NodeCodec(serializer='msgpack', compression='none').encode(dict(DATA, id=i))
+        for i in range(1000)
+    ]
+    dictionary = zstandard.train_dictionary(1024, samples).as_bytes()
+    dictionaries = {
+        'global': (get_dictionary_id(b'global'), b'global'),
+        '1': (get_dictionary_id(dictionary), dictionary),
+    }
+
+    codec = NodeCodec(serializer='msgpack', compression='zstd', dictionaries=dictionaries)
+    assert codec.get_dictionary_id(1) == get_dictionary_id(dictionary)
+    assert codec.get_dictionary_id(2) == get_dictionary_id(b'global')
+
+    value = codec.encode(DATA, project_id=1)
+    assert codec.decode(value) == DATA
+
+    with pytest.raises(CodecError):
+        NodeCodec(serializer='msgpack', compression='zstd').decode(value)
+
+
+class DjangoNodeCodecTest(TestCase):
+    def setUp(self):
+        self.ns = DjangoNodeStorage()
+
+    def test_codec_write(self):
+        with self.settings(SENTRY_NODESTORE_CODEC={'serializer': 'msgpack'}):
+            assert get_codec() is not None
+            self.ns.set('node1', DATA)
+            assert self.ns.get('node1') == DATA
+
+        # still readable after the codec was turned off
+        assert get_codec() is None
+        assert self.ns.get('node1') == DATA
+
+    def test_legacy_read(self):
+        # written without a codec, i.e. in the pickle+zlib format
+        assert Node._meta.get_field('data').get_prep_value(DATA) == compress(pickle.dumps(DATA))
+        Node.objects.create(id='node1', data=DATA)
+
+        with self.settings(SENTRY_NODESTORE_CODEC={'serializer': 'msgpack'}):
+            assert self.ns.get('node1') == DATA
+
+    def test_corrupt_read(self):
+        corrupt = HEADER.pack(MAGIC, VERSION, 2, 1, 0) + b'not zlib'
+        with pytest.raises(CodecError):
+            Node._meta.get_field('data').to_python(b64encode(corrupt).decode('utf-8'))
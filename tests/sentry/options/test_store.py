@@ -152,3 +152,94 @@ class OptionsStoreTest(TestCase):
         mocked_time.return_value = 26
         store.clean_local_cache()
         assert not store._local_cache
+
+
+class OptionsStoreSnapshotTest(TestCase):
+    @fixture
+    def store(self):
+        c = LocMemCache('test', {})
+        c.clear()
+        return OptionsStore(cache=c, snapshot=True)
+
+    @before
+    def flush_local_cache(self):
+        self.store.flush_local_cache()
+
+    def make_key(self, ttl=10, grace=10):
+        return self.store.make_key(uuid1().hex, '', object, 0, ttl, grace)
+
+    def test_simple(self):
+        store = self.store
+        key1, key2 = self.make_key(), self.make_key()
+
+        assert store.get(key1) is None
+        assert store.set(key1, 'foo')
+        assert store.set(key2, 'bar')
+        assert store.get(key1) == 'foo'
+        assert store.get(key2) == 'bar'
+        assert store.delete(key1)
+        assert store.get(key1) is None
+        assert store.get(key2) == 'bar'
+
+    @patch('sentry.options.store.time')
+    def test_single_query(self, mocked_time):
+        store = self.store
+        key1, key2 = self.make_key(), self.make_key()
+
+        mocked_time.return_value = 0
+        store.set(key1, 'foo')
+        store.set(key2, 'bar')
+
+        with self.assertNumQueries(1):
+            assert store.get(key1) == 'foo'
+            assert store.get(key2) == 'bar'
+
+        # Another store gets the snapshot from the cache.
+        other = OptionsStore(cache=store.cache, snapshot=True)
+        with self.assertNumQueries(0):
+            assert other.get(key1) == 'foo'
+            assert other.get(key2) == 'bar'
+
+    @patch('sentry.options.store.time')
+    def test_version_check(self, mocked_time):
+        store = self.store
+        key = self.make_key(10, 0)
+        other = OptionsStore(cache=store.cache, snapshot=True)
+
+        mocked_time.return_value = 0
+        store.set(key, 'foo')
+        assert other.get(key) == 'foo'
+
+        store.set(key, 'bar')
+
+        # Still within TTL, so the version isn't checked.
+        with patch.object(other.cache, 'get', side_effect=Exception()):
+            assert other.get(key) == 'foo'
+
+        # The version changed, so the snapshot is reloaded.
+        mocked_time.return_value = 15
+        assert other.get(key) == 'bar'
+
+        # An unchanged version only costs a single cache lookup.
+        mocked_time.return_value = 30
+        with patch.object(other.cache, 'get', wraps=other.cache.get) as mocked_get:
+            with self.assertNumQueries(0):
+                assert other.get(key) == 'bar'
+            assert mocked_get.call_count == 1
+
+    @patch('sentry.options.store.time')
+    def test_key_with_grace(self, mocked_time):
+        store, key = self.store, self.make_key(10, 10)
+
+        mocked_time.return_value = 0
+        store.set(key, 'bar')
+        assert store.get(key) == 'bar'
+
+        with patch.object(Option.objects, 'get_queryset', side_effect=Exception()):
+            with patch.object(store.cache, 'get', side_effect=Exception()):
+                # Serves the value beyond TTL
+                mocked_time.return_value = 15
+                assert store.get(key) == 'bar'
+
+                mocked_time.return_value = 21
+                assert store.get(key) is None
@@ -2,7 +2,7 @@ from __future__ import absolute_import
 
 from sentry.ownership.grammar import (
     Rule, Matcher, Owner,
-    parse_rules, dump_schema, load_schema,
+    parse_rules, dump_schema, load_schema, compile_rules,
 )
 
 fixture_data = """
@@ -117,3 +117,37 @@ def test_matcher_test_stacktrace():
     assert not Matcher('path', '*.jsx').test(data)
     assert not Matcher('url', '*.py').test(data)
     assert not Matcher('path', '*.py').test({})
+
+
+def test_compile_rules_matches_like_test():
+    rules = [
+        Rule(Matcher('path', '*.py'), [Owner('team', 'backend')]),
+        Rule(Matcher('url', 'http://*.com/*'), [Owner('team', 'frontend')]),
+        Rule(Matcher('path', 'foo/*.py'), [Owner('user', 'foo@example.com')]),
+        Rule(Matcher('path', '*.js'), [Owner('team', 'frontend')]),
+        Rule(Matcher('path', '/usr/local/src/*/app.py'), [Owner('team', 'ops')]),
+    ]
+    index = compile_rules(rules)
+
+    data = {
+        'request': {
+            'url': 'http://example.com/foo.js',
+        },
+        'exception': {
+            'values': [{
+                'stacktrace': {
+                    'frames': [
+                        {'filename': 'foo/file.py'},
+                        {'filename': 'foo/file.py'},
+                        {'abs_path': '/usr/local/src/other/app.py'},
+                    ],
+                },
+            }],
+        },
+    }
+
+    for payload in (data, {}, {'stacktrace': {'frames': [{'filename': 'a.js'}]}}):
+        assert index.match(payload) == [rule for rule in rules if rule.test(payload)]
+
+    assert index.match(data) == [rules[0], rules[1], rules[2], rules[4]]
+    assert compile_rules([]).match(data) == []
@@ -2,6 +2,8 @@
 
 from __future__ import absolute_import
 
+import mock
+
 from sentry.ratelimits.redis import RedisRateLimiter
 from sentry.testutils import TestCase
 
@@ -17,3 +19,58 @@ class RedisRateLimiterTest(TestCase):
     def test_simple_key(self):
         assert not self.backend.is_limited('foo', 1)
         assert self.backend.is_limited('foo', 1)
+
+    def test_multi(self):
+        assert self.backend.is_limited_multi([('foo', 1), ('bar', 2)]) == [False, False]
+        assert self.backend.is_limited_multi([('foo', 1), ('bar', 2)]) == [True, False]
+        assert self.backend.is_limited_multi([('bar', 2), ('baz', 1)]) == [True, False]
+
+
+class LeasedRedisRateLimiterTest(TestCase):
+    def test_never_exceeds_limit(self):
+        # Several processes share the budget of a window.
+        backends = [RedisRateLimiter(lease_ratio=0.1) for _ in range(3)]
+
+        allowed = 0
+        for i in range(300):
+            if not backends[i % 3].is_limited('foo', 100):
+                allowed += 1
+
+        # At most two slices of ten requests minus the used request are
+        # lost to the other processes.
+        assert 100 - 2 * 9 <= allowed <= 100
+
+    def test_serves_from_lease(self):
+        backend = RedisRateLimiter(lease_ratio=0.1)
+
+        with mock.patch.object(backend.cluster, 'map', wraps=backend.cluster.map) as mock_map:
+            for _ in range(100):
+                assert not backend.is_limited('foo', 100)
+            assert mock_map.call_count == 10
+
+            # The exhausted budget is remembered until the window ends.
+            assert backend.is_limited('foo', 100)
+            assert backend.is_limited('foo', 100)
+            assert mock_map.call_count == 11
+
+    def test_low_limits_are_exact(self):
+        backend = RedisRateLimiter(lease_ratio=0.1)
+        other = RedisRateLimiter(lease_ratio=0.1)
+
+        assert not backend.is_limited('foo', 2)
+        assert not other.is_limited('foo', 2)
+        assert backend.is_limited('foo', 2)
+        assert other.is_limited('foo', 2)
+
+    def test_window_end(self):
+        backend = RedisRateLimiter(lease_ratio=0.5)
+
+        with mock.patch('sentry.ratelimits.redis.time', return_value=0):
+            assert not backend.is_limited('foo', 4)
+            assert not backend.is_limited('foo', 4)
+            assert not backend.is_limited('foo', 4)
+            assert not backend.is_limited('foo', 4)
+            assert backend.is_limited('foo', 4)
+
+        with mock.patch('sentry.ratelimits.redis.time', return_value=60):
+            assert not backend.is_limited('foo', 4)
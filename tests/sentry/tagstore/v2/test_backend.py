@@ -746,3 +746,40 @@ class TagStorage(TestCase):
                 self.proj1group1event1.id], self.proj1group2.id)
 
         assert models.EventTag.objects.filter(group_id=self.proj1group2.id).count() == 3
+
+    def test_incr_tag_values_times_seen_bulk(self):
+        now = timezone.now()
+        tags = [('k1', 'v1'), ('k2', 'v2', {'foo': 'bar'})]
+
+        for _ in range(2):
+            self.ts.incr_tag_values_times_seen_bulk(
+                self.proj1.id, self.proj1group1.id, self.proj1env1.id, tags, now)
+
+        for env_id in (self.proj1env1.id, 0):
+            for key, value in (('k1', 'v1'), ('k2', 'v2')):
+                tk = models.TagKey.objects.get(
+                    project_id=self.proj1.id,
+                    environment_id=env_id,
+                    key=key,
+                )
+
+                tv = models.TagValue.objects.get(
+                    project_id=self.proj1.id,
+                    _key_id=tk.id,
+                    value=value,
+                )
+                assert tv.times_seen == 2
+
+                gtv = models.GroupTagValue.objects.get(
+                    project_id=self.proj1.id,
+                    group_id=self.proj1group1.id,
+                    _key_id=tk.id,
+                    _value_id=tv.id,
+                )
+                assert gtv.times_seen == 2
+
+        assert models.TagValue.objects.get(
+            project_id=self.proj1.id,
+            _key__environment_id=self.proj1env1.id,
+            value='v2',
+        ).data == {'foo': 'bar'}
@@ -10,7 +10,7 @@ from six.moves import xrange
 
 from sentry.testutils import TestCase
 from sentry.tasks.assemble import assemble_dif, assemble_file
-from sentry.models import FileBlob, FileBlobOwner
+from sentry.models import File, FileBlob, FileBlobIndex, FileBlobOwner
 from sentry.models.file import ChunkFileState
 from sentry.models.debugfile import get_assemble_status, ProjectDebugFile
 
@@ -115,3 +115,32 @@ class AssembleTest(TestCase):
             self.project, 'testfile', file_checksum.hexdigest(),
             [x[1] for x in files], 'dummy.type')[0]
         assert f.checksum == file_checksum.hexdigest()
+
+    def test_assemble_duplicate_chunks(self):
+        content1 = 'foo'.encode('utf-8')
+        content2 = 'bar'.encode('utf-8')
+        blob1 = FileBlob.from_file(ContentFile(content1))
+        blob2 = FileBlob.from_file(ContentFile(content2))
+
+        total_checksum = sha1(content1 + content2 + content1).hexdigest()
+        rv = assemble_file(
+            self.project, 'testfile', total_checksum,
+            [blob1.checksum, blob2.checksum, blob1.checksum], 'dummy.type')
+
+        assert rv is not None
+        f, tmp = rv
+        assert f.checksum == total_checksum
+        assert f.size == 9
+        assert tmp.read() == content1 + content2 + content1
+        assert list(FileBlobIndex.objects.filter(file=f).order_by('offset').values_list(
+            'blob_id', 'offset')) == [(blob1.id, 0), (blob2.id, 3), (blob1.id, 6)]
+        assert f.getfile().read() == content1 + content2 + content1
+
+    def test_assemble_checksum_mismatch(self):
+        blob1 = FileBlob.from_file(ContentFile('foo'.encode('utf-8')))
+        checksum = sha1('bar'.encode('utf-8')).hexdigest()
+
+        assert assemble_file(
+            self.project, 'testfile', checksum, [blob1.checksum], 'dummy.type') is None
+        assert get_assemble_status(self.project, checksum)[0] == ChunkFileState.ERROR
+        assert not File.objects.filter(checksum=checksum).exists()
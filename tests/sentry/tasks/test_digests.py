@@ -0,0 +1,75 @@
+from __future__ import absolute_import
+
+import pytest
+
+from mock import patch
+
+from sentry import digests
+from sentry.digests.backends.base import InvalidState
+from sentry.digests.backends.redis import RedisBackend
+from sentry.digests.notifications import build_digest, event_to_record, unsplit_key
+from sentry.models import Rule
+from sentry.plugins import plugins
+from sentry.plugins.sentry_mail.models import MailPlugin
+from sentry.tasks.digests import deliver_digests
+from sentry.testutils import TestCase
+
+
+class DeliverDigestsTest(TestCase):
+    def setUp(self):
+        self.backend = RedisBackend()
+        self.plugin = plugins.get('mail')
+
+    def add_timeline(self):
+        project = self.create_project()
+        rule = Rule.objects.create(project=project, label='rule')
+        event = self.create_event(group=self.create_group(project=project))
+        key = unsplit_key(self.plugin, project)
+        self.backend.add(key, event_to_record(event, [rule]))
+        return key, project
+
+    def test_task_persistent_name(self):
+        assert deliver_digests.name == 'sentry.tasks.digests.deliver_digests'
+
+    def test_deliver_digests(self):
+        timelines = [self.add_timeline() for _ in range(3)]
+        keys = [key for key, _ in timelines]
+
+        with patch.object(digests.backend, '_wrapped', self.backend), \
+                patch.object(MailPlugin, 'notify_digest') as notify_digest:
+            # Timelines of projects that don't exist anymore are skipped.
+            deliver_digests(keys + [u'mail:p:0'])
+
+        assert sorted(call[0][0].id for call in notify_digest.call_args_list) == \
+            sorted(project.id for _, project in timelines)
+
+        # All delivered timelines were closed.
+        for key in keys:
+            with pytest.raises(InvalidState):
+                with self.backend.digest(key, 0):
+                    pass
+
+    def test_build_failure(self):
+        timelines = [self.add_timeline() for _ in range(2)]
+        keys = [key for key, _ in timelines]
+        failing_project = timelines[0][1]
+
+        def build(project, records, state=None):
+            if project.id == failing_project.id:
+                raise Exception('boom')
+            return build_digest(project, records, state=state)
+
+        with patch.object(digests.backend, '_wrapped', self.backend), \
+                patch.object(MailPlugin, 'notify_digest') as notify_digest, \
+                patch('sentry.tasks.digests.build_digest', side_effect=build):
+            deliver_digests(keys)
+
+        # The other digest is still delivered.
+        assert [call[0][0].id for call in notify_digest.call_args_list] == [timelines[1][1].id]
+
+        # The failed timeline keeps its records for a later delivery.
+        with self.backend.digest(keys[0], 0) as records:
+            assert len(records) == 1
+        with pytest.raises(InvalidState):
+            with self.backend.digest(keys[1], 0):
+                pass
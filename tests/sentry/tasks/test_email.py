@@ -1,8 +1,14 @@
 from __future__ import absolute_import
 
+import smtplib
+
+import mock
+from mock import patch
+
 from sentry.models import Activity
-from sentry.tasks.email import process_inbound_email
+from sentry.tasks.email import process_inbound_email, send_email_batch
 from sentry.testutils import TestCase
+from sentry.utils.email import MessageBuilder, close_reusable_connection
 
 
 class ProcessInboundEmailTest(TestCase):
@@ -38,3 +44,52 @@ class ProcessInboundEmailTest(TestCase):
             group=group,
             type=Activity.NOTE,
         ).exists()
+
+
+class SendEmailBatchTest(TestCase):
+    def setUp(self):
+        super(SendEmailBatchTest, self).setUp()
+        close_reusable_connection()
+        self.addCleanup(close_reusable_connection)
+        self.connection = mock.Mock()
+        self.connection.connection.noop.return_value = (250, 'OK')
+        patcher = patch('sentry.utils.email._get_connection', return_value=self.connection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.messages = [
+            MessageBuilder(subject='Test', body='hello world').build(
+                u'foo-{}@example.com'.format(i),
+            ) for i in range(4)
+        ]
+
+    def test_task_persistent_name(self):
+        assert send_email_batch.name == 'sentry.tasks.email.send_email_batch'
+
+    def test_message_error(self):
+        self.connection.send_messages.side_effect = [
+            1, smtplib.SMTPRecipientsRefused({}), 1, 1,
+        ]
+        with patch('sentry.tasks.email.send_email.delay') as delay:
+            send_email_batch(self.messages)
+
+        # The rejected message is skipped, the others are sent on the same
+        # connection.
+        assert self.connection.send_messages.call_args_list == [
+            mock.call([message]) for message in self.messages
+        ]
+        assert not self.connection.close.called
+        assert not delay.called
+        # The session is not checked before every message.
+        assert not self.connection.connection.noop.called
+
+    def test_connection_error(self):
+        self.connection.send_messages.side_effect = [1, IOError('disconnected')]
+        with patch('sentry.tasks.email.send_email.delay') as delay:
+            send_email_batch(self.messages)
+
+        # The connection is reset and the unsent messages are queued one by
+        # one.
+        assert self.connection.close.called
+        assert delay.call_args_list == [
+            mock.call(message=message) for message in self.messages[1:]
+        ]
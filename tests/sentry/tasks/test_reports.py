@@ -9,12 +9,13 @@ import pytz
 from django.core import mail
 
 from sentry.app import tsdb
-from sentry.models import Project, UserOption
+from sentry.models import Activity, GroupStatus, Project, UserOption
 from sentry.tasks.reports import (
     DISABLED_ORGANIZATIONS_USER_OPTION_KEY, Report, Skipped, change, clean_series, colorize,
     deliver_organization_user_report, get_calendar_range, get_percentile, has_valid_aggregates,
-    index_to_month, merge_mappings, merge_sequences, merge_series, month_to_index, prepare_reports,
-    safe_add, user_subscribed_to_organization_reports
+    index_to_month, merge_mappings, merge_sequences, merge_series, month_to_index,
+    prepare_project_report, prepare_project_reports, prepare_reports, safe_add,
+    user_subscribed_to_organization_reports
 )
 from sentry.testutils.cases import TestCase
 from sentry.utils.dates import to_datetime, to_timestamp
@@ -298,6 +299,55 @@ class ReportTestCase(TestCase):
             message = mail.outbox[0]
             assert self.organization.name in message.subject
 
+    def test_prepare_project_reports_matches_single_project_reports(self):
+        Project.objects.all().delete()
+
+        now = datetime(2016, 9, 12, tzinfo=pytz.utc)
+        interval = (now - timedelta(days=7), now)
+
+        projects = [
+            self.create_project(
+                organization=self.organization,
+                teams=[self.team],
+                date_added=now - timedelta(days=90),
+            ) for _ in xrange(2)
+        ]
+
+        resolved = self.create_group(
+            project=projects[0],
+            status=GroupStatus.RESOLVED,
+            first_seen=now - timedelta(days=3),
+            last_seen=now - timedelta(days=2),
+            resolved_at=now - timedelta(days=2),
+        )
+        reopened = self.create_group(
+            project=projects[1],
+            first_seen=now - timedelta(days=30),
+            last_seen=now - timedelta(days=2),
+            resolved_at=now - timedelta(days=10),
+        )
+        Activity.objects.create(
+            project=projects[1],
+            group=reopened,
+            type=Activity.SET_REGRESSION,
+            datetime=now - timedelta(days=2),
+        )
+
+        for group, days in ((resolved, 3), (reopened, 2)):
+            tsdb.incr(tsdb.models.group, group.id, now - timedelta(days=days), count=2)
+            tsdb.incr(tsdb.models.project, group.project_id, now - timedelta(days=days), count=3)
+
+        with mock.patch.object(tsdb, 'get_earliest_timestamp') as get_earliest_timestamp:
+            get_earliest_timestamp.return_value = to_timestamp(now - timedelta(days=60))
+
+            reports = prepare_project_reports(interval, projects)
+            assert reports == {
+                project.id: prepare_project_report(interval, project)
+                for project in projects
+            }
+
+        assert prepare_project_reports(interval, []) == {}
+
     def test_deliver_organization_user_report_respects_settings(self):
         user = self.user
         organization = self.organization
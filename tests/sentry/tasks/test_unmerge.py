@@ -23,7 +23,7 @@ from sentry.models import (
 from sentry.similarity import features, _make_index_backend
 from sentry.tasks.unmerge import (
     get_caches, get_event_user_from_interface, get_fingerprint, get_group_backfill_attributes,
-    get_group_creation_attributes, unmerge
+    get_group_creation_attributes, get_tsdb_timestamp, unmerge
 )
 from sentry.testutils import TestCase
 from sentry.utils.dates import to_timestamp
@@ -58,8 +58,79 @@ def test_get_fingerprint():
     ) == hashlib.md5('Not hello world').hexdigest()
 
 
+def test_get_tsdb_timestamp():
+    timestamp = datetime(2019, 1, 1, 12, 30, 17, 123, tzinfo=pytz.utc)
+    assert get_tsdb_timestamp(timestamp) == datetime(2019, 1, 1, 12, 30, 10, tzinfo=pytz.utc)
+
+
 @patch('sentry.similarity.features.index', new=index)
 class UnmergeTestCase(TestCase):
+    @patch('sentry.tasks.unmerge.TASK_DURATION', 0)
+    def test_unmerge_progress(self):
+        project = self.create_project()
+        source = self.create_group(project)
+        Environment.objects.create(
+            organization_id=project.organization_id,
+            name='',
+        )
+
+        fingerprints = ['a', 'b']
+        group_hashes = [
+            GroupHash.objects.create(
+                project=project,
+                group=source,
+                hash=hashlib.md5(fingerprint).hexdigest(),
+            ) for fingerprint in fingerprints
+        ]
+
+        for i in xrange(5):
+            Event.objects.create(
+                project_id=project.id,
+                group_id=source.id,
+                event_id=uuid.uuid4().hex,
+                message='hello',
+                datetime=timezone.now(),
+                data={
+                    'type': 'default',
+                    'metadata': {'title': 'hello'},
+                    'fingerprint': [fingerprints[i % 2]],
+                    'logentry': {'message': 'hello'},
+                },
+            )
+
+        recorded = []
+        record_unmerge_progress = GroupHash.record_unmerge_progress
+
+        def record(group_hash_ids, progress):
+            group_hash_ids = list(group_hash_ids)
+            recorded.append((group_hash_ids, dict(progress)))
+            record_unmerge_progress(group_hash_ids, progress)
+
+        # Every batch is processed by its own task, which continues from the
+        # recorded progress.
+        with patch.object(GroupHash, 'record_unmerge_progress',
+                          side_effect=record), self.tasks():
+            unmerge.delay(
+                project.id,
+                source.id,
+                None,
+                [group_hashes[1].hash],
+                None,
+                batch_size=2,
+            )
+
+        assert recorded == [
+            ([group_hashes[1].id], {'processed': 2, 'migrated': 1}),
+            ([group_hashes[1].id], {'processed': 4, 'migrated': 2}),
+            ([group_hashes[1].id], {'processed': 5, 'migrated': 2}),
+        ]
+
+        group_hash = GroupHash.objects.get(id=group_hashes[1].id)
+        assert group_hash.group_id != source.id
+        assert group_hash.state == GroupHash.State.UNLOCKED
+        assert Event.objects.filter(group_id=source.id).count() == 3
+        assert Event.objects.filter(group_id=group_hash.group_id).count() == 2
+
     def test_get_group_creation_attributes(self):
         now = datetime(2017, 5, 3, 6, 6, 6, tzinfo=pytz.utc)
         events = [
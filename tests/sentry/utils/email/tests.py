@@ -1,7 +1,9 @@
 from __future__ import absolute_import
 
 import functools
+import smtplib
 
+import mock
 import pytest
 from django.core import mail
 from mock import patch
@@ -12,10 +14,13 @@ from sentry.testutils import TestCase
 from sentry.utils.email import (
     ListResolver,
     MessageBuilder,
+    close_reusable_connection,
     default_list_type_handlers,
     get_from_email_domain,
     get_mail_backend,
+    get_reusable_connection,
     create_fake_email,
+    send_messages,
 )
 
 
@@ -332,6 +337,121 @@ class MessageBuilderTest(TestCase):
         assert len(mail.outbox) == 1
         assert mail.outbox[0].subject == 'Foo'
 
+    @patch('sentry.utils.email.render_to_string')
+    def test_renders_bodies_once(self, render_to_string):
+        render_to_string.return_value = 'hello world'
+        msg = MessageBuilder(
+            subject='Test',
+            context={'foo': 'bar'},
+            template='sentry/emails/test.txt',
+        )
+        results = msg.get_built_messages(['foo@example.com', 'bar@example.com'])
+        assert len(results) == 2
+        assert [m.body for m in results] == ['hello world', 'hello world']
+        assert render_to_string.call_count == 1
+
+    def test_send_async_batches(self):
+        self.addCleanup(close_reusable_connection)
+        msg = MessageBuilder(
+            subject='Test',
+            body='hello world',
+        )
+        to = ['a@example.com', 'b@example.com', 'c@example.com']
+
+        with self.settings(SENTRY_EMAIL_BATCH_SIZE=2), \
+                patch('sentry.tasks.email.send_email_batch.delay') as delay:
+            msg.send_async(to)
+        assert [len(call[1]['messages']) for call in delay.call_args_list] == [2, 1]
+
+        with self.settings(SENTRY_EMAIL_BATCH_SIZE=2), self.tasks():
+            msg.send_async(to)
+        assert sorted(out.to[0] for out in mail.outbox) == to
+
+    def test_send_async_without_batches(self):
+        msg = MessageBuilder(
+            subject='Test',
+            body='hello world',
+        )
+        with self.settings(SENTRY_EMAIL_BATCH_SIZE=1), \
+                patch('sentry.tasks.email.send_email.delay') as delay:
+            msg.send_async(['a@example.com', 'b@example.com'])
+        assert delay.call_count == 2
+
+
+class ReusableConnectionTestCase(TestCase):
+    def setUp(self):
+        super(ReusableConnectionTestCase, self).setUp()
+        close_reusable_connection()
+        self.addCleanup(close_reusable_connection)
+        patcher = patch('sentry.utils.email._get_connection', side_effect=self.make_connection)
+        self.get_connection = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_connection(self, **kwargs):
+        connection = mock.Mock()
+        connection.connection.noop.return_value = (250, 'OK')
+        connection.send_messages.side_effect = len
+        return connection
+
+    def test_reuses_connection(self):
+        connection = get_reusable_connection()
+        assert get_reusable_connection() is connection
+        assert self.get_connection.call_count == 1
+        connection.open.assert_called_once_with()
+        assert not connection.close.called
+
+    def test_replaces_closed_connection(self):
+        connection = get_reusable_connection()
+        connection.connection.noop.side_effect = IOError('disconnected')
+        with self.settings(SENTRY_EMAIL_CONNECTION_CHECK_INTERVAL=-1):
+            new_connection = get_reusable_connection()
+        assert new_connection is not connection
+        assert connection.close.called
+
+    def test_probes_idle_connection_only(self):
+        connection = get_reusable_connection()
+        assert get_reusable_connection() is connection
+        assert not connection.connection.noop.called
+
+        with self.settings(SENTRY_EMAIL_CONNECTION_CHECK_INTERVAL=-1):
+            assert get_reusable_connection() is connection
+        connection.connection.noop.assert_called_once_with()
+
+    def test_replaces_idle_connection(self):
+        connection = get_reusable_connection()
+        with self.settings(SENTRY_EMAIL_CONNECTION_MAX_IDLE=-1):
+            assert get_reusable_connection() is not connection
+        assert connection.close.called
+
+    def test_replaces_connection_on_option_change(self):
+        connection = get_reusable_connection()
+        with self.options({'mail.host': 'mail.example.com'}):
+            assert get_reusable_connection() is not connection
+
+    def test_send_messages(self):
+        message = MessageBuilder(subject='Test', body='hello world').build('foo@example.com')
+        assert send_messages([message], reuse_connection=True) == 1
+        assert send_messages([message], reuse_connection=True) == 1
+        assert self.get_connection.call_count == 1
+
+        connection = get_reusable_connection()
+        connection.send_messages.side_effect = IOError('disconnected')
+        with pytest.raises(IOError):
+            send_messages([message], reuse_connection=True)
+        assert connection.close.called
+        assert get_reusable_connection() is not connection
+
+    def test_send_messages_message_error(self):
+        message = MessageBuilder(subject='Test', body='hello world').build('foo@example.com')
+        connection = get_reusable_connection()
+        connection.send_messages.side_effect = smtplib.SMTPRecipientsRefused({})
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            send_messages([message], reuse_connection=True)
+
+        # The session is still usable after the message was rejected.
+        assert not connection.close.called
+        assert get_reusable_connection() is connection
+
 
 class MiscTestCase(TestCase):
     def test_get_from_email_domain(self):
@@ -51,3 +51,47 @@ class RedisLockBackendTestCase(TestCase):
 
         with pytest.raises(Exception):
             self.backend.acquire(key, duration)
+
+    def test_acquire_many(self):
+        keys = ['a', 'b', 'c']
+        duration = 60
+
+        self.backend.acquire_many(keys, duration)
+        for key in keys:
+            client = self.backend.get_client(key)
+            full_key = self.backend.prefix_key(key)
+            assert client.get(full_key) == self.backend.uuid.encode('utf-8')
+            assert duration - 2 < float(client.ttl(full_key)) <= duration
+
+        self.backend.release_many(keys)
+        for key in keys:
+            assert self.backend.get_client(key).exists(self.backend.prefix_key(key)) is False
+
+    def test_acquire_many_fail_on_conflict(self):
+        other = RedisLockBackend(self.cluster)
+        other.acquire('b', 60)
+
+        with pytest.raises(Exception):
+            self.backend.acquire_many(['a', 'b', 'c'], 60)
+
+        # None of the other locks are held
+        for key in ('a', 'c'):
+            assert self.backend.get_client(key).exists(self.backend.prefix_key(key)) is False
+        other.release('b')
+
+    def test_renew(self):
+        key = 'lock'
+        full_key = self.backend.prefix_key(key)
+        client = self.backend.get_client(key)
+
+        self.backend.acquire(key, 10)
+        self.backend.renew(key, 60)
+        assert 58 < float(client.ttl(full_key)) <= 60
+
+        other = RedisLockBackend(self.cluster)
+        with pytest.raises(Exception):
+            other.renew(key, 60)
+
+        self.backend.release(key)
+        with pytest.raises(Exception):
+            self.backend.renew(key, 60)
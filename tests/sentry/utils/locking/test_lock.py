@@ -2,11 +2,13 @@ from __future__ import absolute_import
 
 import mock
 import pytest
+import threading
+import time
 
 from sentry.testutils import TestCase
 from sentry.utils.locking import UnableToAcquireLock
 from sentry.utils.locking.backends import LockBackend
-from sentry.utils.locking.lock import Lock
+from sentry.utils.locking.lock import Lock, MultiLock
 
 
 class LockTestCase(TestCase):
@@ -54,3 +56,73 @@ class LockTestCase(TestCase):
             key,
             routing_key,
         )
+
+    def test_blocking_acquire(self):
+        backend = mock.Mock(spec=LockBackend)
+        backend.acquire.side_effect = [Exception('Boom!'), Exception('Boom!'), None]
+
+        lock = Lock(backend, 'lock', 60)
+        with mock.patch('time.sleep') as sleep:
+            with lock.blocking_acquire(10, initial_delay=0.1):
+                pass
+
+        assert backend.acquire.call_count == 3
+        delays = [call[0][0] for call in sleep.call_args_list]
+        assert len(delays) == 2
+        assert 0.05 <= delays[0] <= 0.1
+        assert 0.1 <= delays[1] <= 0.2
+        backend.release.assert_called_once_with('lock', None)
+
+        backend.acquire.side_effect = Exception('Boom!')
+        with pytest.raises(UnableToAcquireLock):
+            lock.blocking_acquire(0)
+
+    def test_renewal(self):
+        backend = mock.Mock(spec=LockBackend)
+        lock = Lock(backend, 'lock', 0.03)
+
+        with lock.acquire(renew=True):
+            for _ in range(100):
+                if backend.renew.call_count >= 2:
+                    break
+                time.sleep(0.01)
+
+        assert backend.renew.call_count >= 2
+        backend.renew.assert_called_with('lock', 0.03, None)
+        backend.release.assert_called_once_with('lock', None)
+
+        renewed = backend.renew.call_count
+        time.sleep(0.05)
+        assert backend.renew.call_count == renewed
+
+    def test_release_waits_for_renewal(self):
+        calls = []
+        renewing = threading.Event()
+
+        def renew(*args):
+            calls.append('renew')
+            renewing.set()
+            time.sleep(0.05)
+            calls.append('renewed')
+
+        backend = mock.Mock(spec=LockBackend)
+        backend.renew.side_effect = renew
+        backend.release.side_effect = lambda *args: calls.append('release')
+        lock = Lock(backend, 'lock', 0.3)
+
+        with lock.acquire(renew=True):
+            assert renewing.wait(1)
+
+        assert calls == ['renew', 'renewed', 'release']
+
+    def test_multi_lock(self):
+        backend = mock.Mock(spec=LockBackend)
+        lock = MultiLock(backend, ['a', 'b'], 60)
+
+        with lock.acquire():
+            backend.acquire_many.assert_called_once_with(('a', 'b'), 60, None)
+        backend.release_many.assert_called_once_with(('a', 'b'), None)
+
+        backend.acquire_many.side_effect = Exception('Boom!')
+        with pytest.raises(UnableToAcquireLock):
+            lock.acquire()
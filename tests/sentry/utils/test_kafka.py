@@ -0,0 +1,132 @@
+from __future__ import absolute_import
+
+import threading
+
+import mock
+import pytest
+
+from sentry.testutils import TestCase
+from sentry.utils.kafka import AsyncProducer, ProducerManager
+
+
+class FakeProducer(object):
+    """
+    An in-process stand-in for ``confluent_kafka.Producer``.
+
+    Messages are "delivered" when the producer is polled or flushed. The local
+    queue holds at most ``capacity`` messages, and topics listed in
+    ``failing_topics`` fail delivery.
+    """
+
+    def __init__(self, options=None, capacity=100, failing_topics=()):
+        self.options = options
+        self.capacity = capacity
+        self.failing_topics = failing_topics
+        self.queue = []
+        self.delivered = []
+        self.lock = threading.Lock()
+        self.flushes = 0
+
+    def __len__(self):
+        return len(self.queue)
+
+    def produce(self, topic, on_delivery=None, **kwargs):
+        with self.lock:
+            if len(self.queue) >= self.capacity:
+                raise BufferError('Local: Queue full')
+            self.queue.append((topic, on_delivery, kwargs))
+
+    def poll(self, timeout=None):
+        with self.lock:
+            queue, self.queue = self.queue, []
+
+        for topic, on_delivery, kwargs in queue:
+            error = 'failed' if topic in self.failing_topics else None
+            if error is None:
+                self.delivered.append((topic, kwargs))
+            if on_delivery is not None:
+                on_delivery(error, kwargs)
+        return len(queue)
+
+    def flush(self, timeout=None):
+        self.flushes += 1
+        self.poll()
+        return len(self.queue)
+
+
+class AsyncProducerTest(TestCase):
+    def test_produce_and_flush(self):
+        fake = FakeProducer()
+        producer = AsyncProducer(fake, poll_interval=0.01)
+        callback = mock.Mock()
+
+        producer.produce('events', value='a', on_delivery=callback)
+        producer.produce('events', value='b', on_delivery=callback)
+        assert producer.flush() == 0
+        assert producer.close() == 0
+
+        assert sorted(kwargs['value'] for _, kwargs in fake.delivered) == ['a', 'b']
+        assert callback.call_count == 2
+
+    @mock.patch('sentry.utils.kafka.metrics')
+    def test_delivery_failure_metrics(self, mock_metrics):
+        fake = FakeProducer(failing_topics=('broken', ))
+        producer = AsyncProducer(fake, name='default', poll_interval=0.01)
+
+        producer.produce('broken', value='a')
+        producer.close()
+
+        mock_metrics.incr.assert_any_call(
+            'kafka.producer.delivery_failed',
+            tags={'cluster': 'default', 'topic': 'broken'},
+            skip_internal=True,
+        )
+
+    def test_backpressure(self):
+        fake = FakeProducer(capacity=1)
+        fake.poll = mock.Mock(return_value=0)
+        producer = AsyncProducer(fake, poll_interval=0.01, block_timeout=0.05)
+
+        producer.produce('events', value='a')
+        with pytest.raises(BufferError):
+            producer.produce('events', value='b')
+        assert fake.poll.called
+
+
+class ProducerManagerTest(TestCase):
+    def test_async_manager(self):
+        created = []
+
+        def factory(options):
+            created.append(FakeProducer(options))
+            return created[-1]
+
+        manager = ProducerManager(asynchronous=True, producer_factory=factory)
+        with self.settings(KAFKA_CLUSTERS={'default': {}}), \
+                mock.patch('sentry.utils.kafka.atexit') as mock_atexit:
+            producer = manager.get('events')
+            assert isinstance(producer, AsyncProducer)
+            assert manager.get('events') is producer
+            assert mock_atexit.register.call_count == 1
+
+        assert len(created) == 1
+        assert created[0].options['linger.ms'] == 5
+
+        producer.produce('events', value='a')
+        assert manager.flush() == 0
+        manager.close()
+        assert created[0].delivered == [('events', {'value': 'a'})]
+
+    def test_produce_does_not_flush_async(self):
+        fake = FakeProducer()
+        manager = ProducerManager(asynchronous=True, producer_factory=lambda options: fake)
+
+        with mock.patch('sentry.utils.kafka.producers', manager), \
+                mock.patch('sentry.utils.kafka.atexit'):
+            from sentry.utils import kafka
+            kafka.produce('events', value='a')
+            assert fake.flushes == 0
+            kafka.produce_sync('events', value='b')
+            assert fake.flushes == 1
+
+        manager.close()